@@ -1,11 +1,21 @@
 # main api router
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from main.modules import api_router
+from main.core.background import jobs
+from main.core.config import settings
 import uvicorn
 import os
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await jobs.start()
+    yield
+    await jobs.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,4 +36,9 @@ app.include_router(
 
 port = int(os.getenv('PORT', 5050))
 if __name__ == '__main__':
-    uvicorn.run(app, port=port, host='0.0.0.0')
+    uvicorn.run(
+        app,
+        port=port,
+        host='0.0.0.0',
+        timeout_graceful_shutdown=settings.SHUTDOWN_GRACE_SECONDS
+    )
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the Zeep Backend API
+
+Fires concurrent requests at a running instance and reports latency
+percentiles. Run it once against the old build and once against the new
+one with a different --label to compare:
+
+    python benchmark.py --label before latency --clients 200 --requests 10000 \
+        --method GET --path "/api/user/check?mobile_no=09170000000"
+
+The JWT for the `token` header is read from --token or BENCH_TOKEN.
+
+`usage-batch` compares N single /router/update/usage calls with one
+/router/update/usage/batch call carrying the same N records:
+
+    python benchmark.py --label batch usage-batch --records 10000
+
+`nearby` needs no server. It places N random routers in a box, keeps
+their geohashes sorted like ix_routers_active_geohash, and compares the
+/router/nearby cell pruning with a full scan over the same queries:
+
+    python benchmark.py nearby --routers 100000 --radius-km 2
+
+`export` also needs no server, only the app's environment. It renders
+synthetic transaction rows through the streaming download engine and
+through the old in-memory path, each in its own process, and reports
+the peak RSS of each:
+
+    python benchmark.py export --rows 10000,100000,1000000 --legacy
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import random
+import bisect
+import resource
+import subprocess
+import statistics
+import httpx
+from main.library import geohash
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+def summarize(label, latencies, errors, elapsed):
+    latencies_ms = [l * 1000 for l in latencies]
+    return {
+        "label": label,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round((len(latencies) + errors) / elapsed, 1) if elapsed else 0,
+        "mean_ms": round(statistics.mean(latencies_ms), 2) if latencies_ms else 0,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p90_ms": round(percentile(latencies_ms, 90), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2) if latencies_ms else 0,
+    }
+
+
+def print_summary(summary, output=None):
+    print(
+        f"[{summary['label']}] requests={summary['requests']} "
+        f"errors={summary['errors']} rps={summary['rps']} "
+        f"mean={summary['mean_ms']}ms p50={summary['p50_ms']}ms "
+        f"p90={summary['p90_ms']}ms p99={summary['p99_ms']}ms "
+        f"max={summary['max_ms']}ms"
+    )
+    if output:
+        with open(output, "a") as f:
+            f.write(json.dumps(summary) + "\n")
+
+
+async def run_load(client, method, path, body, clients, total):
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            start = time.perf_counter()
+            try:
+                res = await client.request(
+                    method, path, json=body(index) if callable(body) else body
+                )
+                if res.status_code >= 500:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def latency(args):
+    headers = {"token": args.token} if args.token else {}
+    body = json.loads(args.body) if args.body else None
+    limits = httpx.Limits(max_connections=args.clients)
+
+    async with httpx.AsyncClient(
+        base_url=args.url, headers=headers, limits=limits, timeout=args.timeout
+    ) as client:
+        latencies, errors, elapsed = await run_load(
+            client, args.method, args.path, body, args.clients, args.requests
+        )
+
+    print_summary(summarize(args.label, latencies, errors, elapsed), args.output)
+
+
+async def contention(args):
+    headers = {"token": args.token} if args.token else {}
+    limits = httpx.Limits(max_connections=args.clients + args.flood_clients)
+
+    async with httpx.AsyncClient(
+        base_url=args.url, headers=headers, limits=limits, timeout=args.timeout
+    ) as client:
+        stop = asyncio.Event()
+
+        async def flood():
+            while not stop.is_set():
+                try:
+                    await client.get(args.flood_path)
+                except httpx.HTTPError:
+                    pass
+
+        flooders = [asyncio.create_task(flood()) for _ in range(args.flood_clients)]
+        latencies, errors, elapsed = await run_load(
+            client, "GET", args.path, None, args.clients, args.requests
+        )
+        stop.set()
+        await asyncio.gather(*flooders, return_exceptions=True)
+
+    print_summary(summarize(args.label, latencies, errors, elapsed), args.output)
+
+
+async def list_values(client, path, field, limit):
+    res = await client.get(path, params={"limit": limit, "fields": field})
+    res.raise_for_status()
+    return [row[field] for row in res.json()["data"] if row.get(field)]
+
+
+def usage_records(macs, device_ids, count):
+    return [
+        {
+            "router_mac": macs[i % len(macs)],
+            "router_usage": float(i),
+            "router_subscribers_count": i % 50,
+            "device_id": device_ids[i % len(device_ids)],
+            "device_usage": float(i),
+            "device_data_left": float(1000 - i % 1000),
+        }
+        for i in range(count)
+    ]
+
+
+async def usage_batch(args):
+    headers = {"token": args.token} if args.token else {}
+    limits = httpx.Limits(max_connections=args.clients)
+
+    async with httpx.AsyncClient(
+        base_url=args.url, headers=headers, limits=limits, timeout=args.timeout
+    ) as client:
+        # real MACs and device ids, so every record is applied
+        macs = await list_values(client, "/api/router/list", "mac_address", args.targets)
+        device_ids = await list_values(
+            client, "/api/user/list?user_types=subscriber", "device_id", args.targets
+        )
+        if not macs or not device_ids:
+            print("usage-batch needs at least one router and one subscriber with a device id")
+            return
+        records = usage_records(macs, device_ids, args.records)
+
+        latencies, errors, elapsed = await run_load(
+            client, "PUT", "/api/router/update/usage",
+            lambda index: records[index], args.clients, len(records)
+        )
+        single = summarize(f"{args.label}:single", latencies, errors, elapsed)
+        print_summary(single, args.output)
+
+        started = time.perf_counter()
+        res = await client.put("/api/router/update/usage/batch", json={"items": records})
+        batch_elapsed = time.perf_counter() - started
+        failed = res.json().get("data", {}).get("failed") if res.status_code == 200 else None
+
+    print(
+        f"[{args.label}:batch] records={len(records)} status={res.status_code} "
+        f"failed={failed} elapsed={round(batch_elapsed * 1000, 2)}ms "
+        f"({round(elapsed / batch_elapsed, 1) if batch_elapsed else 0}x faster "
+        f"than {round(elapsed * 1000, 2)}ms of single calls)"
+    )
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps({
+                "label": f"{args.label}:batch",
+                "records": len(records),
+                "status_code": res.status_code,
+                "failed": failed,
+                "elapsed_ms": round(batch_elapsed * 1000, 2),
+                "single_elapsed_ms": round(elapsed * 1000, 2),
+            }) + "\n")
+
+
+def nearby(args):
+    rng = random.Random(args.seed)
+    south, west, north, east = args.box
+    routers = sorted(
+        (geohash.encode(lat, long), lat, long)
+        for lat, long in (
+            (rng.uniform(south, north), rng.uniform(west, east))
+            for _ in range(args.routers)
+        )
+    )
+    hashes = [router[0] for router in routers]
+    points = [
+        (rng.uniform(south, north), rng.uniform(west, east))
+        for _ in range(args.queries)
+    ]
+
+    def pruned(lat, long):
+        cells = geohash.cover(*geohash.bounding_box(lat, long, args.radius_km))
+        candidates = [
+            router
+            for cell in cells
+            for router in routers[bisect.bisect_left(hashes, cell):bisect.bisect_left(hashes, cell + "~")]
+        ]
+        found = [r for r in candidates if geohash.distance_km(lat, long, r[1], r[2]) <= args.radius_km]
+        return found, len(candidates)
+
+    def full_scan(lat, long):
+        found = [r for r in routers if geohash.distance_km(lat, long, r[1], r[2]) <= args.radius_km]
+        return found, len(routers)
+
+    results = {}
+    for name, search in (("geohash", pruned), ("full_scan", full_scan)):
+        latencies = []
+        read = 0
+        found = []
+        started = time.perf_counter()
+        for lat, long in points:
+            start = time.perf_counter()
+            rows, candidates = search(lat, long)
+            latencies.append(time.perf_counter() - start)
+            read += candidates
+            found.append(sorted(rows))
+        summary = summarize(f"{args.label}:{name}", latencies, 0, time.perf_counter() - started)
+        summary["routers"] = args.routers
+        summary["radius_km"] = args.radius_km
+        summary["avg_rows_read"] = round(read / len(points), 1)
+        summary["avg_found"] = round(sum(map(len, found)) / len(points), 1)
+        print_summary(summary, args.output)
+        print(f"  rows read per query={summary['avg_rows_read']} found={summary['avg_found']}")
+        results[name] = found
+
+    if results["geohash"] != results["full_scan"]:
+        print("geohash pruning missed routers the full scan found")
+        return 1
+
+
+EXPORT_KEYS = (
+    "created_at",
+    "updated_at",
+    "type",
+    "status",
+    "payment_method",
+    "amount",
+    "charge_reference",
+    "retrieval_reference",
+    "retrieval_timestamp",
+    "qr_code_string",
+)
+
+
+class SyntheticRows:
+    """Stands in for a download query: yield_per() generates the rows"""
+
+    def __init__(self, count):
+        self.count = count
+
+    def yield_per(self, size):
+        from types import SimpleNamespace
+        from datetime import datetime, timedelta
+        start = datetime(2026, 1, 1)
+        for i in range(self.count):
+            at = start + timedelta(seconds=i)
+            yield SimpleNamespace(
+                created_at=at,
+                updated_at=at,
+                type="payment",
+                status="success" if i % 10 else "failed",
+                payment_method="gcash",
+                amount=float(i % 1000),
+                charge_reference=f"CHG-{i:012d}",
+                retrieval_reference=f"RET-{i:012d}",
+                retrieval_timestamp=at,
+                qr_code_string=f"00020101021228{i:020d}",
+            )
+
+
+def export_run(args):
+    # one render in this process; the parent reads the peak RSS it prints
+    from main.library.common import common
+    from main.library.exporter import Export
+
+    started = time.perf_counter()
+    if args.engine == "legacy":
+        from fastapi.encoders import jsonable_encoder
+        rows = list(SyntheticRows(args.rows).yield_per(0))
+        size = len(common.format_excel(rawData={
+            "header": EXPORT_KEYS,
+            "rows": jsonable_encoder([common.pick_fields(row, EXPORT_KEYS) for row in rows]),
+        }))
+    else:
+        export = Export(SyntheticRows(args.rows), EXPORT_KEYS, EXPORT_KEYS)
+        size = sum(len(chunk) for chunk in export.chunks(args.file_type))
+
+    print(json.dumps({
+        "engine": args.engine,
+        "rows": args.rows,
+        "file_type": args.file_type,
+        "bytes": size,
+        "elapsed_s": round(time.perf_counter() - started, 2),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def export(args):
+    engines = ["stream", "legacy"] if args.legacy else ["stream"]
+    for rows in (int(value) for value in args.rows.split(",")):
+        for engine in engines:
+            res = subprocess.run(
+                [
+                    sys.executable, __file__, "export-run",
+                    "--engine", engine,
+                    "--rows", str(rows),
+                    "--file-type", args.file_type,
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if res.returncode:
+                print(f"[{args.label}:{engine}] rows={rows} failed: {res.stderr.strip()[-500:]}")
+                continue
+            result = json.loads(res.stdout.strip().splitlines()[-1])
+            result["label"] = f"{args.label}:{engine}"
+            print(
+                f"[{result['label']}] rows={rows} {args.file_type} "
+                f"peak_rss={result['peak_rss_mb']}MB bytes={result['bytes']} "
+                f"elapsed={result['elapsed_s']}s"
+            )
+            if args.output:
+                with open(args.output, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zeep Backend benchmarks")
+    parser.add_argument("--url", default=os.getenv("BENCH_URL", "http://localhost:5050"))
+    parser.add_argument("--token", default=os.getenv("BENCH_TOKEN"))
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", help="append JSON results to this file")
+    parser.add_argument("--timeout", type=float, default=60)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("latency", help="p50/p90/p99 latency under concurrent load")
+    cmd.add_argument("--method", default="GET")
+    cmd.add_argument("--path", required=True)
+    cmd.add_argument("--body", help="JSON request body")
+    cmd.add_argument("--clients", type=int, default=200)
+    cmd.add_argument("--requests", type=int, default=10000)
+    cmd.set_defaults(func=latency)
+
+    cmd = commands.add_parser(
+        "contention", help="latency of one path while another path is flooded"
+    )
+    cmd.add_argument("--path", required=True)
+    cmd.add_argument("--flood-path", required=True)
+    cmd.add_argument("--flood-clients", type=int, default=50)
+    cmd.add_argument("--clients", type=int, default=20)
+    cmd.add_argument("--requests", type=int, default=2000)
+    cmd.set_defaults(func=contention)
+
+    cmd = commands.add_parser(
+        "usage-batch", help="N single usage updates against one N-record batch"
+    )
+    cmd.add_argument("--records", type=int, default=10000)
+    cmd.add_argument("--clients", type=int, default=50)
+    cmd.add_argument("--targets", type=int, default=1000,
+                     help="routers and subscribers to spread the records over")
+    cmd.set_defaults(func=usage_batch)
+
+    cmd = commands.add_parser(
+        "nearby", help="geohash cell pruning against a full scan, in memory"
+    )
+    cmd.add_argument("--routers", type=int, default=100000)
+    cmd.add_argument("--queries", type=int, default=200)
+    cmd.add_argument("--radius-km", type=float, default=2)
+    cmd.add_argument("--box", type=float, nargs=4, default=[4.5, 116.9, 21.2, 126.6],
+                     metavar=("SOUTH", "WEST", "NORTH", "EAST"),
+                     help="area to place routers and queries in (default: the Philippines)")
+    cmd.add_argument("--seed", type=int, default=1)
+    cmd.set_defaults(func=nearby)
+
+    cmd = commands.add_parser(
+        "export", help="peak RSS of a download render at growing row counts"
+    )
+    cmd.add_argument("--rows", default="10000,100000,1000000")
+    cmd.add_argument("--file-type", default="xlsx", choices=("xlsx", "csv"))
+    cmd.add_argument("--legacy", action="store_true",
+                     help="also render through the old in-memory workbook")
+    cmd.set_defaults(func=export)
+
+    cmd = commands.add_parser("export-run")
+    cmd.add_argument("--engine", default="stream", choices=("stream", "legacy"))
+    cmd.add_argument("--rows", type=int, required=True)
+    cmd.add_argument("--file-type", default="xlsx", choices=("xlsx", "csv"))
+    cmd.set_defaults(func=export_run)
+
+    args = parser.parse_args()
+    result = args.func(args)
+    if asyncio.iscoroutine(result):
+        result = asyncio.run(result)
+    return result
+
+
+if __name__ == "__main__":
+    sys.exit(main())
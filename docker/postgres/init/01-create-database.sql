@@ -4,6 +4,7 @@
 -- Create extensions if needed (these might be in your backup, but it's safe to create them first)
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "pgcrypto";
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
 
 -- Set timezone
 SET timezone = 'UTC';
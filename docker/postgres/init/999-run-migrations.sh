@@ -0,0 +1,45 @@
+#!/bin/bash
+# Versioned schema migrations
+# Applies every migrations/NNNN_*.sql file that is not yet recorded in the
+# schema_migrations table, in file name order. It runs after the backup
+# restore on first container startup and can be re-run at any time:
+#
+#   docker exec -it zeep-postgres bash /docker-entrypoint-initdb.d/999-run-migrations.sh
+#
+# Migration files run outside a transaction block (CREATE INDEX
+# CONCURRENTLY needs that), so write them to be safely re-runnable and
+# drop INVALID indexes left by an interrupted CONCURRENTLY build before
+# recreating them. psql stops at the first error and the version is only
+# recorded when the whole file succeeded, so a failed file runs again.
+
+set -e
+
+MIGRATIONS_DIR="${MIGRATIONS_DIR:-/docker-entrypoint-initdb.d/migrations}"
+MIGRATE_PSQL=(psql -v ON_ERROR_STOP=1 -U "$POSTGRES_USER" -d "$POSTGRES_DB")
+if [ -n "$PGHOST" ]; then
+    MIGRATE_PSQL+=(-h "$PGHOST" -p "${PGPORT:-5432}")
+fi
+
+echo "🔄 Running database migrations from $MIGRATIONS_DIR..."
+
+"${MIGRATE_PSQL[@]}" -q -c "CREATE TABLE IF NOT EXISTS schema_migrations (
+    version TEXT PRIMARY KEY,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);"
+
+for MIGRATION_FILE in $(ls "$MIGRATIONS_DIR"/*.sql 2>/dev/null | sort); do
+    VERSION=$(basename "$MIGRATION_FILE" .sql)
+    APPLIED=$("${MIGRATE_PSQL[@]}" -tA -c "SELECT 1 FROM schema_migrations WHERE version = '$VERSION';")
+    if [ "$APPLIED" = "1" ]; then
+        echo "⏭️  $VERSION already applied"
+        continue
+    fi
+    echo "🚀 Applying $VERSION..."
+    if ! "${MIGRATE_PSQL[@]}" -f "$MIGRATION_FILE"; then
+        echo "❌ $VERSION failed, not recorded"
+        exit 1
+    fi
+    "${MIGRATE_PSQL[@]}" -q -c "INSERT INTO schema_migrations (version) VALUES ('$VERSION');"
+done
+
+echo "✅ Database migrations complete"
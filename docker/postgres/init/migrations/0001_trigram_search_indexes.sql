@@ -0,0 +1,105 @@
+-- GIN trigram indexes for the list endpoints' `search` filter.
+-- ilike('%term%') has a leading wildcard, so the btree indexes cannot serve
+-- it; pg_trgm indexes can. CONCURRENTLY keeps the tables writable while the
+-- indexes build on a live database, so this file must not run inside a
+-- transaction block.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- A CONCURRENTLY build that failed or was cancelled leaves an INVALID
+-- index behind that IF NOT EXISTS would keep; drop it so it is rebuilt.
+SELECT format('DROP INDEX CONCURRENTLY IF EXISTS %I.%I', n.nspname, c.relname)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE NOT i.indisvalid AND c.relname IN (
+    'ix_tiers_name_trgm',
+    'ix_tiers_description_trgm',
+    'ix_users_name_trgm',
+    'ix_users_email_trgm',
+    'ix_users_mobile_no_trgm',
+    'ix_users_user_type_trgm',
+    'ix_users_device_id_trgm',
+    'ix_users_tier_trgm',
+    'ix_routers_serial_no_trgm',
+    'ix_routers_router_model_trgm',
+    'ix_routers_router_version_trgm',
+    'ix_transactions_payment_method_trgm',
+    'ix_transactions_status_trgm',
+    'ix_transactions_type_trgm',
+    'ix_transactions_charge_reference_trgm',
+    'ix_mobileotp_otp_trgm',
+    'ix_mobileotp_mobile_no_trgm',
+    'ix_mobileotp_device_id_trgm',
+    'ix_mobileotp_ref_id_trgm',
+    'ix_promos_type_trgm',
+    'ix_promos_title_trgm',
+    'ix_promos_description_trgm',
+    'ix_promos_image_url_trgm'
+)
+\gexec
+
+-- subscriber_tiers
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tiers_name_trgm
+    ON "Tiers" USING gin (name gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tiers_description_trgm
+    ON "Tiers" USING gin (description gin_trgm_ops);
+
+-- user_list (also the owner name in router_list)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_name_trgm
+    ON "Users" USING gin (name gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_trgm
+    ON "Users" USING gin (email gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_mobile_no_trgm
+    ON "Users" USING gin (mobile_no gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_user_type_trgm
+    ON "Users" USING gin (user_type gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_device_id_trgm
+    ON "Users" USING gin (device_id gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_tier_trgm
+    ON "Users" USING gin (tier gin_trgm_ops);
+
+-- router_list
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_routers_serial_no_trgm
+    ON "Routers" USING gin (serial_no gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_routers_router_model_trgm
+    ON "Routers" USING gin (router_model gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_routers_router_version_trgm
+    ON "Routers" USING gin (router_version gin_trgm_ops);
+
+-- payment_transaction_list
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_payment_method_trgm
+    ON "Transactions" USING gin (payment_method gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_status_trgm
+    ON "Transactions" USING gin (status gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_type_trgm
+    ON "Transactions" USING gin (type gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_charge_reference_trgm
+    ON "Transactions" USING gin (charge_reference gin_trgm_ops);
+
+-- sent_otp_list
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_mobileotp_otp_trgm
+    ON "MobileOtp" USING gin (otp gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_mobileotp_mobile_no_trgm
+    ON "MobileOtp" USING gin (mobile_no gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_mobileotp_device_id_trgm
+    ON "MobileOtp" USING gin (device_id gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_mobileotp_ref_id_trgm
+    ON "MobileOtp" USING gin (ref_id gin_trgm_ops);
+
+-- promo_list
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_promos_type_trgm
+    ON "Promos" USING gin (type gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_promos_title_trgm
+    ON "Promos" USING gin (title gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_promos_description_trgm
+    ON "Promos" USING gin (description gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_promos_image_url_trgm
+    ON "Promos" USING gin (image_url gin_trgm_ops);
+
+ANALYZE "Tiers";
+ANALYZE "Users";
+ANALYZE "Routers";
+ANALYZE "Transactions";
+ANALYZE "MobileOtp";
+ANALYZE "Promos";
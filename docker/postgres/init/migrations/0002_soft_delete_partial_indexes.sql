@@ -0,0 +1,84 @@
+-- Partial and composite btree indexes for the hot lookups and list pages.
+-- Nearly every query filters deleted_at IS NULL and list pages order by
+-- updated_at DESC, <primary key> DESC, so the indexes skip soft-deleted
+-- rows and carry the same ordering. They are declared on the models with
+-- active_index(). Must not run inside a transaction block (CONCURRENTLY).
+
+-- drop INVALID leftovers of a failed CONCURRENTLY build (see 0001)
+SELECT format('DROP INDEX CONCURRENTLY IF EXISTS %I.%I', n.nspname, c.relname)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE NOT i.indisvalid AND c.relname IN (
+    'ix_users_active_user_type',
+    'ix_users_active_updated_at',
+    'ix_users_active_email',
+    'ix_users_active_mobile_no',
+    'ix_users_active_device_id',
+    'ix_routers_active_mac_address',
+    'ix_routers_active_serial_no',
+    'ix_routers_active_owner_user_id',
+    'ix_routers_active_updated_at',
+    'ix_promos_active_is_show',
+    'ix_promos_active_type',
+    'ix_tiers_active_updated_at',
+    'ix_transactions_user_id_updated_at',
+    'ix_transactions_status_updated_at'
+)
+\gexec
+
+-- Users: login and registration lookups, lists filtered by user_type
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_active_user_type
+    ON "Users" (user_type, updated_at DESC, user_id DESC)
+    WHERE deleted_at IS NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_active_updated_at
+    ON "Users" (updated_at DESC, user_id DESC)
+    WHERE deleted_at IS NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_active_email
+    ON "Users" (email)
+    WHERE deleted_at IS NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_active_mobile_no
+    ON "Users" (mobile_no)
+    WHERE deleted_at IS NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_active_device_id
+    ON "Users" (device_id)
+    WHERE deleted_at IS NULL;
+
+-- Routers: usage updates by MAC, registration checks, per-owner lists
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_routers_active_mac_address
+    ON "Routers" (mac_address)
+    WHERE deleted_at IS NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_routers_active_serial_no
+    ON "Routers" (serial_no)
+    WHERE deleted_at IS NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_routers_active_owner_user_id
+    ON "Routers" (owner_user_id, updated_at DESC, router_id DESC)
+    WHERE deleted_at IS NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_routers_active_updated_at
+    ON "Routers" (updated_at DESC, router_id DESC)
+    WHERE deleted_at IS NULL;
+
+-- Promos: the app feed (is_show) and lists by type
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_promos_active_is_show
+    ON "Promos" (is_show, updated_at DESC, promo_id DESC)
+    WHERE deleted_at IS NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_promos_active_type
+    ON "Promos" (type, updated_at DESC, promo_id DESC)
+    WHERE deleted_at IS NULL;
+
+-- Tiers
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tiers_active_updated_at
+    ON "Tiers" (updated_at DESC, tier_id DESC)
+    WHERE deleted_at IS NULL;
+
+-- Transactions are never soft-deleted: a user's history and status filters
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_user_id_updated_at
+    ON "Transactions" (user_id, updated_at DESC, transaction_id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_status_updated_at
+    ON "Transactions" (status, updated_at DESC, transaction_id DESC);
+
+ANALYZE "Users";
+ANALYZE "Routers";
+ANALYZE "Promos";
+ANALYZE "Tiers";
+ANALYZE "Transactions";
@@ -0,0 +1,193 @@
+-- Dashboard counters kept up to date by triggers on Routers and Users.
+-- /dashboard/count and /dashboard/data read them by primary key instead of
+-- scanning Routers. Each scope ('global' or an owner_user_id) is spread
+-- over 16 slots by a hash of the changed row's id, so concurrent router
+-- updates do not all queue on a single counter row. Readers sum the slots.
+-- reconcile_dashboard_counters() recounts from the source tables and
+-- rewrites any scope that drifted; the app runs it periodically.
+
+CREATE TABLE IF NOT EXISTS "DashboardCounters" (
+    scope TEXT NOT NULL,
+    slot SMALLINT NOT NULL,
+    total_routers INTEGER NOT NULL DEFAULT 0,
+    total_subscribers BIGINT NOT NULL DEFAULT 0,
+    total_business_owners INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, slot)
+);
+
+CREATE OR REPLACE FUNCTION dashboard_counters_add(
+    p_scope TEXT,
+    p_slot INTEGER,
+    p_routers INTEGER,
+    p_subscribers BIGINT,
+    p_business_owners INTEGER
+) RETURNS void AS $$
+BEGIN
+    IF p_routers = 0 AND p_subscribers = 0 AND p_business_owners = 0 THEN
+        RETURN;
+    END IF;
+    INSERT INTO "DashboardCounters" AS c
+        (scope, slot, total_routers, total_subscribers, total_business_owners)
+    VALUES (p_scope, p_slot, p_routers, p_subscribers, p_business_owners)
+    ON CONFLICT (scope, slot) DO UPDATE SET
+        total_routers = c.total_routers + EXCLUDED.total_routers,
+        total_subscribers = c.total_subscribers + EXCLUDED.total_subscribers,
+        total_business_owners = c.total_business_owners + EXCLUDED.total_business_owners;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dashboard_counters_router() RETURNS trigger AS $$
+DECLARE
+    old_slot INTEGER;
+    new_slot INTEGER;
+    delta BIGINT;
+BEGIN
+    -- usage updates only move subscribers_count: one delta per scope
+    IF TG_OP = 'UPDATE' AND OLD.deleted_at IS NULL AND NEW.deleted_at IS NULL
+            AND OLD.owner_user_id = NEW.owner_user_id
+            AND OLD.router_id = NEW.router_id THEN
+        new_slot := hashtext(NEW.router_id) & 15;
+        delta := coalesce(NEW.subscribers_count, 0) - coalesce(OLD.subscribers_count, 0);
+        PERFORM dashboard_counters_add('global', new_slot, 0, delta, 0);
+        PERFORM dashboard_counters_add(NEW.owner_user_id, new_slot, 0, delta, 0);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.deleted_at IS NULL THEN
+        old_slot := hashtext(OLD.router_id) & 15;
+        PERFORM dashboard_counters_add(
+            'global', old_slot, -1, -coalesce(OLD.subscribers_count, 0), 0
+        );
+        PERFORM dashboard_counters_add(
+            OLD.owner_user_id, old_slot, -1, -coalesce(OLD.subscribers_count, 0), 0
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.deleted_at IS NULL THEN
+        new_slot := hashtext(NEW.router_id) & 15;
+        PERFORM dashboard_counters_add(
+            'global', new_slot, 1, coalesce(NEW.subscribers_count, 0), 0
+        );
+        PERFORM dashboard_counters_add(
+            NEW.owner_user_id, new_slot, 1, coalesce(NEW.subscribers_count, 0), 0
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dashboard_counters_user() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.deleted_at IS NULL
+            AND OLD.user_type = 'business_owner' THEN
+        PERFORM dashboard_counters_add('global', hashtext(OLD.user_id) & 15, 0, 0, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.deleted_at IS NULL
+            AND NEW.user_type = 'business_owner' THEN
+        PERFORM dashboard_counters_add('global', hashtext(NEW.user_id) & 15, 0, 0, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER dashboard_counters_router
+    AFTER INSERT OR DELETE ON "Routers"
+    FOR EACH ROW EXECUTE FUNCTION dashboard_counters_router();
+
+CREATE OR REPLACE TRIGGER dashboard_counters_router_update
+    AFTER UPDATE OF subscribers_count, deleted_at, owner_user_id, router_id ON "Routers"
+    FOR EACH ROW
+    WHEN (
+        OLD.subscribers_count IS DISTINCT FROM NEW.subscribers_count
+        OR OLD.deleted_at IS DISTINCT FROM NEW.deleted_at
+        OR OLD.owner_user_id IS DISTINCT FROM NEW.owner_user_id
+        OR OLD.router_id IS DISTINCT FROM NEW.router_id
+    )
+    EXECUTE FUNCTION dashboard_counters_router();
+
+CREATE OR REPLACE TRIGGER dashboard_counters_user
+    AFTER INSERT OR DELETE ON "Users"
+    FOR EACH ROW EXECUTE FUNCTION dashboard_counters_user();
+
+CREATE OR REPLACE TRIGGER dashboard_counters_user_update
+    AFTER UPDATE OF user_type, deleted_at, user_id ON "Users"
+    FOR EACH ROW
+    WHEN (
+        OLD.user_type IS DISTINCT FROM NEW.user_type
+        OR OLD.deleted_at IS DISTINCT FROM NEW.deleted_at
+        OR OLD.user_id IS DISTINCT FROM NEW.user_id
+    )
+    EXECUTE FUNCTION dashboard_counters_user();
+
+-- Returns how many scopes had drifted. The table lock waits for writers
+-- whose trigger already ran and holds back new ones until the recount
+-- commits, so no delta is lost or counted twice.
+CREATE OR REPLACE FUNCTION reconcile_dashboard_counters() RETURNS integer AS $$
+DECLARE
+    drifted INTEGER;
+BEGIN
+    LOCK TABLE "DashboardCounters" IN SHARE ROW EXCLUSIVE MODE;
+
+    WITH expected AS (
+        SELECT
+            'global'::text AS scope,
+            (SELECT count(*) FROM "Routers"
+                WHERE deleted_at IS NULL) AS total_routers,
+            (SELECT coalesce(sum(subscribers_count), 0) FROM "Routers"
+                WHERE deleted_at IS NULL) AS total_subscribers,
+            (SELECT count(*) FROM "Users"
+                WHERE deleted_at IS NULL
+                AND user_type = 'business_owner') AS total_business_owners
+        UNION ALL
+        SELECT owner_user_id, count(*), coalesce(sum(subscribers_count), 0), 0
+        FROM "Routers"
+        WHERE deleted_at IS NULL
+        GROUP BY owner_user_id
+    ),
+    counted AS (
+        SELECT
+            scope,
+            sum(total_routers) AS total_routers,
+            sum(total_subscribers) AS total_subscribers,
+            sum(total_business_owners) AS total_business_owners
+        FROM "DashboardCounters"
+        GROUP BY scope
+    ),
+    drift AS (
+        SELECT
+            coalesce(e.scope, c.scope) AS scope,
+            coalesce(e.total_routers, 0) AS total_routers,
+            coalesce(e.total_subscribers, 0) AS total_subscribers,
+            coalesce(e.total_business_owners, 0) AS total_business_owners
+        FROM expected e
+        FULL JOIN counted c ON c.scope = e.scope
+        WHERE (
+            coalesce(e.total_routers, 0),
+            coalesce(e.total_subscribers, 0),
+            coalesce(e.total_business_owners, 0)
+        ) IS DISTINCT FROM (
+            coalesce(c.total_routers, 0),
+            coalesce(c.total_subscribers, 0),
+            coalesce(c.total_business_owners, 0)
+        )
+    ),
+    cleared AS (
+        DELETE FROM "DashboardCounters" d
+        USING drift
+        WHERE d.scope = drift.scope AND d.slot <> 0
+    )
+    INSERT INTO "DashboardCounters" AS c
+        (scope, slot, total_routers, total_subscribers, total_business_owners)
+    SELECT scope, 0, total_routers, total_subscribers, total_business_owners
+    FROM drift
+    ON CONFLICT (scope, slot) DO UPDATE SET
+        total_routers = EXCLUDED.total_routers,
+        total_subscribers = EXCLUDED.total_subscribers,
+        total_business_owners = EXCLUDED.total_business_owners;
+
+    GET DIAGNOSTICS drifted = ROW_COUNT;
+    RETURN drifted;
+END;
+$$ LANGUAGE plpgsql;
+
+-- seed from the current data
+SELECT reconcile_dashboard_counters();
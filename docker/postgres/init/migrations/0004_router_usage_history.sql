@@ -0,0 +1,168 @@
+-- Router usage history. Every UPDATE of Routers that changes data_usage
+-- (single, batch or write-behind ingestion, or /router/update) appends a
+-- sample to RouterUsageSamples and folds it into the per router and per
+-- owner daily rollups. This is one statement-level trigger using
+-- transition tables, so a 10k-row batch costs three set-based writes.
+-- data_usage is cumulative: the usage of a sample is its increase over
+-- the previous value, or the whole value after a counter reset.
+-- Timestamps follow the rest of the schema: naive UTC+8.
+--
+-- RouterUsageSamples is range partitioned by day. maintain_router_usage_partitions()
+-- creates the partitions ahead of time and detaches those past the
+-- retention window, so history queries only touch the days they ask
+-- for. The app runs it periodically; detached partitions are left as
+-- plain tables to archive or drop.
+
+CREATE TABLE IF NOT EXISTS "RouterUsageSamples" (
+    router_id TEXT NOT NULL,
+    owner_user_id TEXT NOT NULL,
+    sampled_at TIMESTAMP NOT NULL,
+    data_usage DOUBLE PRECISION NOT NULL,
+    usage DOUBLE PRECISION NOT NULL,
+    subscribers_count INTEGER,
+    PRIMARY KEY (router_id, sampled_at)
+) PARTITION BY RANGE (sampled_at);
+
+-- catches samples for days without a partition; the maintenance
+-- function moves them out when it creates the day's partition
+CREATE TABLE IF NOT EXISTS "RouterUsageSamples_default"
+    PARTITION OF "RouterUsageSamples" DEFAULT;
+
+CREATE TABLE IF NOT EXISTS "RouterUsageDaily" (
+    router_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    owner_user_id TEXT NOT NULL,
+    usage DOUBLE PRECISION NOT NULL DEFAULT 0,
+    samples INTEGER NOT NULL DEFAULT 0,
+    last_data_usage DOUBLE PRECISION,
+    max_subscribers INTEGER,
+    last_sampled_at TIMESTAMP,
+    PRIMARY KEY (router_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS "OwnerUsageDaily" (
+    owner_user_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    usage DOUBLE PRECISION NOT NULL DEFAULT 0,
+    samples INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner_user_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS ix_ownerusagedaily_day ON "OwnerUsageDaily" (day);
+
+CREATE OR REPLACE FUNCTION router_usage_record() RETURNS trigger AS $$
+DECLARE
+    sampled TIMESTAMP := (clock_timestamp() AT TIME ZONE 'UTC') + interval '8 hours';
+BEGIN
+    WITH changed AS (
+        SELECT
+            n.router_id,
+            n.owner_user_id,
+            n.data_usage,
+            n.subscribers_count,
+            CASE
+                WHEN n.data_usage >= coalesce(o.data_usage, 0)
+                    THEN n.data_usage - coalesce(o.data_usage, 0)
+                ELSE n.data_usage
+            END AS usage
+        FROM router_usage_new n
+        JOIN router_usage_old o ON o.router_id = n.router_id
+        WHERE n.deleted_at IS NULL
+            AND n.data_usage IS NOT NULL
+            AND n.data_usage IS DISTINCT FROM o.data_usage
+    ),
+    samples AS (
+        INSERT INTO "RouterUsageSamples"
+            (router_id, owner_user_id, sampled_at, data_usage, usage, subscribers_count)
+        SELECT router_id, owner_user_id, sampled, data_usage, usage, subscribers_count
+        FROM changed
+        ON CONFLICT DO NOTHING
+    ),
+    routers AS (
+        INSERT INTO "RouterUsageDaily" AS d
+            (router_id, day, owner_user_id, usage, samples, last_data_usage,
+             max_subscribers, last_sampled_at)
+        SELECT router_id, sampled::date, owner_user_id, usage, 1, data_usage,
+            subscribers_count, sampled
+        FROM changed
+        ON CONFLICT (router_id, day) DO UPDATE SET
+            owner_user_id = EXCLUDED.owner_user_id,
+            usage = d.usage + EXCLUDED.usage,
+            samples = d.samples + 1,
+            last_data_usage = EXCLUDED.last_data_usage,
+            max_subscribers = greatest(d.max_subscribers, EXCLUDED.max_subscribers),
+            last_sampled_at = EXCLUDED.last_sampled_at
+    )
+    INSERT INTO "OwnerUsageDaily" AS d (owner_user_id, day, usage, samples)
+    SELECT owner_user_id, sampled::date, sum(usage), count(*)
+    FROM changed
+    GROUP BY owner_user_id
+    ON CONFLICT (owner_user_id, day) DO UPDATE SET
+        usage = d.usage + EXCLUDED.usage,
+        samples = d.samples + EXCLUDED.samples;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER router_usage_record
+    AFTER UPDATE ON "Routers"
+    REFERENCING OLD TABLE AS router_usage_old NEW TABLE AS router_usage_new
+    FOR EACH STATEMENT EXECUTE FUNCTION router_usage_record();
+
+-- Creates the daily partitions from today up to days_ahead and detaches
+-- the ones that ended more than retain_days ago. Returns the number of
+-- partitions created plus detached.
+CREATE OR REPLACE FUNCTION maintain_router_usage_partitions(
+    days_ahead INTEGER,
+    retain_days INTEGER
+) RETURNS integer AS $$
+DECLARE
+    today DATE := ((now() AT TIME ZONE 'UTC') + interval '8 hours')::date;
+    part_day DATE;
+    part_name TEXT;
+    changes INTEGER := 0;
+    expired RECORD;
+BEGIN
+    FOR i IN 0..days_ahead LOOP
+        part_day := today + i;
+        part_name := 'RouterUsageSamples_' || to_char(part_day, 'YYYYMMDD');
+        CONTINUE WHEN to_regclass(format('%I', part_name)) IS NOT NULL;
+
+        EXECUTE format(
+            'CREATE TABLE %I (LIKE "RouterUsageSamples" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+            part_name
+        );
+        -- samples that landed in the default partition before this one existed
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM "RouterUsageSamples_default"
+                WHERE sampled_at >= %L AND sampled_at < %L RETURNING *)
+            INSERT INTO %I SELECT * FROM moved',
+            part_day, part_day + 1, part_name
+        );
+        EXECUTE format(
+            'ALTER TABLE "RouterUsageSamples" ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            part_name, part_day, part_day + 1
+        );
+        changes := changes + 1;
+    END LOOP;
+
+    FOR expired IN
+        SELECT c.relname
+        FROM pg_inherits inh
+        JOIN pg_class c ON c.oid = inh.inhrelid
+        WHERE inh.inhparent = '"RouterUsageSamples"'::regclass
+            AND c.relname ~ '^RouterUsageSamples_[0-9]{8}$'
+            AND to_date(right(c.relname, 8), 'YYYYMMDD') < today - retain_days
+    LOOP
+        EXECUTE format('ALTER TABLE "RouterUsageSamples" DETACH PARTITION %I', expired.relname);
+        changes := changes + 1;
+    END LOOP;
+
+    RETURN changes;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT maintain_router_usage_partitions(7, 90);
+
+ANALYZE "RouterUsageSamples";
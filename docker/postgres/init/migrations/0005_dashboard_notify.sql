@@ -0,0 +1,21 @@
+-- NOTIFY dashboard_changed whenever the online figures (PUT
+-- /dashboard/update) or the dashboard counters change. Notifications are
+-- delivered on commit and identical ones in a transaction are folded into
+-- one, so a usage batch sends a single notification. Each app worker
+-- LISTENs once and fans the new figures out to its /dashboard/stream
+-- clients.
+
+CREATE OR REPLACE FUNCTION dashboard_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('dashboard_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER dashboard_notify
+    AFTER INSERT OR UPDATE OR DELETE ON "Dashboard"
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify();
+
+CREATE OR REPLACE TRIGGER dashboard_notify
+    AFTER INSERT OR UPDATE OR DELETE ON "DashboardCounters"
+    FOR EACH STATEMENT EXECUTE FUNCTION dashboard_notify();
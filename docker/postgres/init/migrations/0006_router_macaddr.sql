@@ -0,0 +1,65 @@
+-- Native macaddr column for router lookups by MAC. normalize_mac() reads
+-- any separator and case (aa:bb:.., AA-BB-.., aabb.ccdd.eeff, ...) and
+-- returns NULL for anything that is not a MAC. A trigger keeps "mac" in
+-- step with mac_address, which the app also stores in the canonical
+-- aa:bb:cc:dd:ee:ff form. The unique partial index makes a MAC belong
+-- to at most one live router and serves the usage ingestion lookups.
+
+ALTER TABLE "Routers" ADD COLUMN IF NOT EXISTS mac MACADDR;
+
+CREATE OR REPLACE FUNCTION normalize_mac(value TEXT) RETURNS macaddr AS $$
+    SELECT CASE WHEN digits ~ '^[0-9a-f]{12}$' THEN digits::macaddr END
+    FROM (SELECT regexp_replace(lower(value), '[[:space:]:.-]', '', 'g') AS digits) s
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION routers_set_mac() RETURNS trigger AS $$
+BEGIN
+    NEW.mac := normalize_mac(NEW.mac_address);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER routers_set_mac
+    BEFORE INSERT OR UPDATE OF mac_address ON "Routers"
+    FOR EACH ROW EXECUTE FUNCTION routers_set_mac();
+
+UPDATE "Routers"
+SET mac_address = coalesce(normalize_mac(mac_address)::text, mac_address)
+WHERE mac IS NULL OR mac_address IS DISTINCT FROM normalize_mac(mac_address)::text;
+
+-- stop before building the unique index (which would be left INVALID)
+-- if live routers share a MAC; resolve them, then re-run the migrations
+DO $$
+DECLARE
+    duplicates TEXT;
+BEGIN
+    SELECT string_agg(mac::text || ' (' || routers || ')', ', ')
+    INTO duplicates
+    FROM (
+        SELECT mac, string_agg(router_id, ', ') AS routers
+        FROM "Routers"
+        WHERE deleted_at IS NULL AND mac IS NOT NULL
+        GROUP BY mac
+        HAVING count(*) > 1
+    ) d;
+    IF duplicates IS NOT NULL THEN
+        RAISE EXCEPTION 'Live routers share a MAC address: %', duplicates;
+    END IF;
+END;
+$$;
+
+-- drop INVALID leftovers of a failed CONCURRENTLY build (see 0001)
+SELECT format('DROP INDEX CONCURRENTLY IF EXISTS %I.%I', n.nspname, c.relname)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE NOT i.indisvalid AND c.relname = 'ix_routers_active_mac'
+\gexec
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_routers_active_mac
+    ON "Routers" (mac) WHERE deleted_at IS NULL;
+
+-- replaced by ix_routers_active_mac
+DROP INDEX CONCURRENTLY IF EXISTS ix_routers_active_mac_address;
+
+ANALYZE "Routers";
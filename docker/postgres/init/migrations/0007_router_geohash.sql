@@ -0,0 +1,91 @@
+-- Geohash of each router's lat/long for /router/nearby, without PostGIS.
+-- Routers in one geohash cell share its prefix, so a btree over the
+-- column reads a cell as one range scan. The "C" collation keeps the
+-- byte order the prefix ranges rely on. geohash_encode() matches
+-- main/library/geohash.py; a trigger keeps the column in step with
+-- lat/long. Must not run inside a transaction block (CONCURRENTLY).
+
+ALTER TABLE "Routers" ADD COLUMN IF NOT EXISTS geohash TEXT COLLATE "C";
+
+CREATE OR REPLACE FUNCTION geohash_encode(
+    lat DOUBLE PRECISION,
+    lon DOUBLE PRECISION,
+    chars INTEGER DEFAULT 9
+) RETURNS TEXT AS $$
+DECLARE
+    base32 CONSTANT TEXT := '0123456789bcdefghjkmnpqrstuvwxyz';
+    lat_min DOUBLE PRECISION := -90;
+    lat_max DOUBLE PRECISION := 90;
+    lon_min DOUBLE PRECISION := -180;
+    lon_max DOUBLE PRECISION := 180;
+    mid DOUBLE PRECISION;
+    is_lon BOOLEAN := TRUE;
+    bits INTEGER := 0;
+    bit_count INTEGER := 0;
+    hash TEXT := '';
+BEGIN
+    IF lat IS NULL OR lon IS NULL
+            OR lat NOT BETWEEN -90 AND 90 OR lon NOT BETWEEN -180 AND 180 THEN
+        RETURN NULL;
+    END IF;
+
+    WHILE length(hash) < chars LOOP
+        IF is_lon THEN
+            mid := (lon_min + lon_max) / 2;
+            IF lon >= mid THEN
+                bits := bits * 2 + 1;
+                lon_min := mid;
+            ELSE
+                bits := bits * 2;
+                lon_max := mid;
+            END IF;
+        ELSE
+            mid := (lat_min + lat_max) / 2;
+            IF lat >= mid THEN
+                bits := bits * 2 + 1;
+                lat_min := mid;
+            ELSE
+                bits := bits * 2;
+                lat_max := mid;
+            END IF;
+        END IF;
+        is_lon := NOT is_lon;
+        bit_count := bit_count + 1;
+        IF bit_count = 5 THEN
+            hash := hash || substr(base32, bits + 1, 1);
+            bits := 0;
+            bit_count := 0;
+        END IF;
+    END LOOP;
+    RETURN hash;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION routers_set_geohash() RETURNS trigger AS $$
+BEGIN
+    NEW.geohash := geohash_encode(NEW.lat, NEW.long);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER routers_set_geohash
+    BEFORE INSERT OR UPDATE OF lat, long ON "Routers"
+    FOR EACH ROW EXECUTE FUNCTION routers_set_geohash();
+
+UPDATE "Routers"
+SET geohash = geohash_encode(lat, long)
+WHERE geohash IS DISTINCT FROM geohash_encode(lat, long);
+
+-- drop INVALID leftovers of a failed CONCURRENTLY build (see 0001)
+SELECT format('DROP INDEX CONCURRENTLY IF EXISTS %I.%I', n.nspname, c.relname)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE NOT i.indisvalid AND c.relname = 'ix_routers_active_geohash'
+\gexec
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_routers_active_geohash
+    ON "Routers" (geohash)
+    WHERE deleted_at IS NULL;
+
+ANALYZE "Routers";
@@ -0,0 +1,178 @@
+-- Router heatmap for /router/heatmap, kept up to date by triggers on
+-- Routers. Each zoom is a geohash length (1..6) and each cell a geohash
+-- prefix of that length, holding the live routers in it with their
+-- subscribers_count and data_usage totals. Like DashboardCounters, a cell
+-- is spread over 16 slots by a hash of the router_id so concurrent usage
+-- updates in one area do not queue on one row; readers sum the slots.
+-- The triggers are statement-level: a batch usage update changes each
+-- touched cell once. reconcile_router_heatmap() recomputes the cells
+-- from Routers and rewrites the drifted ones; the app runs it
+-- periodically.
+
+CREATE TABLE IF NOT EXISTS "RouterHeatmap" (
+    zoom SMALLINT NOT NULL,
+    cell TEXT COLLATE "C" NOT NULL,
+    slot SMALLINT NOT NULL,
+    routers INTEGER NOT NULL DEFAULT 0,
+    subscribers BIGINT NOT NULL DEFAULT 0,
+    data_usage DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (zoom, cell, slot)
+);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'router_heatmap_row') THEN
+        CREATE TYPE router_heatmap_row AS (
+            router_id TEXT,
+            geohash TEXT,
+            subscribers_count INTEGER,
+            data_usage DOUBLE PRECISION
+        );
+    END IF;
+END;
+$$;
+
+-- subtract the old rows and add the new ones, netted per slot of a cell
+CREATE OR REPLACE FUNCTION router_heatmap_add(
+    old_rows router_heatmap_row[],
+    new_rows router_heatmap_row[]
+) RETURNS void AS $$
+    INSERT INTO "RouterHeatmap" AS h
+        (zoom, cell, slot, routers, subscribers, data_usage)
+    SELECT
+        z.zoom,
+        left(r.geohash, z.zoom),
+        hashtext(r.router_id) & 15,
+        sum(r.sign),
+        sum(r.sign * coalesce(r.subscribers_count, 0)),
+        sum(r.sign * coalesce(r.data_usage, 0))
+    FROM (
+        SELECT -1 AS sign, * FROM unnest(old_rows)
+        UNION ALL
+        SELECT 1, * FROM unnest(new_rows)
+    ) r
+    CROSS JOIN generate_series(1, 6) AS z(zoom)
+    GROUP BY 1, 2, 3
+    HAVING sum(r.sign) <> 0
+        OR sum(r.sign * coalesce(r.subscribers_count, 0)) <> 0
+        OR sum(r.sign * coalesce(r.data_usage, 0)) <> 0
+    -- a fixed order so concurrent statements lock rows in the same order
+    ORDER BY 1, 2, 3
+    ON CONFLICT (zoom, cell, slot) DO UPDATE SET
+        routers = h.routers + EXCLUDED.routers,
+        subscribers = h.subscribers + EXCLUDED.subscribers,
+        data_usage = h.data_usage + EXCLUDED.data_usage;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION router_heatmap_router() RETURNS trigger AS $$
+DECLARE
+    old_rows router_heatmap_row[];
+    new_rows router_heatmap_row[];
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        old_rows := ARRAY(
+            SELECT (router_id, geohash, subscribers_count, data_usage)::router_heatmap_row
+            FROM router_heatmap_old
+            WHERE deleted_at IS NULL AND geohash IS NOT NULL
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        new_rows := ARRAY(
+            SELECT (router_id, geohash, subscribers_count, data_usage)::router_heatmap_row
+            FROM router_heatmap_new
+            WHERE deleted_at IS NULL AND geohash IS NOT NULL
+        );
+    END IF;
+    IF cardinality(old_rows) > 0 OR cardinality(new_rows) > 0 THEN
+        PERFORM router_heatmap_add(old_rows, new_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER router_heatmap_insert
+    AFTER INSERT ON "Routers"
+    REFERENCING NEW TABLE AS router_heatmap_new
+    FOR EACH STATEMENT EXECUTE FUNCTION router_heatmap_router();
+
+CREATE OR REPLACE TRIGGER router_heatmap_update
+    AFTER UPDATE ON "Routers"
+    REFERENCING OLD TABLE AS router_heatmap_old NEW TABLE AS router_heatmap_new
+    FOR EACH STATEMENT EXECUTE FUNCTION router_heatmap_router();
+
+CREATE OR REPLACE TRIGGER router_heatmap_delete
+    AFTER DELETE ON "Routers"
+    REFERENCING OLD TABLE AS router_heatmap_old
+    FOR EACH STATEMENT EXECUTE FUNCTION router_heatmap_router();
+
+-- Returns how many cells had drifted. The table lock works as in
+-- reconcile_dashboard_counters(). data_usage sums are floats, so only a
+-- difference beyond rounding counts as drift.
+CREATE OR REPLACE FUNCTION reconcile_router_heatmap() RETURNS integer AS $$
+DECLARE
+    drifted INTEGER;
+BEGIN
+    LOCK TABLE "RouterHeatmap" IN SHARE ROW EXCLUSIVE MODE;
+
+    WITH expected AS (
+        SELECT
+            z.zoom,
+            left(r.geohash, z.zoom) AS cell,
+            count(*) AS routers,
+            coalesce(sum(r.subscribers_count), 0) AS subscribers,
+            coalesce(sum(r.data_usage), 0) AS data_usage
+        FROM "Routers" r
+        CROSS JOIN generate_series(1, 6) AS z(zoom)
+        WHERE r.deleted_at IS NULL AND r.geohash IS NOT NULL
+        GROUP BY 1, 2
+    ),
+    counted AS (
+        SELECT
+            zoom,
+            cell,
+            sum(routers) AS routers,
+            sum(subscribers) AS subscribers,
+            sum(data_usage) AS data_usage
+        FROM "RouterHeatmap"
+        GROUP BY zoom, cell
+    ),
+    drift AS (
+        SELECT
+            coalesce(e.zoom, c.zoom) AS zoom,
+            coalesce(e.cell, c.cell) AS cell,
+            coalesce(e.routers, 0) AS routers,
+            coalesce(e.subscribers, 0) AS subscribers,
+            coalesce(e.data_usage, 0) AS data_usage
+        FROM expected e
+        FULL JOIN counted c ON c.zoom = e.zoom AND c.cell = e.cell
+        WHERE coalesce(e.routers, 0) <> coalesce(c.routers, 0)
+            OR coalesce(e.subscribers, 0) <> coalesce(c.subscribers, 0)
+            OR abs(coalesce(e.data_usage, 0) - coalesce(c.data_usage, 0))
+                > 1e-9 * greatest(abs(coalesce(e.data_usage, 0)), 1)
+    ),
+    cleared AS (
+        DELETE FROM "RouterHeatmap" h
+        USING drift
+        WHERE h.zoom = drift.zoom AND h.cell = drift.cell AND h.slot <> 0
+    )
+    INSERT INTO "RouterHeatmap" AS h
+        (zoom, cell, slot, routers, subscribers, data_usage)
+    SELECT zoom, cell, 0, routers, subscribers, data_usage
+    FROM drift
+    ON CONFLICT (zoom, cell, slot) DO UPDATE SET
+        routers = EXCLUDED.routers,
+        subscribers = EXCLUDED.subscribers,
+        data_usage = EXCLUDED.data_usage;
+
+    GET DIAGNOSTICS drifted = ROW_COUNT;
+
+    -- cells every router has left
+    DELETE FROM "RouterHeatmap"
+    WHERE routers = 0 AND subscribers = 0 AND data_usage = 0;
+
+    RETURN drifted;
+END;
+$$ LANGUAGE plpgsql;
+
+-- seed from the current data
+SELECT reconcile_router_heatmap();
@@ -0,0 +1,29 @@
+-- Export jobs for POST /export. Each row is one requested download: the
+-- list and filters it renders, its progress, and where the finished file
+-- is kept. Workers claim queued rows with FOR UPDATE SKIP LOCKED, oldest
+-- first, over ix_export_jobs_status_created_at. Timestamps are naive
+-- UTC+8 like the rest of the schema.
+
+CREATE TABLE IF NOT EXISTS "ExportJobs" (
+    export_id TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    filters JSONB NOT NULL DEFAULT '{}',
+    file_type TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    total_rows BIGINT,
+    rows_written BIGINT NOT NULL DEFAULT 0,
+    size_bytes BIGINT,
+    storage TEXT,
+    location TEXT,
+    error TEXT,
+    created_by TEXT,
+    created_at TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    updated_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_export_jobs_status_created_at
+    ON "ExportJobs" (status, created_at);
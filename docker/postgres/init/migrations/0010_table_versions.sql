@@ -0,0 +1,43 @@
+-- Change counters for the download cache (main/library/exporter.py). A
+-- statement-level trigger on each cached table bumps a counter in the
+-- writing transaction, so the counter moves exactly when the change
+-- becomes visible, whatever updated_at the app put on the rows. Like
+-- DashboardCounters, a table's counter is spread over 16 slots, picked
+-- by backend, so concurrent writers do not queue on one row; its version
+-- is the sum of the slots, which every committed write increases.
+
+CREATE TABLE IF NOT EXISTS "TableVersions" (
+    table_name TEXT NOT NULL,
+    slot SMALLINT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, slot)
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO "TableVersions" AS v (table_name, slot, version)
+    VALUES (TG_TABLE_NAME, pg_backend_pid() % 16, 1)
+    ON CONFLICT (table_name, slot) DO UPDATE SET version = v.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    cached TEXT;
+BEGIN
+    FOREACH cached IN ARRAY ARRAY['Routers', 'Users', 'Tiers', 'Promos'] LOOP
+        INSERT INTO "TableVersions" (table_name, slot, version)
+        VALUES (cached, 0, 0)
+        ON CONFLICT DO NOTHING;
+
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER %I
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+                FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()',
+            lower(cached) || '_bump_version',
+            cached
+        );
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,50 @@
+-- Btree indexes for the number and date branches of the list endpoints'
+-- `search` filter. A term such as 2025-08 or >=1024 adds typed
+-- comparisons to the trigram ilike clauses in one OR, and the planner can
+-- only combine the branches into a BitmapOr when every one is indexed.
+-- The date columns carry index=True on the models, which the restored
+-- schema never got, so they keep the names SQLAlchemy gives them.
+-- Users.data_usage, Routers.data_usage and Routers.subscribers_count stay
+-- unindexed: usage reports rewrite them constantly and an index would
+-- turn those HOT updates into full ones. Searches hitting them scan.
+-- Must not run inside a transaction block (CONCURRENTLY).
+
+-- drop INVALID leftovers of a failed CONCURRENTLY build (see 0001)
+SELECT format('DROP INDEX CONCURRENTLY IF EXISTS %I.%I', n.nspname, c.relname)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE NOT i.indisvalid AND c.relname IN (
+    'ix_Tiers_data_limit',
+    'ix_Users_created_at',
+    'ix_Users_data_limit',
+    'ix_Transactions_created_at',
+    'ix_Transactions_amount',
+    'ix_MobileOtp_created_at'
+)
+\gexec
+
+-- subscriber_tiers
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_Tiers_data_limit"
+    ON "Tiers" (data_limit);
+
+-- user_list
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_Users_created_at"
+    ON "Users" (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_Users_data_limit"
+    ON "Users" (data_limit);
+
+-- payment_transaction_list
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_Transactions_created_at"
+    ON "Transactions" (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_Transactions_amount"
+    ON "Transactions" (amount);
+
+-- sent_otp_list
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_MobileOtp_created_at"
+    ON "MobileOtp" (created_at);
+
+ANALYZE "Tiers";
+ANALYZE "Users";
+ANALYZE "Transactions";
+ANALYZE "MobileOtp";
@@ -38,6 +38,7 @@ def main():
     try:
         # Import the FastAPI app
         from app import app
+        from main.core.config import settings
         print("✅ FastAPI app imported successfully")
         
         # Import uvicorn
@@ -54,7 +55,8 @@ def main():
             app, 
             host='0.0.0.0', 
             port=port, 
-            log_level='info'
+            log_level='info',
+            timeout_graceful_shutdown=settings.SHUTDOWN_GRACE_SECONDS
         )
         
     except Exception as e:
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from sqlalchemy import text
+from main.db.dbpostgres.session import AsyncSessionLocal, async_engine
+
+
+class Job:
+
+    def __init__(self, name: str, interval: float, fn):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at = None
+        self.last_duration = None
+        self.last_result = None
+        self.last_error = None
+
+    def stats(self):
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at,
+            "last_duration_ms": round(self.last_duration * 1000, 2)
+                if self.last_duration is not None else None,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+
+class BackgroundJobs:
+    """
+    Periodic coroutines started and stopped with the app's lifespan. A job
+    first runs one interval after startup; a failed run is logged and the
+    job carries on at the next interval. Shutdown hooks run once the jobs
+    are stopped, e.g. to flush buffered writes.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.tasks = []
+        self.shutdown_hooks = []
+
+    def every(self, name: str, seconds: float, fn):
+        """
+        Register the coroutine function fn to run every `seconds`. A
+        non-positive interval leaves the job disabled.
+        """
+        if seconds and seconds > 0:
+            self.jobs[name] = Job(name, seconds, fn)
+
+    def on_shutdown(self, fn):
+        self.shutdown_hooks.append(fn)
+
+    async def run(self, job: Job):
+        while True:
+            await asyncio.sleep(job.interval)
+            started = time.perf_counter()
+            job.last_run_at = datetime.now(timezone.utc).isoformat()
+            try:
+                job.last_result = await job.fn()
+                job.last_error = None
+                job.runs += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.exception("Background job %s failed", job.name)
+                job.last_error = str(e)
+                job.failures += 1
+            job.last_duration = time.perf_counter() - started
+
+    async def start(self):
+        self.tasks = [
+            asyncio.create_task(self.run(job), name=f"job:{job.name}")
+            for job in self.jobs.values()
+        ]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        for fn in self.shutdown_hooks:
+            try:
+                await fn()
+            except Exception:
+                logging.exception("Shutdown hook %s failed", getattr(fn, "__qualname__", fn))
+
+    def stats(self):
+        return {name: job.stats() for name, job in self.jobs.items()}
+
+
+async def run_exclusive(lock_key: int, statement: str, params: dict = None):
+    """
+    Run statement in its own transaction on the primary while holding the
+    advisory lock lock_key, so only one worker runs it at a time. Returns
+    its scalar result, or None when another worker holds the lock.
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            locked = (
+                await db.execute(
+                    text("SELECT pg_try_advisory_xact_lock(:key)"),
+                    {"key": lock_key}
+                )
+            ).scalar()
+            if not locked:
+                return None
+            return (await db.execute(text(statement), params or {})).scalar()
+
+
+class AdvisoryLeader:
+    """
+    Elects one worker across the deployment for a job: the first worker
+    to take the session-level advisory lock lock_key keeps it, on a
+    dedicated connection, until it shuts down or the connection drops.
+    Then another worker takes over on its next call.
+    """
+
+    def __init__(self, lock_key: int):
+        self.lock_key = lock_key
+        self.connection = None
+
+    async def is_leader(self) -> bool:
+        if self.connection is not None:
+            try:
+                await self.connection.execute(text("SELECT 1"))
+                await self.connection.commit()
+                return True
+            except Exception as e:
+                logging.warning("Lost advisory lock %s: %s", self.lock_key, e)
+                await self.release()
+
+        connection = await async_engine.connect()
+        try:
+            locked = (
+                await connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"),
+                    {"key": self.lock_key}
+                )
+            ).scalar()
+            await connection.commit()
+        except Exception:
+            await connection.close()
+            raise
+        if not locked:
+            await connection.close()
+            return False
+        self.connection = connection
+        return True
+
+    async def release(self):
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        try:
+            # closing alone would return it to the pool with the lock held
+            await connection.invalidate()
+            await connection.close()
+        except Exception:
+            pass
+
+
+jobs = BackgroundJobs()
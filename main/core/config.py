@@ -9,6 +9,36 @@ from pydantic import (
     ValidationInfo
 )
 
+# Engine profiles. pool_size and max_overflow are the connection budget
+# for the whole deployment per database server. It is split across the
+# web workers, then between each worker's sync and async engines.
+DB_ENGINE_PROFILES = {
+    "dev": {
+        "echo": True,
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_recycle": 120,
+        "statement_timeout_ms": 0,
+        "application_name": "zeep-backend-dev",
+    },
+    "prod": {
+        "echo": False,
+        "pool_size": 40,
+        "max_overflow": 20,
+        "pool_recycle": 1800,
+        "statement_timeout_ms": 30000,
+        "application_name": "zeep-backend",
+    },
+    "bench": {
+        "echo": False,
+        "pool_size": 80,
+        "max_overflow": 0,
+        "pool_recycle": 1800,
+        "statement_timeout_ms": 10000,
+        "application_name": "zeep-backend-bench",
+    },
+}
+
 class Settings(BaseSettings):
 
     SECRET: str
@@ -32,10 +62,94 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_PORT: str
     SQLALCHEMY_DATABASE_URI: Optional[PostgresDsn] = None
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[PostgresDsn] = None
+
+    POSTGRES_REPLICA_SERVER: Optional[str] = None
+    POSTGRES_REPLICA_USER: Optional[str] = None
+    POSTGRES_REPLICA_PASSWORD: Optional[str] = None
+    POSTGRES_REPLICA_DB: Optional[str] = None
+    POSTGRES_REPLICA_PORT: Optional[str] = None
+    POSTGRES_REPLICA_MAX_LAG_SECONDS: float = 10
+    POSTGRES_REPLICA_LAG_CHECK_SECONDS: float = 5
+    SQLALCHEMY_REPLICA_DATABASE_URI: Optional[PostgresDsn] = None
+    SQLALCHEMY_ASYNC_REPLICA_DATABASE_URI: Optional[PostgresDsn] = None
 
     PAYCONNECT_BASEURL: str
     PAYCONNECT_AUTH: str
     ACS_DEFAULT_GROUP: str
+
+    LIST_MAX_PAGE_SIZE: int = 1000
+    LIST_COUNT_CAP: int = 10000
+    # how long /router/list fleet totals are reused, 0 disables
+    ROUTER_TOTALS_CACHE_SECONDS: float = 5
+    # how often the dashboard counters are recounted from Routers and
+    # Users to correct drift, 0 disables
+    DASHBOARD_RECONCILE_SECONDS: float = 600
+    # most records one /router/update/usage/batch call may carry
+    ROUTER_USAGE_BATCH_MAX_ITEMS: int = 20000
+    # MAC -> router_id cache of the usage ingestion path
+    ROUTER_MAC_CACHE_SIZE: int = 100000
+    ROUTER_MAC_CACHE_SECONDS: float = 300
+    # largest radius /router/nearby searches
+    ROUTER_NEARBY_MAX_RADIUS_KM: float = 50
+    # most cells one /router/heatmap response holds; a box too large for
+    # the zoom is served from coarser cells
+    ROUTER_HEATMAP_MAX_CELLS: int = 2000
+    # how often the heatmap is recomputed from Routers to correct drift,
+    # 0 disables
+    ROUTER_HEATMAP_RECONCILE_SECONDS: float = 3600
+    # write-behind for /router/update/usage: samples are acknowledged at
+    # once and the latest per router and device is written in bulk every
+    # ROUTER_USAGE_FLUSH_SECONDS or once ROUTER_USAGE_FLUSH_ENTRIES wait
+    ROUTER_USAGE_WRITE_BEHIND: bool = False
+    ROUTER_USAGE_FLUSH_SECONDS: float = 2
+    ROUTER_USAGE_FLUSH_ENTRIES: int = 5000
+    ROUTER_USAGE_BUFFER_MAX_ENTRIES: int = 50000
+    # daily RouterUsageSamples partitions: created this many days ahead,
+    # detached once older than the retention, checked every interval
+    ROUTER_USAGE_PARTITIONS_AHEAD_DAYS: int = 7
+    ROUTER_USAGE_RETENTION_DAYS: int = 90
+    ROUTER_USAGE_PARTITION_MAINTENANCE_SECONDS: float = 3600
+    # rows a download reads from its server-side cursor at a time
+    EXPORT_BATCH_ROWS: int = 2000
+    # POST /export jobs: rendered by EXPORT_JOB_WORKERS threads per web
+    # worker and kept in EXPORT_DIR ("local") or IBM COS ("cos") for
+    # EXPORT_JOB_RETENTION_HOURS. A running job whose progress has not
+    # moved for EXPORT_JOB_STALE_SECONDS is taken over by another worker.
+    EXPORT_JOB_WORKERS: int = 2
+    EXPORT_STORAGE: str = "local"
+    EXPORT_DIR: str = "exports"
+    EXPORT_JOB_RETENTION_HOURS: float = 24
+    EXPORT_JOB_POLL_SECONDS: float = 30
+    EXPORT_JOB_PROGRESS_SECONDS: float = 2
+    EXPORT_JOB_STALE_SECONDS: float = 300
+    # rendered router, tier and promo downloads kept on disk and served
+    # again until their tables change, 0 bytes disables
+    EXPORT_CACHE_DIR: str = "export_cache"
+    EXPORT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    # longest range /router/usage/history and /dashboard/usage/daily serve
+    USAGE_HISTORY_MAX_DAYS: int = 366
+    # /dashboard/stream: least time between two pushes, re-read interval
+    # without notifications, and keep-alive comment interval
+    DASHBOARD_STREAM_MIN_INTERVAL_SECONDS: float = 1
+    DASHBOARD_STREAM_REFRESH_SECONDS: float = 30
+    DASHBOARD_STREAM_KEEPALIVE_SECONDS: float = 15
+    # poll the ACS for the online dashboard figures every N seconds
+    # instead of waiting for PUT /dashboard/update, 0 disables
+    ACS_DASHBOARD_POLL_SECONDS: float = 0
+    ACS_DASHBOARD_POLL_TIMEOUT_SECONDS: float = 5
+    # how long shutdown waits for open requests (e.g. streams) before
+    # cancelling them and running the shutdown hooks
+    SHUTDOWN_GRACE_SECONDS: int = 10
+
+    DB_PROFILE: str = "prod"
+    WEB_CONCURRENCY: int = 1
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    # part of each worker's pool given to the asyncpg engine
+    DB_ASYNC_POOL_SHARE: float = 0.25
+    DB_STATEMENT_TIMEOUT_MS: Optional[int] = None
+    DB_APPLICATION_NAME: Optional[str] = None
     
     @field_validator("SQLALCHEMY_DATABASE_URI", mode="before")
     def assemble_db_connection(cls, v: Optional[str], info: ValidationInfo) -> Any:
@@ -49,6 +163,69 @@ class Settings(BaseSettings):
         db = data.get("POSTGRES_DB")
         return f"postgresql://{user}:{password}@{host}:{port}/{db}"
 
+    @field_validator("SQLALCHEMY_ASYNC_DATABASE_URI", mode="before")
+    def assemble_async_db_connection(cls, v: Optional[str], info: ValidationInfo) -> Any:
+        if isinstance(v, str):
+            return v
+        data = info.data
+        user = data.get("POSTGRES_USER")
+        password = data.get("POSTGRES_PASSWORD")
+        host = data.get("POSTGRES_SERVER")
+        port = data.get("POSTGRES_PORT")
+        db = data.get("POSTGRES_DB")
+        return f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{db}"
+
+    @field_validator(
+        "SQLALCHEMY_REPLICA_DATABASE_URI",
+        "SQLALCHEMY_ASYNC_REPLICA_DATABASE_URI",
+        mode="before"
+    )
+    def assemble_replica_db_connection(cls, v: Optional[str], info: ValidationInfo) -> Any:
+        if isinstance(v, str):
+            return v
+        data = info.data
+        host = data.get("POSTGRES_REPLICA_SERVER")
+        if not host:
+            return None
+        # anything not set for the replica is taken from the primary
+        user = data.get("POSTGRES_REPLICA_USER") or data.get("POSTGRES_USER")
+        password = data.get("POSTGRES_REPLICA_PASSWORD") or data.get("POSTGRES_PASSWORD")
+        port = data.get("POSTGRES_REPLICA_PORT") or data.get("POSTGRES_PORT")
+        db = data.get("POSTGRES_REPLICA_DB") or data.get("POSTGRES_DB")
+        scheme = "postgresql+asyncpg" \
+            if info.field_name == "SQLALCHEMY_ASYNC_REPLICA_DATABASE_URI" \
+            else "postgresql"
+        return f"{scheme}://{user}:{password}@{host}:{port}/{db}"
+
+    def db_engine_profile(self, is_async: bool = False) -> Dict[str, Any]:
+        if self.DB_PROFILE not in DB_ENGINE_PROFILES:
+            raise ValueError(f"Unknown DB_PROFILE '{self.DB_PROFILE}'")
+
+        profile = dict(DB_ENGINE_PROFILES[self.DB_PROFILE])
+        workers = max(1, self.WEB_CONCURRENCY)
+        pool_size = max(2, self.DB_POOL_SIZE or \
+            profile["pool_size"] // workers)
+        max_overflow = self.DB_MAX_OVERFLOW \
+            if self.DB_MAX_OVERFLOW is not None \
+            else profile["max_overflow"] // workers
+
+        # the worker's budget is shared by its sync and async engines,
+        # each keeping at least one pooled connection
+        share = min(max(self.DB_ASYNC_POOL_SHARE, 0.0), 1.0)
+        async_pool_size = min(max(1, round(pool_size * share)), pool_size - 1)
+        async_max_overflow = round(max_overflow * share)
+        if is_async:
+            profile["pool_size"] = async_pool_size
+            profile["max_overflow"] = async_max_overflow
+        else:
+            profile["pool_size"] = pool_size - async_pool_size
+            profile["max_overflow"] = max_overflow - async_max_overflow
+        if self.DB_STATEMENT_TIMEOUT_MS is not None:
+            profile["statement_timeout_ms"] = self.DB_STATEMENT_TIMEOUT_MS
+        if self.DB_APPLICATION_NAME is not None:
+            profile["application_name"] = self.DB_APPLICATION_NAME
+        return profile
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
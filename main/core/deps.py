@@ -1,5 +1,7 @@
-from typing import Generator
-from main.db.dbpostgres.session import SessionLocal
+from typing import AsyncGenerator, Generator
+from fastapi import Header
+from main.db.dbpostgres.session import SessionLocal, AsyncSessionLocal, \
+    ReadSessionLocal, AsyncReadSessionLocal
 
 
 def get_db() -> Generator:
@@ -7,4 +9,35 @@ def get_db() -> Generator:
         db = SessionLocal()
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db(
+    x_primary_only: bool = Header(False),
+) -> Generator:
+    """
+    Session for read-only routes. Reads go to the replica when one is
+    configured and not lagging; send `x-primary-only: true` to force the
+    primary for a request that must see its own writes.
+    """
+    try:
+        db = ReadSessionLocal()
+        db.info["read_only"] = True
+        db.info["primary_only"] = x_primary_only
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(
+    x_primary_only: bool = Header(False),
+) -> AsyncGenerator:
+    async with AsyncReadSessionLocal() as db:
+        db.info["read_only"] = True
+        db.info["primary_only"] = x_primary_only
+        yield db
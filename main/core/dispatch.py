@@ -0,0 +1,126 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from main.db.dbpostgres.session import options
+
+
+# Share of the worker pool (in percent) each route group may occupy.
+# Downloads get a small slice so an export burst cannot take the
+# connections that logins and lookups need.
+GROUP_SHARES = {
+    "auth": 15,
+    "user": 15,
+    "router": 15,
+    "transaction": 10,
+    "otp": 10,
+    "promo": 5,
+    "dashboard": 10,
+    "download": 10,
+    "default": 10,
+}
+
+
+class RouteGroup:
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self):
+        finished = self.completed + self.failed
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / finished * 1000, 2) if finished else 0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+
+class Dispatcher:
+    """
+    Runs synchronous controller calls in a bounded thread pool instead of
+    on the event loop. Every route group has its own concurrency limit.
+    """
+
+    def __init__(self, workers: int, shares: dict):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="controller"
+        )
+        self.groups = {
+            name: RouteGroup(name, max(1, workers * share // 100))
+            for name, share in shares.items()
+        }
+        self.loop = None
+
+    async def run(self, group: str, fn, *args, **kwargs):
+        route_group = self.groups.get(group) or self.groups["default"]
+        self.loop = asyncio.get_running_loop()
+
+        queued_at = time.perf_counter()
+        route_group.waiting += 1
+        route_group.max_waiting = max(route_group.max_waiting, route_group.waiting)
+        try:
+            await route_group.semaphore.acquire()
+        finally:
+            route_group.waiting -= 1
+
+        waited = time.perf_counter() - queued_at
+        route_group.total_wait += waited
+        route_group.max_wait = max(route_group.max_wait, waited)
+        route_group.in_flight += 1
+        try:
+            result = await self.loop.run_in_executor(
+                self.executor,
+                functools.partial(fn, *args, **kwargs)
+            )
+            route_group.completed += 1
+            return result
+        except Exception:
+            route_group.failed += 1
+            raise
+        finally:
+            route_group.in_flight -= 1
+            route_group.semaphore.release()
+
+    def spawn(self, coro):
+        """
+        Schedule a fire-and-forget coroutine on the event loop. Works from
+        the loop itself and from the controller worker threads.
+        """
+        try:
+            return asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            pass
+        if self.loop is None:
+            raise RuntimeError("Dispatcher has no event loop to schedule on")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "groups": {
+                name: group.stats() for name, group in self.groups.items()
+            }
+        }
+
+
+# one worker per connection the sync engine can hand out
+dispatcher = Dispatcher(
+    workers=options["pool_size"] + options["max_overflow"],
+    shares=GROUP_SHARES
+)
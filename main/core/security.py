@@ -1,6 +1,6 @@
 import jwt
 from jwt.exceptions import InvalidSignatureError
-from fastapi import Header, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from typing import Generator
 from main.core.config import Settings
 
@@ -28,3 +28,14 @@ async def jwt_required(
             status_code=status.HTTP_401_UNAUTHORIZED, \
             detail="Invalid Token"
         )
+
+
+async def admin_required(
+    current_user: dict = Depends(jwt_required),
+) -> dict:
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, \
+            detail="Admin access required"
+        )
+    return current_user
@@ -1,5 +1,6 @@
 from typing import Any
 
+from sqlalchemy import Index, text
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
 
 
@@ -14,3 +15,30 @@ class Base:
 
     def as_dict(self):
        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+
+
+def trigram_index(table: str, column: str) -> Index:
+    """
+    GIN pg_trgm index so ilike('%term%') searches on the column can use an
+    index. Created by docker/postgres/init/migrations.
+    """
+    return Index(
+        f"ix_{table.lower()}_{column}_trgm",
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column: "gin_trgm_ops"}
+    )
+
+
+def active_index(name: str, *columns: str, unique: bool = False) -> Index:
+    """
+    Partial btree index over the rows that are not soft-deleted, for
+    queries that filter deleted_at IS NULL. A column may carry an order,
+    e.g. "updated_at DESC", to match the list ordering.
+    """
+    return Index(
+        name,
+        *(text(column) if " " in column else column for column in columns),
+        unique=unique,
+        postgresql_where=text("deleted_at IS NULL")
+    )
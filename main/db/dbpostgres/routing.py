@@ -0,0 +1,126 @@
+import logging
+import threading
+import time
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+
+# replay lag is zero when everything received has been replayed; otherwise
+# measure it from the last replayed transaction
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+""")
+
+
+class ReplicaLagGuard:
+    """
+    Caches the replica's replay lag for a few seconds. Reads fall back to
+    the primary while the lag is over the limit or the replica is down.
+    """
+
+    def __init__(self, engine, max_lag: float, check_interval: float):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.lag = None
+        self.healthy = False
+        self.checked_at = 0.0
+
+    def is_stale(self):
+        return time.monotonic() - self.checked_at >= self.check_interval
+
+    def check(self):
+        if not self.lock.acquire(blocking=False):
+            # another thread is already checking, use the last result
+            return self.healthy
+        try:
+            if not self.is_stale():
+                return self.healthy
+            try:
+                with self.engine.connect() as connection:
+                    self.lag = float(connection.execute(LAG_QUERY).scalar() or 0)
+                self.healthy = self.lag <= self.max_lag
+            except Exception as e:
+                logging.warning("Replica lag check failed: %s", e)
+                self.lag = None
+                self.healthy = False
+            self.checked_at = time.monotonic()
+            return self.healthy
+        finally:
+            self.lock.release()
+
+    def is_healthy(self, blocking: bool = True):
+        if not self.is_stale():
+            return self.healthy
+        if blocking:
+            return self.check()
+        # on the event loop: refresh in the background, answer from cache
+        if not self.lock.locked():
+            threading.Thread(target=self.check, daemon=True).start()
+        return self.healthy
+
+    def stats(self):
+        return {
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+        }
+
+
+class RoutingSession(Session):
+    """
+    Sends reads of a read-only session to the replica. Everything else, and
+    every statement after the session has flushed, goes to the primary.
+
+    session.info flags:
+        read_only: the request only reads, the replica may serve it
+        primary_only: per-request override that pins reads to the primary
+    """
+
+    primary = None
+    replica = None
+    guard = None
+    blocking_guard = True
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.use_replica():
+            return self.replica
+        return self.primary
+
+    def use_replica(self):
+        if self.replica is None or self._flushing:
+            return False
+        if not self.info.get("read_only") or self.info.get("primary_only") \
+                or self.info.get("has_written"):
+            return False
+        return self.guard.is_healthy(blocking=self.blocking_guard)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def mark_written(session, flush_context):
+    # read-after-write: stay on the primary for the rest of the session
+    session.info["has_written"] = True
+
+
+def routing_session_class(primary, replica=None, guard=None, is_async=False):
+    """
+    Build a RoutingSession bound to the given engines. For AsyncSession
+    pass the .sync_engine of the async engines and is_async=True so the
+    lag check never blocks the event loop.
+    """
+    return type(
+        "RoutingSession",
+        (RoutingSession,),
+        {
+            "primary": primary,
+            "replica": replica,
+            "guard": guard,
+            "blocking_guard": not is_async,
+        }
+    )
@@ -1,15 +1,125 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 from main.core.config import settings
+from main.db.dbpostgres.telemetry import PoolStats, TimedQueuePool, \
+    TimedAsyncQueuePool
+from main.db.dbpostgres.routing import ReplicaLagGuard, routing_session_class
 
-options = {
-    "echo": True,
-    "pool_pre_ping": True,
-    "pool_recycle": 120,
-    "pool_size": 10,
-    "max_overflow": 20,
+profile = settings.db_engine_profile()
+
+
+def engine_options(is_async: bool = False):
+    engine_profile = settings.db_engine_profile(is_async=is_async)
+    return {
+        "echo": engine_profile["echo"],
+        "pool_pre_ping": True,
+        "pool_recycle": engine_profile["pool_recycle"],
+        "pool_size": engine_profile["pool_size"],
+        "max_overflow": engine_profile["max_overflow"],
+    }
+
+
+# sync and async engines split the worker's pool budget; a replica
+# engine gets the same split against its own server
+options = engine_options()
+async_options = engine_options(is_async=True)
+
+
+def connect_args(is_async: bool = False):
+    server_settings = {}
+    if profile["application_name"]:
+        server_settings["application_name"] = profile["application_name"]
+    if profile["statement_timeout_ms"]:
+        server_settings["statement_timeout"] = str(profile["statement_timeout_ms"])
+
+    if is_async:
+        return {"server_settings": server_settings}
+
+    args = {}
+    if "application_name" in server_settings:
+        args["application_name"] = server_settings["application_name"]
+    if "statement_timeout" in server_settings:
+        args["options"] = f"-c statement_timeout={server_settings['statement_timeout']}"
+    return args
+
+
+engine = create_engine(
+    url=str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=TimedQueuePool,
+    connect_args=connect_args(),
+    **options
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# asyncpg engine for routes that await their queries instead of
+# blocking the event loop
+async_engine = create_async_engine(
+    url=str(settings.SQLALCHEMY_ASYNC_DATABASE_URI),
+    poolclass=TimedAsyncQueuePool,
+    connect_args=connect_args(is_async=True),
+    **async_options
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# optional streaming replica for read-only list, export and dashboard
+# paths; without POSTGRES_REPLICA_SERVER every read stays on the primary
+replica_engine = None
+async_replica_engine = None
+replica_guard = None
+if settings.SQLALCHEMY_REPLICA_DATABASE_URI:
+    replica_engine = create_engine(
+        url=str(settings.SQLALCHEMY_REPLICA_DATABASE_URI),
+        poolclass=TimedQueuePool,
+        connect_args=connect_args(),
+        **options
+    )
+    async_replica_engine = create_async_engine(
+        url=str(settings.SQLALCHEMY_ASYNC_REPLICA_DATABASE_URI),
+        poolclass=TimedAsyncQueuePool,
+        connect_args=connect_args(is_async=True),
+        **async_options
+    )
+    replica_guard = ReplicaLagGuard(
+        engine=replica_engine,
+        max_lag=settings.POSTGRES_REPLICA_MAX_LAG_SECONDS,
+        check_interval=settings.POSTGRES_REPLICA_LAG_CHECK_SECONDS
+    )
+
+ReadSessionLocal = sessionmaker(
+    class_=routing_session_class(
+        primary=engine,
+        replica=replica_engine,
+        guard=replica_guard
+    ),
+    autocommit=False,
+    autoflush=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    sync_session_class=routing_session_class(
+        primary=async_engine.sync_engine,
+        replica=async_replica_engine.sync_engine if async_replica_engine else None,
+        guard=replica_guard,
+        is_async=True
+    ),
+    autoflush=False,
+    expire_on_commit=False
+)
+
+engines = {
+    "primary": engine,
+    "async": async_engine.sync_engine,
 }
+if replica_engine:
+    engines["replica"] = replica_engine
+    engines["async_replica"] = async_replica_engine.sync_engine
 
-engine = create_engine(url=str(settings.SQLALCHEMY_DATABASE_URI), **options)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+pool_stats = {
+    name: PoolStats(name).attach(pool_engine)
+    for name, pool_engine in engines.items()
+}
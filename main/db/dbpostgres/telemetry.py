@@ -0,0 +1,125 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+# upper bounds (ms) of the checkout wait histogram buckets
+WAIT_BUCKETS_MS = (1, 10, 100, 1000, 5000)
+
+
+class PoolStats:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidated = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def record_wait(self, seconds: float):
+        waited_ms = seconds * 1000
+        bucket = len(WAIT_BUCKETS_MS)
+        for index, bound in enumerate(WAIT_BUCKETS_MS):
+            if waited_ms <= bound:
+                bucket = index
+                break
+        with self.lock:
+            self.waits += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self.wait_buckets[bucket] += 1
+
+    def record_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def attach(self, engine):
+        pool = engine.pool
+        pool.stats = self
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            with self.lock:
+                self.connects += 1
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self.lock:
+                self.checkouts += 1
+
+        @event.listens_for(engine, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            with self.lock:
+                self.checkins += 1
+
+        @event.listens_for(engine, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self.lock:
+                self.invalidated += 1
+
+        return self
+
+    def snapshot(self, pool):
+        labels = [f"<={bound}ms" for bound in WAIT_BUCKETS_MS] + \
+            [f">{WAIT_BUCKETS_MS[-1]}ms"]
+        with self.lock:
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidated": self.invalidated,
+                "timeouts": self.timeouts,
+                "wait": {
+                    "count": self.waits,
+                    "avg_ms": round(self.total_wait / self.waits * 1000, 3)
+                        if self.waits else 0,
+                    "max_ms": round(self.max_wait * 1000, 3),
+                    "histogram": dict(zip(labels, self.wait_buckets)),
+                },
+            }
+
+
+class TimedPoolMixin:
+    """
+    Measures how long callers wait for a connection. SQLAlchemy has no
+    pool event for this, so the wait is timed around QueuePool._do_get.
+    """
+
+    stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats:
+                self.stats.record_timeout()
+            raise
+        if self.stats:
+            self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
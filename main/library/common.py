@@ -1,22 +1,64 @@
 import json
 import uuid
+import base64
 import re
 import io
 import itertools
+import operator
 import jwt
 import bcrypt
 import random
-from sqlalchemy.orm import Query, Session
-from sqlalchemy import desc, case, func, DECIMAL
+from sqlalchemy.orm import Query, Session, load_only
+from sqlalchemy.engine import Row
+from sqlalchemy import desc, case, func, text, DECIMAL, or_, and_, tuple_, false
 from datetime import datetime, date, timedelta as td
-from fastapi import Response
+from fastapi import Response, HTTPException, status
+from fastapi.responses import FileResponse, StreamingResponse
 from itertools import groupby
+from pathlib import Path
 from main.core.config import Settings
 from uuid import uuid4
 from openpyxl import Workbook
 
 settings = Settings()
 
+COUNT_MODES = ("exact", "capped", "estimate", "none")
+
+DOWNLOAD_TYPES = {
+    "csv": "text/csv",
+    "xls": "application/vnd.ms-excel",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+SEARCH_OPERATORS = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+    "=": operator.eq,
+}
+SEARCH_OPERATOR_RE = re.compile(r"(>=|<=|>|<|=)\s*(.+)")
+SEARCH_NUMBER_RE = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?")
+SEARCH_DATE_RE = re.compile(
+    r"(?P<year>(19|20)\d{2})(-(?P<month>\d{1,2})(-(?P<day>\d{1,2})"
+    r"([ T](?P<hour>\d{1,2}):(?P<minute>\d{2})(:(?P<second>\d{2}))?)?)?)?"
+)
+# a MAC address once its separators are stripped
+MAC_DIGITS_RE = re.compile(r"[0-9a-f]{12}")
+
+
+class SearchSpec:
+    """
+    Columns a list endpoint's `search` term is matched against: free text
+    goes to the text columns (ilike), numbers and dates found in the term
+    become typed comparisons on the number and date columns.
+    """
+
+    def __init__(self, text: list, numbers: list = None, dates: list = None):
+        self.text = text
+        self.numbers = numbers or []
+        self.dates = dates or []
+
 
 class Common:
 
@@ -198,21 +240,30 @@ class Common:
             data = output.getvalue()
             return data
 
-    def get_media_return(self, file_name, file_type, data):
+    def get_media_return(self, file_name, file_type, data, background=None):
         # GET RETURN
-        fileTypes = {
-            "csv": "text/csv",
-            "xls": "application/vnd.ms-excel",
-            "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        }
         fname = f'"{file_name}.{file_type}"'
         headers = {
             "Content-Disposition": f"attachment; filename={fname}",
-            "Content-Type": fileTypes[file_type],
+            "Content-Type": DOWNLOAD_TYPES[file_type],
         }
-        return Response(
+        if isinstance(data, (bytes, str)):
+            return Response(
+                data,
+                headers=headers,
+            )
+        # a file on disk, e.g. a cached export; Range requests are honoured
+        if isinstance(data, Path):
+            return FileResponse(
+                data,
+                headers=headers,
+                background=background,
+            )
+        # an iterator of chunks, sent as they are produced
+        return StreamingResponse(
             data,
             headers=headers,
+            background=background,
         )
 
     def clean_doc(self, doc):
@@ -327,6 +378,361 @@ class Common:
     def get_offset(self, page: int = None, limit: int = None) -> int:
         return (page - 1) * limit if page and limit else None
 
+    def page_limit(self, limit: int = None) -> int:
+        max_size = settings.LIST_MAX_PAGE_SIZE
+        return max(1, min(int(limit), max_size)) if limit else max_size
+
+    def encode_cursor(self, sort_value, key_value) -> str:
+        if isinstance(sort_value, datetime):
+            sort_value = sort_value.isoformat()
+        raw = json.dumps([sort_value, key_value]).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("utf-8").rstrip("=")
+
+    def decode_cursor(self, cursor: str):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            sort_value, key_value = json.loads(base64.urlsafe_b64decode(padded))
+            if sort_value is not None:
+                sort_value = datetime.fromisoformat(sort_value)
+            return sort_value, key_value
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+
+    def paginate(self, query: Query, payload: dict, sort_column, key_column):
+        """
+        Order by (sort_column desc, key_column desc) and return one page as
+        (rows, page_info). Pages by limit/offset unless the payload carries
+        a cursor; an empty cursor starts keyset paging from the top.
+        page_info holds total_rows, total_rows_type and next_cursor, counted
+        in the payload's count mode (exact, capped, estimate or none).
+        """
+        limit = self.page_limit(payload.get("limit"))
+        count_mode = payload.get("count") or "exact"
+        if count_mode not in COUNT_MODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid count mode, expected one of {', '.join(COUNT_MODES)}"
+            )
+        ordered = query.order_by(sort_column.desc().nulls_first(), key_column.desc())
+
+        if "cursor" not in payload:
+            page = max(1, int(payload.get("page") or 1))
+            offset = self.get_offset(page, limit)
+            if count_mode != "exact":
+                rows = ordered.limit(limit).offset(offset).all()
+                total_rows, total_rows_type = self.count_rows(query, count_mode)
+                return rows, {
+                    "total_rows": total_rows,
+                    "total_rows_type": total_rows_type,
+                    "next_cursor": None
+                }
+
+            # exact count rides along the page query as count(*) OVER ()
+            rows = (
+                ordered
+                .add_columns(func.count().over().label("total_rows"))
+                .limit(limit)
+                .offset(offset)
+                .all()
+            )
+            if rows:
+                total_rows = rows[-1][-1]
+                rows = [row[0] if len(row) == 2 else tuple(row[:-1]) for row in rows]
+            else:
+                # past the last page the window has nothing to count
+                total_rows = query.order_by(None).count() if offset else 0
+            return rows, {
+                "total_rows": total_rows,
+                "total_rows_type": "exact",
+                "next_cursor": None
+            }
+
+        page_query = ordered
+        if payload["cursor"]:
+            sort_value, key_value = self.decode_cursor(payload["cursor"])
+            if sort_value is None:
+                # NULLs sort first in a descending order
+                page_query = page_query.filter(or_(
+                    and_(sort_column == None, key_column < key_value),
+                    sort_column != None
+                ))
+            else:
+                page_query = page_query.filter(
+                    tuple_(sort_column, key_column) < tuple_(sort_value, key_value)
+                )
+
+        rows = page_query.limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1][0] if isinstance(rows[-1], Row) else rows[-1]
+            next_cursor = self.encode_cursor(
+                getattr(last, sort_column.key),
+                getattr(last, key_column.key)
+            )
+        total_rows, total_rows_type = self.count_rows(query, count_mode)
+        return rows, {
+            "total_rows": total_rows,
+            "total_rows_type": total_rows_type,
+            "next_cursor": next_cursor
+        }
+
+    def count_rows(self, query: Query, mode: str = "exact"):
+        """
+        Count the rows of query; returns (total_rows, total_rows_type).
+        capped stops counting after LIST_COUNT_CAP rows and reports
+        "capped" when there are more; estimate asks the planner.
+        """
+        query = query.order_by(None)
+        if mode == "none":
+            return None, None
+
+        if mode == "capped":
+            cap = settings.LIST_COUNT_CAP
+            counted = (
+                query.session.query(func.count())
+                .select_from(query.limit(cap + 1).subquery())
+                .scalar()
+            )
+            if counted > cap:
+                return cap, "capped"
+            return counted, "exact"
+
+        if mode == "estimate":
+            return self.estimate_rows(query), "estimate"
+
+        return query.count(), "exact"
+
+    def estimate_rows(self, query: Query) -> int:
+        """
+        Planner row estimate: pg_class.reltuples for an unfiltered single
+        table, otherwise the top plan node of EXPLAIN.
+        """
+        db = query.session
+        statement = query.statement
+        froms = statement.get_final_froms()
+        if statement.whereclause is None and len(froms) == 1 \
+                and hasattr(froms[0], "name"):
+            reltuples = db.execute(
+                text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+                {"name": f'"{froms[0].name}"'}
+            ).scalar()
+            # -1 means the table has never been analyzed
+            if reltuples is not None and reltuples >= 0:
+                return int(reltuples)
+
+        compiled = statement.compile(
+            dialect=db.get_bind().dialect,
+            compile_kwargs={"render_postcompile": True}
+        )
+        plan = db.connection().exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def field_list(self, fields: str, allowed: tuple) -> list:
+        """
+        Parse a comma separated `fields` parameter against the endpoint's
+        allow-list. No fields means every allowed field.
+        """
+        names = [name.strip() for name in (fields or "").split(",") if name.strip()]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}. "
+                    f"Expected any of {', '.join(allowed)}"
+            )
+        return names or list(allowed)
+
+    def load_fields(self, model, names, *required):
+        """
+        load_only() option that fetches just the named columns of model
+        plus the required ones (e.g. the paging keys). Names that are not
+        columns of model, like joined values, are skipped.
+        """
+        columns = model.__table__.columns
+        return load_only(
+            *(getattr(model, name) for name in names if name in columns),
+            *required
+        )
+
+    def pick_fields(self, row, names, **values) -> dict:
+        """
+        The named attributes of a row as a dict, taking a name from values
+        first when it is not on the row itself (joined columns).
+        """
+        return {
+            name: values[name] if name in values else getattr(row, name)
+            for name in names
+        }
+
+    def download_fields(self, fields: str, keys: tuple, headers: tuple):
+        """
+        Narrow a download's columns (keys and their headers) to `fields`.
+        """
+        names = self.field_list(fields, keys)
+        pairs = [(key, header) for key, header in zip(keys, headers) if key in names]
+        return tuple(key for key, _ in pairs), tuple(header for _, header in pairs)
+
+    def normalize_mac(self, value: str):
+        """
+        MAC address in the aa:bb:cc:dd:ee:ff form whatever its separators
+        and case, the same as normalize_mac() in the database. None when
+        the value is not a MAC.
+        """
+        digits = re.sub(r"[\s:.\-]", "", value or "").lower()
+        if not MAC_DIGITS_RE.fullmatch(digits):
+            return None
+        return ":".join(digits[i:i + 2] for i in range(0, 12, 2))
+
+    def usage_range(self, start: date = None, end: date = None):
+        """
+        Inclusive day range for the usage history endpoints: the last 30
+        days up to today (UTC+8) by default, at most USAGE_HISTORY_MAX_DAYS.
+        """
+        end = end or (datetime.utcnow() + td(hours=8)).date()
+        start = start or end - td(days=29)
+        if start > end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="start must not be after end"
+            )
+        if (end - start).days + 1 > settings.USAGE_HISTORY_MAX_DAYS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Range is limited to {settings.USAGE_HISTORY_MAX_DAYS} days"
+            )
+        return start, end
+
+    def daily_series(self, rows: dict, start: date, end: date, **empty) -> list:
+        """
+        One dict per day from start to end, taken from rows (keyed by day)
+        or filled with the empty values, so charts get no gaps.
+        """
+        return [
+            {"day": day, **rows.get(day, empty)}
+            for day in (start + td(days=i) for i in range((end - start).days + 1))
+        ]
+
+    def parse_search_number(self, value: str):
+        # leading zeros read as text, e.g. part of a mobile number
+        if not SEARCH_NUMBER_RE.fullmatch(value):
+            return None
+        return float(value) if "." in value else int(value)
+
+    def parse_search_period(self, value: str):
+        """
+        Parse 2025, 2025-08, 2025-08-14 or 2025-08-14 13:05[:30] into the
+        half-open (start, end) period it names.
+        """
+        match = SEARCH_DATE_RE.fullmatch(value)
+        if not match:
+            return None
+        parts = {k: int(v) for k, v in match.groupdict().items() if v}
+        try:
+            start = datetime(
+                parts["year"],
+                parts.get("month", 1),
+                parts.get("day", 1),
+                parts.get("hour", 0),
+                parts.get("minute", 0),
+                parts.get("second", 0)
+            )
+            if "second" in parts:
+                end = start + td(seconds=1)
+            elif "minute" in parts:
+                end = start + td(minutes=1)
+            elif "day" in parts:
+                end = start + td(days=1)
+            elif "month" in parts:
+                end = start.replace(
+                    year=start.year + start.month // 12,
+                    month=start.month % 12 + 1
+                )
+            else:
+                end = start.replace(year=start.year + 1)
+        except ValueError:
+            return None
+        return start, end
+
+    def parse_search(self, search: str) -> dict:
+        """
+        Split a search term into typed conditions:
+            text:    the term for the ilike columns, or None
+            numbers: [(operator, value)] for the number columns
+            dates:   [(operator, datetime)] for the date columns
+        Understands 1024, >=1024, 100..200, 2025-08, <2025-08-14 and
+        2025-08-01..2025-08-15. A comparison or range that parses is
+        not matched as text.
+        """
+        term = search.strip()
+        op = None
+        value = term
+        match = SEARCH_OPERATOR_RE.fullmatch(term)
+        if match:
+            op, value = match.groups()
+        numbers = []
+        dates = []
+
+        if not op and ".." in term:
+            low, _, high = (part.strip() for part in term.partition(".."))
+            low_number = self.parse_search_number(low)
+            high_number = self.parse_search_number(high)
+            if low_number is not None and high_number is not None:
+                numbers = [(">=", low_number), ("<=", high_number)]
+            low_period = self.parse_search_period(low)
+            high_period = self.parse_search_period(high)
+            if low_period and high_period:
+                dates = [(">=", low_period[0]), ("<", high_period[1])]
+        else:
+            number = self.parse_search_number(value)
+            if number is not None:
+                numbers = [(op or "=", number)]
+            period = self.parse_search_period(value)
+            if period:
+                start, end = period
+                dates = {
+                    None: [(">=", start), ("<", end)],
+                    "=": [(">=", start), ("<", end)],
+                    ">=": [(">=", start)],
+                    ">": [(">=", end)],
+                    "<": [("<", start)],
+                    "<=": [("<", end)],
+                }[op]
+
+        is_typed = (numbers or dates) and (op or ".." in term)
+        return {
+            "text": None if is_typed else term,
+            "numbers": numbers,
+            "dates": dates,
+        }
+
+    def search_filter(self, search: str, spec: SearchSpec):
+        """
+        One OR clause matching the search term against the spec's columns.
+        """
+        term = self.parse_search(search)
+        clauses = []
+        if term["text"]:
+            clauses += [column.ilike(f"%{term['text']}%") for column in spec.text]
+        for columns, conditions in (
+            (spec.numbers, term["numbers"]),
+            (spec.dates, term["dates"]),
+        ):
+            if not conditions:
+                continue
+            clauses += [
+                and_(*(SEARCH_OPERATORS[op](column, value) for op, value in conditions))
+                for column in columns
+            ]
+        return or_(*clauses) if clauses else false()
+
     def generate_jwt(self, data):
         secret = settings.SECRET
         algorithm = settings.JWT_ALGO
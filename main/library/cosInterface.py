@@ -77,3 +77,32 @@ class CosInterface:
                 "success": False,
                 "error": str(e)
             }
+
+
+    def get_object(self, remote_path: str, byte_range: str = None):
+        """
+        The object's get_object response; Body streams its content. A
+        Range header value (e.g. "bytes=0-1023") fetches only that part.
+        """
+        kwargs = {"Bucket": self.bucket_name, "Key": remote_path}
+        if byte_range:
+            kwargs["Range"] = byte_range
+        return self.cos.get_object(**kwargs)
+
+
+    def delete_object(self, remote_path: str):
+        try:
+            self.cos.delete_object(
+                Bucket=self.bucket_name,
+                Key=remote_path
+            )
+            return {
+                "success": True
+            }
+
+        except Exception as e:
+            logging.exception("Failed to delete from IBM COS")
+            return {
+                "success": False,
+                "error": str(e)
+            }
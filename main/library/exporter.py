@@ -0,0 +1,476 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import weakref
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from pathlib import Path
+from uuid import UUID
+from fastapi import HTTPException, status
+from openpyxl import Workbook
+from starlette.background import BackgroundTask
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, Text, case, cast, func, select
+from sqlalchemy.orm import Session
+from main.core.config import settings
+from main.core.dispatch import dispatcher
+from main import models
+from main.library.common import common, DOWNLOAD_TYPES
+
+# bytes handed to the response at a time
+CHUNK_SIZE = 64 * 1024
+# chunks a COPY may run ahead of a slow client
+COPY_QUEUE_CHUNKS = 8
+
+# Exports stream after their controller returned, outside the dispatcher,
+# so they hold their own slots: as many as the download route group has.
+export_slots = threading.BoundedSemaphore(dispatcher.groups["download"].limit)
+# seconds a download turned away for want of a slot is told to wait
+EXPORT_RETRY_SECONDS = 5
+
+
+class ExportSlot:
+    """
+    One of export_slots for a download, released once whichever way the
+    download ends. Taken before the response is returned and never waited
+    for: a waiting download would park one of the threads the sync routes
+    and their sessions need, so a full house answers 503 instead.
+    """
+
+    def __init__(self):
+        if not export_slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many downloads in progress, try again shortly",
+                headers={"Retry-After": str(EXPORT_RETRY_SECONDS)}
+            )
+        self.lock = threading.Lock()
+        self.held = True
+
+    def release(self):
+        with self.lock:
+            if self.held:
+                self.held = False
+                export_slots.release()
+
+
+class CopyStopped(Exception):
+    pass
+
+
+def copy_column(column):
+    """
+    A column as text in the form cell_value() writes it, so a COPY and
+    the row-by-row CSV give the same file
+    """
+    if isinstance(column.type, DateTime):
+        return func.to_char(column, 'YYYY-MM-DD"T"HH24:MI:SS')
+    if isinstance(column.type, Boolean):
+        return case((column.is_(True), "True"), (column.is_(False), "False"))
+    if isinstance(column.type, Float):
+        # PostgreSQL writes a whole float as 12, Python as 12.0; past
+        # 1e16 both switch to 1e+16
+        return case(
+            (
+                (column == func.trunc(column)) & (func.abs(column) < 1e16),
+                cast(cast(column, BigInteger), Text) + ".0"
+            ),
+            else_=cast(column, Text)
+        )
+    return column
+
+
+def cell_value(value):
+    """A column value as jsonable_encoder renders it, for one cell"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+class ExportCache:
+    """
+    Rendered download files on disk, at most max_bytes of them; the least
+    recently served go first. An entry is keyed by the endpoint, its
+    normalized filters and columns, the file type, and the versions of the
+    tables it reads (models.TableVersion). Every committed write to those
+    tables bumps their version, so the next download misses, renders
+    afresh and replaces the old entry. A max_bytes of 0 disables the cache.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    def versions(self, connection, sources: tuple):
+        """
+        {table: version} of the source tables, or None when one has no
+        counter and so no way to tell it changed. Read before the export's
+        own query, on its connection: a write committed in between makes
+        the file newer than its version, never older.
+        """
+        tables = [model.__tablename__ for model in sources]
+        versions = dict(
+            connection.execute(
+                select(models.TableVersion.table_name, func.sum(models.TableVersion.version))
+                .where(models.TableVersion.table_name.in_(tables))
+                .group_by(models.TableVersion.table_name)
+            ).all()
+        )
+        if set(versions) != set(tables):
+            return None
+        return {table: int(version) for table, version in versions.items()}
+
+    def key(self, export, endpoint: str, filters: dict, sources: tuple, file_type: str):
+        """(entry, version) names, or None when the download must not be cached"""
+        if self.max_bytes <= 0:
+            return None
+        versions = self.versions(export.pin(), sources)
+        if versions is None:
+            return None
+        entry = json.dumps(
+            [
+                endpoint,
+                {name: value for name, value in filters.items() if value not in (None, "")},
+                export.keys,
+                export.headers,
+                file_type
+            ],
+            sort_keys=True,
+            default=str
+        )
+        return (
+            hashlib.sha256(entry.encode()).hexdigest()[:32],
+            hashlib.sha256(json.dumps(versions, sort_keys=True).encode()).hexdigest()[:16]
+        )
+
+    def path(self, key: tuple, file_type: str):
+        return self.directory / f"{key[0]}-{key[1]}.{file_type}"
+
+    def get(self, key: tuple, file_type: str):
+        """
+        A private hard link to the entry, for this request to send and then
+        delete, or None on a miss. Eviction may unlink the entry at any
+        time; the link keeps the file whole until the response is done.
+        """
+        path = self.path(key, file_type)
+        link = path.with_name(f"{path.name}.{common.uuid_generator()}.tmp")
+        try:
+            os.link(path, link)
+        except FileNotFoundError:
+            return None
+        # the modification time orders the entries for eviction; the link
+        # shares it with the entry
+        os.utime(link)
+        return link
+
+    def store(self, key: tuple, file_type: str, chunks):
+        """
+        Pass chunks through, writing them to the entry as well. The entry
+        is only kept once every chunk is in; a download the client left,
+        or a full disk, leaves the cache as it was.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(key, file_type)
+        tmp = path.with_name(f"{path.name}.{common.uuid_generator()}.tmp")
+        f = open(tmp, "wb")
+        try:
+            for chunk in chunks:
+                if f:
+                    try:
+                        f.write(chunk)
+                    except OSError as e:
+                        logging.warning("Export cache write failed: %s", e)
+                        f.close()
+                        f = None
+                yield chunk
+            if f:
+                f.close()
+                f = None
+                os.replace(tmp, path)
+                self.evict(keep=path)
+        finally:
+            if f:
+                f.close()
+            tmp.unlink(missing_ok=True)
+
+    def evict(self, keep: Path):
+        """
+        Drop the other versions of keep's entry, then the least recently
+        served entries until the cache fits in max_bytes
+        """
+        with self.lock:
+            entries = []
+            for path in self.directory.iterdir():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if path.suffix == ".tmp":
+                    # left by a worker that stopped mid-download
+                    if stat.st_mtime < datetime.now().timestamp() - 86400:
+                        path.unlink(missing_ok=True)
+                    continue
+                if path != keep and path.name.split("-")[0] == keep.name.split("-")[0]:
+                    path.unlink(missing_ok=True)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+
+export_cache = ExportCache(
+    settings.EXPORT_CACHE_DIR,
+    settings.EXPORT_CACHE_MAX_BYTES
+)
+
+
+class Export:
+    """
+    One download: the query, the keys and headers of its columns, and how
+    a result row becomes {key: value} (pick_fields of the keys by
+    default). Rows are read from a server-side cursor EXPORT_BATCH_ROWS at
+    a time and written out as they arrive, so memory stays flat however
+    many rows the download has.
+
+    columns maps the keys that are not columns of the query's model, like
+    joined values, to their SQL expressions. With them a CSV download on
+    PostgreSQL is a COPY ... TO STDOUT of the same query, piped to the
+    client without building rows in Python.
+    """
+
+    def __init__(self, query, keys: tuple, headers: tuple, row=None, columns: dict = None):
+        self.query = query
+        self.keys = keys
+        self.headers = headers
+        self.row = row or (lambda result: common.pick_fields(result, keys))
+        self.columns = columns or {}
+        # rows written so far, for the progress of export jobs
+        self.rows = 0
+        self.cache_args = None
+        self.connection = None
+
+    def cached(self, endpoint: str, filters: dict, *sources):
+        """
+        Serve the download from export_cache. filters are the ones the
+        export was built with; sources the models of the tables it reads.
+        """
+        self.cache_args = (endpoint, filters, sources)
+        return self
+
+    def records(self):
+        for result in self.query.yield_per(settings.EXPORT_BATCH_ROWS):
+            values = self.row(result)
+            yield [cell_value(values[key]) for key in self.keys]
+            self.rows += 1
+
+    def csv_chunks(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(self.headers or self.keys)
+        for record in self.records():
+            writer.writerow(record)
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+
+    def pin(self):
+        """
+        Run the export on one connection, without the statement timeout: a
+        download lasts as long as the client takes to read it, and a read
+        session would otherwise choose its engine again for each statement.
+        The setting is local to the request's transaction.
+        """
+        if self.connection is None:
+            self.connection = self.query.session.connection()
+            if self.connection.dialect.name == "postgresql":
+                self.connection.exec_driver_sql("SET LOCAL statement_timeout = 0")
+            self.query = self.query.with_session(Session(bind=self.connection))
+        return self.connection
+
+    def can_copy(self):
+        return self.pin().dialect.driver == "psycopg2"
+
+    def copy_sql(self, cursor):
+        model = self.query.column_descriptions[0]["entity"]
+        statement = self.query.statement.with_only_columns(
+            *(
+                copy_column(self.columns.get(key, getattr(model, key, None))).label(header)
+                for key, header in zip(self.keys, self.headers or self.keys)
+            ),
+            maintain_column_froms=True
+        )
+        compiled = statement.compile(
+            dialect=self.pin().dialect,
+            compile_kwargs={"render_postcompile": True}
+        )
+        select = cursor.mogrify(str(compiled), compiled.params).decode()
+        return f"COPY ({select}) TO STDOUT WITH (FORMAT csv, HEADER)"
+
+    def copy_chunks(self):
+        """
+        COPY the query to the client. psycopg2 writes the rows into a
+        buffer on a thread of its own and full chunks are handed over
+        through a bounded queue, so a slow client holds the COPY back
+        instead of letting it fill memory.
+        """
+        connection = self.pin()
+        chunks = queue.Queue(maxsize=COPY_QUEUE_CHUNKS)
+        stopped = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    chunks.put(item, timeout=1)
+                    return
+                except queue.Full:
+                    pass
+            raise CopyStopped()
+
+        class Writer:
+            def __init__(self):
+                self.buffer = bytearray()
+
+            def write(self, data):
+                self.buffer += data if isinstance(data, bytes) else data.encode()
+                if len(self.buffer) >= CHUNK_SIZE:
+                    put(bytes(self.buffer))
+                    self.buffer.clear()
+
+        def copy():
+            writer = Writer()
+            try:
+                cursor = connection.connection.cursor()
+                try:
+                    cursor.copy_expert(self.copy_sql(cursor), writer)
+                finally:
+                    cursor.close()
+                put(bytes(writer.buffer))
+                put(done)
+            except CopyStopped:
+                pass
+            except Exception as e:
+                try:
+                    put(e)
+                except CopyStopped:
+                    pass
+
+        producer = threading.Thread(target=copy, name="export-copy", daemon=True)
+        producer.start()
+        finished = False
+        lines = 0
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is done:
+                    finished = True
+                    return
+                if isinstance(chunk, Exception):
+                    finished = True
+                    raise chunk
+                # lines less the header; a quoted value spanning lines
+                # counts twice, which is close enough for progress
+                lines += chunk.count(b"\n")
+                self.rows = max(lines - 1, 0)
+                yield chunk
+        finally:
+            stopped.set()
+            producer.join()
+            if not finished:
+                # the client left mid-COPY, the connection cannot be reused
+                connection.invalidate()
+
+    def write_xlsx(self, fileobj):
+        # write-only sheets keep their rows in a temporary file, not in memory
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Sheet")
+        sheet.append(self.headers or self.keys)
+        for record in self.records():
+            sheet.append(record)
+        workbook.save(fileobj)
+
+    def xlsx_chunks(self):
+        # the zip is only complete once every row is in, so it is built
+        # on disk and sent from there
+        with tempfile.TemporaryFile() as f:
+            self.write_xlsx(f)
+            f.seek(0)
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+
+    def write(self, fileobj, file_type: str):
+        """Write the whole file to fileobj, for export jobs"""
+        self.pin()
+        if file_type != "csv":
+            self.write_xlsx(fileobj)
+            return
+        for chunk in self.copy_chunks() if self.can_copy() else self.csv_chunks():
+            fileobj.write(chunk)
+
+    def slot_chunks(self, file_type: str, slot: ExportSlot):
+        try:
+            self.pin()
+            if file_type == "csv" and self.can_copy():
+                yield from self.copy_chunks()
+            elif file_type == "csv":
+                yield from self.csv_chunks()
+            else:
+                yield from self.xlsx_chunks()
+        finally:
+            slot.release()
+
+    def chunks(self, file_type: str):
+        slot = ExportSlot()
+        chunks = self.slot_chunks(file_type, slot)
+        # a response dropped before its body started never runs the finally
+        weakref.finalize(chunks, slot.release)
+        return chunks
+
+    def response(self, filename: str, file_type: str):
+        if file_type not in DOWNLOAD_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid file type, expected one of {', '.join(DOWNLOAD_TYPES)}"
+            )
+        if self.cache_args:
+            endpoint, filters, sources = self.cache_args
+            key = export_cache.key(self, endpoint, filters, sources, file_type)
+            link = key and export_cache.get(key, file_type)
+            if link:
+                return common.get_media_return(
+                    file_name=filename,
+                    file_type=file_type,
+                    data=link,
+                    background=BackgroundTask(link.unlink, missing_ok=True)
+                )
+            if key:
+                return common.get_media_return(
+                    file_name=filename,
+                    file_type=file_type,
+                    data=export_cache.store(key, file_type, self.chunks(file_type)),
+                )
+        return common.get_media_return(
+            file_name=filename,
+            file_type=file_type,
+            data=self.chunks(file_type),
+        )
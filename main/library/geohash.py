@@ -0,0 +1,156 @@
+import math
+
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# length of the geohash stored in Routers.geohash, about 5m x 5m
+PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode(lat: float, long: float, precision: int = PRECISION):
+    """
+    Geohash of a point, the same as geohash_encode() in the database
+    (migrations/0007_router_geohash.sql). None outside the valid range.
+    """
+    if lat is None or long is None or not -90 <= lat <= 90 or not -180 <= long <= 180:
+        return None
+    lat_range = [-90.0, 90.0]
+    long_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    is_long = True
+    while len(chars) < precision:
+        value, span = (long, long_range) if is_long else (lat, lat_range)
+        mid = (span[0] + span[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            span[0] = mid
+        else:
+            bits = bits * 2
+            span[1] = mid
+        is_long = not is_long
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int):
+    """(height, width) in degrees of a geohash cell of this length"""
+    bits = precision * 5
+    return 180 / 2 ** (bits // 2), 360 / 2 ** (bits - bits // 2)
+
+
+def bounding_box(lat: float, long: float, radius_km: float):
+    """
+    (south, west, north, east) around a circle. west and east may pass
+    -180/180 when the circle crosses the antimeridian.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    south = max(lat - lat_delta, -90.0)
+    north = min(lat + lat_delta, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    if cos_lat <= 0 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180:
+        return south, -180.0, north, 180.0
+    long_delta = radius_km / (KM_PER_DEGREE * cos_lat)
+    return south, long - long_delta, north, long + long_delta
+
+
+def long_spans(west: float, east: float):
+    # split a box crossing the antimeridian into two
+    if east - west >= 360:
+        return [(-180.0, 180.0)]
+    if west < -180:
+        return [(west + 360, 180.0), (-180.0, east)]
+    if east > 180:
+        return [(west, 180.0), (-180.0, east - 360)]
+    return [(west, east)]
+
+
+def cell_indexes(low: float, high: float, origin: float, size: float, count: int):
+    return range(
+        max(int((low - origin) // size), 0),
+        min(int((high - origin) // size), count - 1) + 1
+    )
+
+
+def cell_grid(south: float, west: float, north: float, east: float, precision: int):
+    """
+    Row and column indexes, and the (height, width) in degrees, of the
+    geohash cells of this length that a box overlaps.
+    """
+    height, width = cell_size(precision)
+    rows = cell_indexes(south, north, -90, height, round(180 / height))
+    columns = [
+        index
+        for low, high in long_spans(west, east)
+        for index in cell_indexes(low, high, -180, width, round(360 / width))
+    ]
+    return rows, columns, height, width
+
+
+def cell_count(south: float, west: float, north: float, east: float, precision: int):
+    rows, columns, _, _ = cell_grid(south, west, north, east, precision)
+    return len(rows) * len(columns)
+
+
+def cover(
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    max_cells: int = 16,
+    precision: int = PRECISION
+):
+    """
+    Geohash prefixes of the cells covering a box, at the longest length
+    up to precision that needs no more than max_cells of them. Every
+    point in the box has a geohash starting with one of the prefixes.
+    """
+    for precision in range(precision, 0, -1):
+        rows, columns, height, width = cell_grid(south, west, north, east, precision)
+        if len(rows) * len(columns) <= max_cells or precision == 1:
+            break
+
+    return sorted({
+        encode(-90 + (row + 0.5) * height, -180 + (column + 0.5) * width, precision)
+        for row in rows
+        for column in columns
+    })
+
+
+def bounds(hash: str):
+    """(south, west, north, east) of a geohash cell"""
+    lat_range = [-90.0, 90.0]
+    long_range = [-180.0, 180.0]
+    is_long = True
+    for char in hash:
+        bits = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            span = long_range if is_long else lat_range
+            mid = (span[0] + span[1]) / 2
+            if bits >> shift & 1:
+                span[0] = mid
+            else:
+                span[1] = mid
+            is_long = not is_long
+    return lat_range[0], long_range[0], lat_range[1], long_range[1]
+
+
+def overlaps(cell: tuple, south: float, west: float, north: float, east: float):
+    """Whether a (south, west, north, east) cell overlaps a box"""
+    if cell[0] > north or cell[2] < south:
+        return False
+    return any(cell[1] <= high and cell[3] >= low for low, high in long_spans(west, east))
+
+
+def distance_km(lat1: float, long1: float, lat2: float, long2: float):
+    """Great-circle (haversine) distance"""
+    lat1, long1, lat2, long2 = map(math.radians, (lat1, long1, lat2, long2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((long2 - long1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
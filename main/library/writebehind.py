@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+
+
+class WriteBehindBuffer:
+    """
+    Keeps the latest value per key in memory and hands them to
+    flush(values) in bulk. A flush runs on the periodic job, when
+    flush_entries keys are waiting, and at shutdown. When max_size keys
+    are waiting, a new key waits for a flush first, and is dropped if a
+    newer value for it came in meanwhile. Values from a failed
+    flush are put back unless a newer value for the key arrived. Values
+    are passed in the order their keys were last written, so flush can
+    apply them last-wins. Everything runs on the event loop, so no thread lock is needed.
+    """
+
+    def __init__(self, name: str, flush, flush_entries: int, max_size: int):
+        self.name = name
+        self.flush_fn = flush
+        self.flush_entries = flush_entries
+        self.max_size = max_size
+        self.entries = {}
+        self.flush_lock = asyncio.Lock()
+        self.pending = None
+        self.received = 0
+        self.coalesced = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.backpressure_waits = 0
+        self.dropped = 0
+        self.total_flush = 0.0
+        self.max_flush = 0.0
+        self.last_flush = None
+
+    async def put(self, key, value):
+        if key in self.entries:
+            # move to the end: the key was written last
+            del self.entries[key]
+            self.coalesced += 1
+        elif len(self.entries) >= self.max_size:
+            self.backpressure_waits += 1
+            try:
+                await self.flush()
+            except Exception:
+                pass
+            if key in self.entries:
+                # a newer value for the key arrived while this one waited
+                self.coalesced += 1
+                self.received += 1
+                return
+            if len(self.entries) >= self.max_size:
+                # the flush failed and put everything back: stay bounded
+                del self.entries[next(iter(self.entries))]
+                self.dropped += 1
+        self.entries[key] = value
+        self.received += 1
+
+        if len(self.entries) >= self.flush_entries and not self.flush_lock.locked() \
+                and (self.pending is None or self.pending.done()):
+            self.pending = asyncio.create_task(self.flush())
+            # failures are logged and counted by flush itself
+            self.pending.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def flush(self):
+        async with self.flush_lock:
+            batch, self.entries = self.entries, {}
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                await self.flush_fn(list(batch.values()))
+            except Exception:
+                logging.exception("Write-behind flush of %s failed", self.name)
+                self.failures += 1
+                self.restore(batch)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                self.last_flush = elapsed
+                self.total_flush += elapsed
+                self.max_flush = max(self.max_flush, elapsed)
+            self.flushes += 1
+            self.written += len(batch)
+            return len(batch)
+
+    def restore(self, batch: dict):
+        # failed values go before anything written meanwhile, which is newer
+        restored = {key: value for key, value in batch.items() if key not in self.entries}
+        restored.update(self.entries)
+        overflow = len(restored) - self.max_size
+        if overflow > 0:
+            for key in list(restored)[:overflow]:
+                del restored[key]
+            self.dropped += overflow
+            logging.warning("Write-behind %s dropped %s entries", self.name, overflow)
+        self.entries = restored
+
+    def stats(self):
+        return {
+            "buffered": len(self.entries),
+            "max_size": self.max_size,
+            "flush_entries": self.flush_entries,
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            # samples received per row written
+            "coalescing_ratio": round(self.received / self.written, 2)
+                if self.written else None,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "backpressure_waits": self.backpressure_waits,
+            "dropped": self.dropped,
+            "flush_ms": {
+                "last": round(self.last_flush * 1000, 2)
+                    if self.last_flush is not None else None,
+                "avg": round(self.total_flush / (self.flushes + self.failures) * 1000, 2)
+                    if self.flushes + self.failures else 0,
+                "max": round(self.max_flush * 1000, 2),
+            },
+        }
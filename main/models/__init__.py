@@ -1,6 +1,8 @@
 from .user import User, UserRole, Tier
-from .router import Router
+from .router import Router, RouterHeatmap
 from .otp import MobileOtp
-from .dashboard import Dashboard
+from .dashboard import Dashboard, DashboardCounter
 from .promo import Promo
 from .transaction import Transaction
+from .usage import RouterUsageSample, RouterUsageDaily, OwnerUsageDaily
+from .export import ExportJob, TableVersion
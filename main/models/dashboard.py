@@ -4,7 +4,9 @@ from sqlalchemy import (
     DateTime,
     Text,
     Float,
-    Integer
+    Integer,
+    BigInteger,
+    SmallInteger
 )
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -16,4 +18,19 @@ class Dashboard(Base):
     total_online_subscriber = Column(Integer)
     total_online_router = Column(Integer)
     total_data_usage = Column(Float)
-    last_updated_at = Column(DateTime, index=True)
\ No newline at end of file
+    last_updated_at = Column(DateTime, index=True)
+
+
+class DashboardCounter(Base):
+    """
+    Router, subscriber and business owner totals per scope ('global' or an
+    owner_user_id), kept current by the triggers in
+    migrations/0003_dashboard_counters.sql. A scope is split over slots to
+    spread concurrent updates; its totals are the sum of its slots.
+    """
+    __tablename__ = "DashboardCounters"
+    scope = Column(Text, primary_key=True)
+    slot = Column(SmallInteger, primary_key=True)
+    total_routers = Column(Integer, nullable=False, default=0)
+    total_subscribers = Column(BigInteger, nullable=False, default=0)
+    total_business_owners = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,55 @@
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Text,
+    Integer,
+    SmallInteger,
+    BigInteger,
+    Index
+)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from main.db.dbpostgres.baseclass import Base
+
+
+class ExportJob(Base):
+    """
+    One POST /export request: the list it exports with its filters, and
+    how far the worker rendering it has got. status goes queued ->
+    running -> done or failed; location is the file under EXPORT_DIR or
+    the IBM COS key, by storage.
+    """
+    __tablename__ = "ExportJobs"
+    __table_args__ = (
+        Index("ix_export_jobs_status_created_at", "status", "created_at"),
+    )
+    export_id = Column(Text, primary_key=True)
+    endpoint = Column(Text, nullable=False)
+    filters = Column(JSONB, nullable=False, default=dict)
+    file_type = Column(Text, nullable=False)
+    filename = Column(Text, nullable=False)
+    status = Column(Text, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    total_rows = Column(BigInteger)
+    rows_written = Column(BigInteger, nullable=False, default=0)
+    size_bytes = Column(BigInteger)
+    storage = Column(Text)
+    location = Column(Text)
+    error = Column(Text)
+    created_by = Column(Text)
+    created_at = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+
+class TableVersion(Base):
+    """
+    Change counter per table for the download cache, bumped by the
+    triggers in migrations/0010_table_versions.sql. A table is split over
+    slots to spread concurrent writes; its version is the sum of its slots.
+    """
+    __tablename__ = "TableVersions"
+    table_name = Column(Text, primary_key=True)
+    slot = Column(SmallInteger, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -8,10 +8,16 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import UUID
 
-from main.db.dbpostgres.baseclass import Base
+from main.db.dbpostgres.baseclass import Base, trigram_index
 
 class MobileOtp(Base):
     __tablename__ = "MobileOtp"
+    __table_args__ = (
+        trigram_index("MobileOtp", "otp"),
+        trigram_index("MobileOtp", "mobile_no"),
+        trigram_index("MobileOtp", "device_id"),
+        trigram_index("MobileOtp", "ref_id"),
+    )
     otp_id = Column(Text, primary_key=True, index=True)
     otp = Column(Text, nullable=False)
     mobile_no = Column(Text, nullable=False)
@@ -6,10 +6,28 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import UUID
 
-from main.db.dbpostgres.baseclass import Base
+from main.db.dbpostgres.baseclass import Base, active_index, trigram_index
 
 class Promo(Base):
     __tablename__ = "Promos"
+    __table_args__ = (
+        trigram_index("Promos", "type"),
+        trigram_index("Promos", "title"),
+        trigram_index("Promos", "description"),
+        trigram_index("Promos", "image_url"),
+        active_index(
+            "ix_promos_active_is_show",
+            "is_show",
+            "updated_at DESC",
+            "promo_id DESC"
+        ),
+        active_index(
+            "ix_promos_active_type",
+            "type",
+            "updated_at DESC",
+            "promo_id DESC"
+        ),
+    )
     promo_id = Column(Text, primary_key=True, index=True)
     image_url = Column(Text, nullable=False)
     link_url = Column(Text, nullable=False)
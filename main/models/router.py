@@ -4,20 +4,43 @@ from sqlalchemy import (
     DateTime,
     Text,
     Float,
-    Integer
+    Integer,
+    BigInteger,
+    SmallInteger
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, MACADDR
 
-from main.db.dbpostgres.baseclass import Base
+from main.db.dbpostgres.baseclass import Base, active_index, trigram_index
 
 class Router(Base):
     __tablename__ = "Routers"
+    __table_args__ = (
+        trigram_index("Routers", "serial_no"),
+        trigram_index("Routers", "router_model"),
+        trigram_index("Routers", "router_version"),
+        active_index("ix_routers_active_mac", "mac", unique=True),
+        active_index("ix_routers_active_serial_no", "serial_no"),
+        active_index("ix_routers_active_geohash", "geohash"),
+        active_index(
+            "ix_routers_active_owner_user_id",
+            "owner_user_id",
+            "updated_at DESC",
+            "router_id DESC"
+        ),
+        active_index(
+            "ix_routers_active_updated_at",
+            "updated_at DESC",
+            "router_id DESC"
+        ),
+    )
     router_id = Column(Text, primary_key=True, index=True)
     owner_user_id = Column(Text, nullable=False, index=True)
     serial_no = Column(Text)
     router_model = Column(Text)
     router_version = Column(Text)
     mac_address = Column(Text)
+    # normalize_mac(mac_address), set by a trigger (migrations/0006_router_macaddr.sql)
+    mac = Column(MACADDR)
     ip_address = Column(Text)
     password = Column(Text)
     qr_string = Column(Text)
@@ -25,8 +48,26 @@ class Router(Base):
     subscribers_count = Column(Integer, default=0)
     long = Column(Float)
     lat = Column(Float)
+    # geohash_encode(lat, long), set by a trigger (migrations/0007_router_geohash.sql)
+    geohash = Column(Text(collation="C"))
     created_by = Column(Text)
     is_enabled = Column(Boolean, default=True)
     created_at = Column(DateTime, index=True)
     updated_at = Column(DateTime, index=True)
-    deleted_at = Column(DateTime, index=True)
\ No newline at end of file
+    deleted_at = Column(DateTime, index=True)
+
+
+class RouterHeatmap(Base):
+    """
+    Live routers per geohash cell, kept current by the triggers in
+    migrations/0008_router_heatmap.sql. zoom is the geohash length (1..6)
+    and cell the geohash prefix. A cell is split over slots to spread
+    concurrent updates; its totals are the sum of its slots.
+    """
+    __tablename__ = "RouterHeatmap"
+    zoom = Column(SmallInteger, primary_key=True)
+    cell = Column(Text(collation="C"), primary_key=True)
+    slot = Column(SmallInteger, primary_key=True)
+    routers = Column(Integer, nullable=False, default=0)
+    subscribers = Column(BigInteger, nullable=False, default=0)
+    data_usage = Column(Float, nullable=False, default=0)
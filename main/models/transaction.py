@@ -3,19 +3,39 @@ from sqlalchemy import (
     Column,
     DateTime,
     Text,
-    Float
+    Float,
+    Index,
+    text
 )
 from sqlalchemy.dialects.postgresql import UUID
 
-from main.db.dbpostgres.baseclass import Base
+from main.db.dbpostgres.baseclass import Base, trigram_index
 
 class Transaction(Base):
     __tablename__ = "Transactions"
+    __table_args__ = (
+        trigram_index("Transactions", "payment_method"),
+        trigram_index("Transactions", "status"),
+        trigram_index("Transactions", "type"),
+        trigram_index("Transactions", "charge_reference"),
+        Index(
+            "ix_transactions_user_id_updated_at",
+            "user_id",
+            text("updated_at DESC"),
+            text("transaction_id DESC")
+        ),
+        Index(
+            "ix_transactions_status_updated_at",
+            "status",
+            text("updated_at DESC"),
+            text("transaction_id DESC")
+        ),
+    )
     transaction_id = Column(Text, primary_key=True, index=True)
     type = Column(Text, nullable=False)
     status = Column(Text)
     payment_method = Column(Text)
-    amount = Column(Float)
+    amount = Column(Float, index=True)
     qr_code_string = Column(Text)
     charge_reference = Column(Text)
     retrieval_reference = Column(Text)
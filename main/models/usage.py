@@ -0,0 +1,50 @@
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    Text,
+    Float,
+    Integer,
+    Index
+)
+
+from main.db.dbpostgres.baseclass import Base
+
+
+class RouterUsageSample(Base):
+    """
+    One row per data_usage change of a router, written by the
+    router_usage_record trigger (migrations/0004_router_usage_history.sql).
+    Range partitioned by sampled_at, one partition per day.
+    """
+    __tablename__ = "RouterUsageSamples"
+    __table_args__ = {"postgresql_partition_by": "RANGE (sampled_at)"}
+    router_id = Column(Text, primary_key=True)
+    sampled_at = Column(DateTime, primary_key=True)
+    owner_user_id = Column(Text, nullable=False)
+    data_usage = Column(Float, nullable=False)
+    usage = Column(Float, nullable=False)
+    subscribers_count = Column(Integer)
+
+
+class RouterUsageDaily(Base):
+    __tablename__ = "RouterUsageDaily"
+    router_id = Column(Text, primary_key=True)
+    day = Column(Date, primary_key=True)
+    owner_user_id = Column(Text, nullable=False)
+    usage = Column(Float, nullable=False, default=0)
+    samples = Column(Integer, nullable=False, default=0)
+    last_data_usage = Column(Float)
+    max_subscribers = Column(Integer)
+    last_sampled_at = Column(DateTime)
+
+
+class OwnerUsageDaily(Base):
+    __tablename__ = "OwnerUsageDaily"
+    __table_args__ = (
+        Index("ix_ownerusagedaily_day", "day"),
+    )
+    owner_user_id = Column(Text, primary_key=True)
+    day = Column(Date, primary_key=True)
+    usage = Column(Float, nullable=False, default=0)
+    samples = Column(Integer, nullable=False, default=0)
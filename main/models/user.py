@@ -8,7 +8,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.dialects.postgresql import UUID
 
-from main.db.dbpostgres.baseclass import Base
+from main.db.dbpostgres.baseclass import Base, active_index, trigram_index
 
 class UserRole(Base):
     __tablename__ = "UserRoles"
@@ -17,10 +17,15 @@ class UserRole(Base):
 
 class Tier(Base):
     __tablename__ = "Tiers"
+    __table_args__ = (
+        trigram_index("Tiers", "name"),
+        trigram_index("Tiers", "description"),
+        active_index("ix_tiers_active_updated_at", "updated_at DESC", "tier_id DESC"),
+    )
     tier_id = Column(Text, primary_key=True, index=True)
     name = Column(Text)
     description = Column(Text)
-    data_limit = Column(Float)
+    data_limit = Column(Float, index=True)
     is_default_tier = Column(Boolean)
     created_at = Column(DateTime, index=True)
     updated_at = Column(DateTime, index=True)
@@ -28,6 +33,24 @@ class Tier(Base):
 
 class User(Base):
     __tablename__ = "Users"
+    __table_args__ = (
+        trigram_index("Users", "name"),
+        trigram_index("Users", "email"),
+        trigram_index("Users", "mobile_no"),
+        trigram_index("Users", "user_type"),
+        trigram_index("Users", "device_id"),
+        trigram_index("Users", "tier"),
+        active_index(
+            "ix_users_active_user_type",
+            "user_type",
+            "updated_at DESC",
+            "user_id DESC"
+        ),
+        active_index("ix_users_active_updated_at", "updated_at DESC", "user_id DESC"),
+        active_index("ix_users_active_email", "email"),
+        active_index("ix_users_active_mobile_no", "mobile_no"),
+        active_index("ix_users_active_device_id", "device_id"),
+    )
     user_id = Column(Text, primary_key=True, index=True)
     user_type = Column(Text, nullable=False, index=True)
     name = Column(Text, nullable=False)
@@ -35,7 +58,7 @@ class User(Base):
     password = Column(Text, nullable=False)
     mobile_no = Column(Text, nullable=False, unique=True)
     device_id = Column(Text)
-    data_limit = Column(Float, default=0)
+    data_limit = Column(Float, default=0, index=True)
     data_usage = Column(Float, default=0)
     data_left = Column(Float, default=0)
     tier = Column(Text)
@@ -7,6 +7,8 @@ from main.modules.router import router as router_router
 from main.modules.dashboard import router as dashboard_router
 from main.modules.promo import router as promo_router
 from main.modules.transaction import router as transaction_router
+from main.modules.internal import router as internal_router
+from main.modules.export import router as export_router
 
 api_router = APIRouter()
 
@@ -50,4 +52,16 @@ api_router.include_router(
     transaction_router.router,
     prefix="/transaction",
     tags=["Transaction Module"]
+)
+
+api_router.include_router(
+    internal_router.router,
+    prefix="/internal",
+    tags=["Internal Module"]
+)
+
+api_router.include_router(
+    export_router.router,
+    prefix="/export",
+    tags=["Export Module"]
 )
\ No newline at end of file
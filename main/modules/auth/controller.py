@@ -1,6 +1,8 @@
+import asyncio
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select
 from main import models
 from main.library.common import common
 from main.library.mailer import mailer
@@ -18,26 +20,7 @@ class AuthController:
         credentials: dict
     ):
 
-        user_cred = credentials["email_or_mobile_no"]
-        clean_num = common.normalize_ph_number(user_cred)
-        if clean_num:
-            user_cred = f"+63{clean_num}"
-
-        user_type = credentials["user_type"]
-        filters = [
-            models.User.deleted_at == None,
-            or_(
-                models.User.email == credentials["email_or_mobile_no"],
-                models.User.mobile_no == user_cred
-            )
-        ]
-        if user_type == "backoffice_user":
-            filters.append(
-                ~models.User.user_type.in_(["subscriber", "business_owner"])
-            )
-        else:
-            filters.append(models.User.user_type == user_type)
-
+        filters = self.sign_in_filters(credentials)
         user = (
             db.query(models.User)
             .filter(*filters)
@@ -84,6 +67,92 @@ class AuthController:
                 "token": token
             }
         ).__dict__
+
+
+    async def sign_in_async(
+        self,
+        db: AsyncSession,
+        credentials: dict
+    ):
+
+        filters = self.sign_in_filters(credentials)
+        user = (
+            await db.execute(
+                select(models.User)
+                .filter(*filters)
+                .limit(1)
+            )
+        ).scalars().first()
+
+        if not user:
+             return PostResponse(
+                status="error",
+                status_code=401,
+                message="Invalid credentials."
+            ).__dict__
+        # bcrypt is deliberately slow, keep it off the event loop and
+        # hand the connection back to the pool while it runs
+        await db.commit()
+        verified = await asyncio.to_thread(
+            common.verify_password,
+            password=credentials["password"],
+            hashed_password=user.password
+        )
+        if not verified:
+            return PostResponse(
+                status="error",
+                status_code=401,
+                message="Invalid credentials."
+            ).__dict__
+
+        if not user.is_active:
+            return PostResponse(
+                status="error",
+                status_code=403,
+                message="Access denied. Account is currently deactivated",
+            ).__dict__
+
+        time_now = common.get_timestamp(datetime_fmt=1)
+        token = common.generate_jwt(jsonable_encoder(user))
+
+        user.last_login = time_now
+        await db.commit()
+        await db.refresh(user)
+
+        return PostResponse(
+            status="ok",
+            status_code=200,
+            message="Login successful",
+            data={
+                "user": jsonable_encoder(user),
+                "token": token
+            }
+        ).__dict__
+
+
+    def sign_in_filters(self, credentials: dict):
+
+        user_cred = credentials["email_or_mobile_no"]
+        clean_num = common.normalize_ph_number(user_cred)
+        if clean_num:
+            user_cred = f"+63{clean_num}"
+
+        user_type = credentials["user_type"]
+        filters = [
+            models.User.deleted_at == None,
+            or_(
+                models.User.email == credentials["email_or_mobile_no"],
+                models.User.mobile_no == user_cred
+            )
+        ]
+        if user_type == "backoffice_user":
+            filters.append(
+                ~models.User.user_type.in_(["subscriber", "business_owner"])
+            )
+        else:
+            filters.append(models.User.user_type == user_type)
+
+        return filters
         
     
     def forgot_password(
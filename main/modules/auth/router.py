@@ -1,8 +1,10 @@
 from main.core import deps
+from main.core.dispatch import dispatcher
 from main.modules.auth.controller import AuthController
 from main.schemas.auth import Signin, ForgotPassword, ChangePassword
 from main.core.security import jwt_required
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, Header
 from typing import Any, Union, Annotated
 
@@ -12,7 +14,7 @@ controller = AuthController()
 
 @router.post("/signin")
 async def signin(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[AsyncSession, Depends(deps.get_async_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     payload: Signin
@@ -20,7 +22,7 @@ async def signin(
     """
         Signin Authentication
     """
-    return controller.sign_in(
+    return await controller.sign_in_async(
         db=db,
         credentials=payload.dict(exclude_unset=True)
     )
@@ -35,7 +37,9 @@ async def forgot_password(
     """
         Forgot Password
     """
-    return controller.forgot_password(
+    return await dispatcher.run(
+        "auth",
+        controller.forgot_password,
         db=db,
         email=payload.email,
         user_type=payload.user_type
@@ -51,7 +55,9 @@ async def change_password(
     """
         Change Password
     """
-    return controller.change_password(
+    return await dispatcher.run(
+        "auth",
+        controller.change_password,
         db=db,
         current_user=current_user,
         payload=payload.dict()
@@ -1,10 +1,58 @@
 import jwt
+import asyncio
+import logging
+from datetime import date
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, update, or_
 from main import models
 from main.schemas.dashboard import GetCountsResponse, GetOnlinesResponse
-from main.schemas.common import PostResponse
+from main.schemas.common import PostResponse, GetResponse
 from main.library.common import common
+from main.core.config import settings
+from main.core.background import run_exclusive, AdvisoryLeader
+from main.db.dbpostgres.session import AsyncSessionLocal
+from acs_zeep_client import ACSZeepClient
+
+
+GLOBAL_SCOPE = "global"
+# pg_try_advisory_xact_lock key held while reconciling the counters
+RECONCILE_LOCK_KEY = 3012
+# pg_try_advisory_lock key of the worker that polls the ACS
+ACS_POLL_LOCK_KEY = 3017
+
+# Dashboard column filled from each RADIUS statistic
+ACS_FIGURES = {
+    "total_online_subscriber": "count_currently_connected_users",
+    "total_online_router": "count_currently_connected_aps",
+    "total_data_usage": "total_bandwidth_consumption_today",
+}
+
+acs_poll_leader = AdvisoryLeader(ACS_POLL_LOCK_KEY)
+
+
+def acs_number(response):
+    """
+    The number in a RADIUS statistics response: a bare number or one
+    wrapped in an object, e.g. {"count": 12} or {"data": {"total": 3.5}}.
+    """
+    if isinstance(response, bool):
+        return None
+    if isinstance(response, (int, float)):
+        return response
+    if isinstance(response, str):
+        try:
+            return float(response)
+        except ValueError:
+            return None
+    if isinstance(response, dict):
+        preferred = [response[key] for key in ("count", "total", "value", "data") if key in response]
+        for value in preferred + list(response.values()):
+            number = acs_number(value)
+            if number is not None:
+                return number
+    return None
 
 
 class DashboardController:
@@ -67,6 +115,31 @@ class DashboardController:
             }
         ).__dict__
 
+
+    async def get_data_async(
+        self,
+        db: AsyncSession
+    ):
+        return PostResponse(
+            status="ok",
+            status_code=200,
+            data=await self.get_figures_async(db)
+        ).__dict__
+
+
+    async def get_figures_async(self, db: AsyncSession):
+        online = jsonable_encoder(await self.get_online_dashboard_async(db)) or {}
+        count = await self.get_table_counts_async(db)
+
+        return {
+            "total_business_owners" : count.get("total_business_owners"),
+            "total_routers": count.get("total_routers"),
+            "total_subscribers": count.get("total_subscribers"),
+            "total_online_subscriber": online.get("total_online_subscriber",0),
+            "total_online_router": online.get("total_online_router",0),
+            "total_data_usage": online.get("total_data_usage",0)
+        }
+
     
     def update_realtime_data(
         self,
@@ -111,30 +184,152 @@ class DashboardController:
 
     
     def get_table_counts(self,db,id=None):
-        
-        filters = [
-            models.Router.deleted_at == None
-        ]
-        total_business_owners = 0
-        if id:
-            filters.append(models.Router.owner_user_id == id)
-            total_business_owners = 1
-        
+        return self.counter_totals(db.execute(self.counters_query(id)).all(), id)
 
-        data = db.query(models.Router).filter(*filters)
-        total_routers = data.count()
-        # total_data_usage = sum((r.data_usage or 0) for r in data)
-        total_subscribers = sum((r.subscribers_count or 0) for r in data)
 
-        
-        owners = db.query(models.User).filter(*[
-            models.User.deleted_at == None,
-            models.User.user_type == "business_owner"
-        ])
-        total_business_owners = owners.count()
+    async def get_online_dashboard_async(self, db):
+        return (
+            await db.execute(
+                select(models.Dashboard)
+                .filter(models.Dashboard.type=="online-dashboard")
+                .limit(1)
+            )
+        ).scalars().first()
+
+
+    async def get_table_counts_async(self,db,id=None):
+        return self.counter_totals((await db.execute(self.counters_query(id))).all(), id)
+
+
+    def counters_query(self, id=None):
+        # primary key reads of the trigger-maintained counters, see
+        # migrations/0003_dashboard_counters.sql
+        scopes = [GLOBAL_SCOPE, id] if id else [GLOBAL_SCOPE]
+        return (
+            select(
+                models.DashboardCounter.scope,
+                func.sum(models.DashboardCounter.total_routers),
+                func.sum(models.DashboardCounter.total_subscribers),
+                func.sum(models.DashboardCounter.total_business_owners)
+            )
+            .filter(models.DashboardCounter.scope.in_(scopes))
+            .group_by(models.DashboardCounter.scope)
+        )
+
+
+    def counter_totals(self, rows, id=None):
+        scopes = {scope: totals for scope, *totals in rows}
+        routers, subscribers, _ = scopes.get(id or GLOBAL_SCOPE, (0, 0, 0))
+        business_owners = scopes.get(GLOBAL_SCOPE, (0, 0, 0))[2]
 
         return {
-            "total_business_owners": total_business_owners,
-            "total_routers": total_routers,
-            "total_subscribers": total_subscribers
-        }
\ No newline at end of file
+            "total_business_owners": int(business_owners or 0),
+            "total_routers": int(routers or 0),
+            "total_subscribers": int(subscribers or 0)
+        }
+
+
+    async def usage_daily(
+        self,
+        db: AsyncSession,
+        owner_user_id: str = None,
+        start: date = None,
+        end: date = None
+    ):
+        start, end = common.usage_range(start, end)
+
+        filters = [models.OwnerUsageDaily.day.between(start, end)]
+        if owner_user_id:
+            filters.append(models.OwnerUsageDaily.owner_user_id == owner_user_id)
+
+        rows = (
+            await db.execute(
+                select(
+                    models.OwnerUsageDaily.day,
+                    func.sum(models.OwnerUsageDaily.usage),
+                    func.sum(models.OwnerUsageDaily.samples)
+                )
+                .filter(*filters)
+                .group_by(models.OwnerUsageDaily.day)
+            )
+        ).all()
+        data = common.daily_series(
+            {day: {"usage": usage, "samples": samples} for day, usage, samples in rows},
+            start,
+            end,
+            usage=0,
+            samples=0
+        )
+
+        return GetResponse(
+            status="ok",
+            status_code=200,
+            data=jsonable_encoder(data),
+            total_rows=len(data)
+        ).__dict__
+
+
+    async def poll_acs_dashboard(self):
+        """
+        Refresh the online-dashboard row from the ACS RADIUS statistics.
+        The calls run concurrently, each with its own timeout. A figure
+        whose call failed keeps its stored value, and the row is only
+        written when a figure changed. Only the worker holding the ACS
+        poll lock polls; the others return None.
+        """
+        if not await acs_poll_leader.is_leader():
+            return None
+
+        timeout = settings.ACS_DASHBOARD_POLL_TIMEOUT_SECONDS
+        async with ACSZeepClient(timeout=timeout) as client:
+            responses = await asyncio.gather(
+                *(
+                    asyncio.wait_for(getattr(client.radius, call)(), timeout)
+                    for call in ACS_FIGURES.values()
+                ),
+                return_exceptions=True
+            )
+
+        figures = {}
+        failed = []
+        for column, response in zip(ACS_FIGURES, responses):
+            number = None if isinstance(response, BaseException) else acs_number(response)
+            if number is None:
+                logging.warning("ACS %s failed: %r", ACS_FIGURES[column], response)
+                failed.append(column)
+            else:
+                figures[column] = number
+        if not figures:
+            raise RuntimeError(f"Every ACS dashboard call failed: {', '.join(failed)}")
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(models.Dashboard)
+                .where(
+                    models.Dashboard.type == "online-dashboard",
+                    or_(*(
+                        getattr(models.Dashboard, column).is_distinct_from(value)
+                        for column, value in figures.items()
+                    ))
+                )
+                .values(**figures, last_updated_at=common.get_timestamp(datetime_fmt=1))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+        return {"changed": bool(result.rowcount), "failed": failed}
+
+
+    async def reconcile_counters(self):
+        """
+        Recount the dashboard counters from Routers and Users and rewrite
+        the scopes that drifted. Workers share one advisory lock so only
+        one of them reconciles at a time. Returns the number of corrected
+        scopes, or None when another worker holds the lock.
+        """
+        drifted = await run_exclusive(
+            RECONCILE_LOCK_KEY, "SELECT reconcile_dashboard_counters()"
+        )
+        if drifted:
+            logging.warning("Dashboard counters drifted in %s scope(s), corrected", drifted)
+        return drifted
@@ -1,20 +1,48 @@
 from main.core import deps
-from main.modules.dashboard.controller import DashboardController
+from main.core.config import settings
+from main.core.dispatch import dispatcher
+from main.core.background import jobs
+from main.modules.dashboard.controller import DashboardController, acs_poll_leader
+from main.modules.dashboard.stream import DashboardStream
 from main.schemas.dashboard import GetCountsPayload, UpdateOnline
 from main.schemas.common import GetPayload
 from main.core.security import jwt_required
 from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, Header, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import Any, Union, Optional, Annotated
+from datetime import date
 
 
 router = APIRouter()
 controller = DashboardController()
 
+jobs.every(
+    "dashboard_counters_reconcile",
+    settings.DASHBOARD_RECONCILE_SECONDS,
+    controller.reconcile_counters
+)
+
+stream = DashboardStream(
+    read=controller.get_figures_async,
+    min_interval=settings.DASHBOARD_STREAM_MIN_INTERVAL_SECONDS,
+    refresh=settings.DASHBOARD_STREAM_REFRESH_SECONDS,
+    keepalive=settings.DASHBOARD_STREAM_KEEPALIVE_SECONDS
+)
+jobs.on_shutdown(stream.stop)
+
+jobs.every(
+    "acs_dashboard_poll",
+    settings.ACS_DASHBOARD_POLL_SECONDS,
+    controller.poll_acs_dashboard
+)
+jobs.on_shutdown(acs_poll_leader.release)
+
 
 @router.get('/count')
 async def get_count(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     payload: GetCountsPayload = Depends(), 
@@ -23,14 +51,16 @@ async def get_count(
     """
     Get Total Counts
     """
-    return controller.get_count(
+    return await dispatcher.run(
+        "dashboard",
+        controller.get_count,
         db=db,
         payload=payload.dict(exclude_none=True),
     )
 
 @router.get('/online')
 async def get_online(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
 ) -> Any:
@@ -38,13 +68,15 @@ async def get_online(
     """
     Get Total Online
     """
-    return controller.get_online(
+    return await dispatcher.run(
+        "dashboard",
+        controller.get_online,
         db=db,
     )
 
 @router.get('/data')
 async def get_data(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[AsyncSession, Depends(deps.get_async_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
 ) -> Any:
@@ -52,7 +84,7 @@ async def get_data(
     """
     Get Dashboard Data
     """
-    return controller.get_data(
+    return await controller.get_data_async(
         db=db
     )
 
@@ -68,7 +100,47 @@ async def update_realtime_data(
     """
         Update Realtime Data
     """
-    return controller.update_realtime_data(
+    return await dispatcher.run(
+        "dashboard",
+        controller.update_realtime_data,
         db=db,
         payload=payload.dict(exclude_none=True)
-    )
\ No newline at end of file
+    )
+
+
+@router.get('/usage/daily')
+async def usage_daily(
+    db: Annotated[AsyncSession, Depends(deps.get_async_read_db)],
+    *,
+    _: Annotated[dict, Depends(jwt_required)],
+    owner_user_id: Annotated[str, Query()] = None,
+    start: Annotated[date, Query()] = None,
+    end: Annotated[date, Query()] = None
+) -> Any:
+
+    """
+    Get Daily Data Usage
+    """
+    return await controller.usage_daily(
+        db=db,
+        owner_user_id=owner_user_id,
+        start=start,
+        end=end
+    )
+
+
+@router.get('/stream')
+async def stream_dashboard(
+    request: Request,
+    *,
+    _: Annotated[dict, Depends(jwt_required)],
+) -> Any:
+
+    """
+    Stream Dashboard Figures
+    """
+    return StreamingResponse(
+        stream.events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from main.db.dbpostgres.session import async_engine, AsyncSessionLocal
+
+
+# NOTIFY channel of migrations/0005_dashboard_notify.sql
+CHANNEL = "dashboard_changed"
+RETRY_SECONDS = 5
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+class DashboardStream:
+    """
+    Fans dashboard figures out to the /dashboard/stream clients of this
+    worker. A single producer LISTENs for dashboard_changed, re-reads the
+    figures at most every min_interval seconds, and also every refresh
+    seconds in case a notification was missed. It then pushes the figures
+    that changed to every client. The producer starts with the first
+    client and stops after the last one leaves.
+    """
+
+    def __init__(self, read, min_interval: float, refresh: float,
+                 keepalive: float, queue_size: int = 16):
+        self.read = read
+        self.min_interval = min_interval
+        self.refresh = refresh
+        self.keepalive = keepalive
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.figures = None
+        self.changed = asyncio.Event()
+        self.task = None
+
+    async def load(self):
+        async with AsyncSessionLocal() as db:
+            return await self.read(db)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run(), name="dashboard-stream")
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self.task:
+            self.task.cancel()
+            self.task = None
+
+    def publish(self, figures: dict):
+        delta = {
+            key: value for key, value in figures.items()
+            if self.figures is None or self.figures.get(key) != value
+        }
+        self.figures = figures
+        if not delta:
+            return
+        for queue in self.subscribers:
+            if queue.full():
+                # slow client: drop its backlog and resend everything
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("snapshot", figures))
+            else:
+                queue.put_nowait(("delta", delta))
+
+    def notified(self, connection, pid, channel, payload):
+        self.changed.set()
+
+    async def run(self):
+        while True:
+            try:
+                await self.listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning("Dashboard stream listener failed, retrying: %s", e)
+                await asyncio.sleep(RETRY_SECONDS)
+
+    async def listen(self):
+        # a pooled asyncpg connection held in LISTEN for the producer's life
+        async with async_engine.connect() as connection:
+            listener = (await connection.get_raw_connection()).driver_connection
+            await listener.add_listener(CHANNEL, self.notified)
+            try:
+                self.figures = await self.load()
+                while not listener.is_closed():
+                    try:
+                        await asyncio.wait_for(self.changed.wait(), self.refresh)
+                    except asyncio.TimeoutError:
+                        pass
+                    self.changed.clear()
+                    self.publish(await self.load())
+                    await asyncio.sleep(self.min_interval)
+            finally:
+                if not listener.is_closed():
+                    await listener.remove_listener(CHANNEL, self.notified)
+
+    async def events(self, request: Request):
+        queue = self.subscribe()
+        try:
+            yield sse("snapshot", await self.load())
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse(event, data)
+        finally:
+            self.unsubscribe(queue)
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
@@ -0,0 +1,446 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta as td
+from pathlib import Path
+from typing import Optional
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from ibm_botocore.exceptions import ClientError
+from pydantic import ValidationError
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.orm import Session
+from main import models
+from main.core.config import settings
+from main.db.dbpostgres.session import SessionLocal, ReadSessionLocal
+from main.library.common import common, DOWNLOAD_TYPES
+from main.library.cosInterface import CosInterface
+from main.library.exporter import CHUNK_SIZE
+from main.modules.otp.controller import OtpController
+from main.modules.promo.controller import PromoController
+from main.modules.router.controller import RouterController
+from main.modules.transaction.controller import TransactionController
+from main.modules.user.controller import UserController
+from main.schemas.common import PostResponse, GetResponse
+from main.schemas.export import ExportFilters, PromoExportFilters, \
+    TransactionExportFilters, UserExportFilters
+
+# endpoint -> (the controller method building its Export, its filters);
+# the same builders serve the */list/download routes
+EXPORTS = {
+    "otp": (OtpController().otp_list_export, ExportFilters),
+    "promo": (PromoController().promo_list_export, PromoExportFilters),
+    "router": (RouterController().router_list_export, ExportFilters),
+    "transaction": (
+        TransactionController().payment_transaction_list_export,
+        TransactionExportFilters
+    ),
+    "tier": (UserController().tier_list_export, ExportFilters),
+    "user": (UserController().user_list_export, UserExportFilters),
+}
+# a job taken over this many times is given up on
+EXPORT_JOB_ATTEMPTS = 3
+COS_PREFIX = "exports"
+
+cos = CosInterface(
+    api_key=settings.IBM_COS_API_KEY,
+    service_instance_id=settings.IBM_COS_SERVICE_INSTANCE_ID,
+    bucket_name=settings.IBM_COS_BUSCKET_NAME,
+    region=settings.IBM_COS_REGION
+) if settings.EXPORT_STORAGE == "cos" else None
+
+
+def update_job(export_id: str, **values):
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(models.ExportJob)
+            .where(models.ExportJob.export_id == export_id)
+            .values(updated_at=common.get_timestamp(datetime_fmt=1), **values)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def claim_job():
+    """
+    Take the oldest queued job, or a running one whose worker stopped
+    reporting progress. SKIP LOCKED lets every worker claim at once.
+    """
+    now = common.get_timestamp(datetime_fmt=1)
+    stale = now - td(seconds=settings.EXPORT_JOB_STALE_SECONDS)
+    db = SessionLocal()
+    try:
+        next_job = (
+            select(models.ExportJob.export_id)
+            .where(or_(
+                models.ExportJob.status == "queued",
+                and_(
+                    models.ExportJob.status == "running",
+                    models.ExportJob.updated_at < stale
+                )
+            ))
+            .order_by(models.ExportJob.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        job = db.execute(
+            update(models.ExportJob)
+            .where(models.ExportJob.export_id == next_job)
+            .values(
+                status="running",
+                attempts=models.ExportJob.attempts + 1,
+                started_at=now,
+                updated_at=now
+            )
+            .returning(
+                models.ExportJob.export_id,
+                models.ExportJob.endpoint,
+                models.ExportJob.filters,
+                models.ExportJob.file_type,
+                models.ExportJob.attempts
+            )
+        ).first()
+        db.commit()
+        return job
+    finally:
+        db.close()
+
+
+def run_job(job):
+    """
+    Render a claimed job into EXPORT_DIR and, with COS storage, upload it.
+    A heartbeat records the rows written every EXPORT_JOB_PROGRESS_SECONDS,
+    which also tells other workers the job is still alive.
+    """
+    if job.attempts > EXPORT_JOB_ATTEMPTS:
+        update_job(
+            job.export_id,
+            status="failed",
+            error="Export stopped before finishing too many times",
+            finished_at=common.get_timestamp(datetime_fmt=1)
+        )
+        return
+
+    directory = Path(settings.EXPORT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{job.export_id}.{job.file_type}"
+    part = directory / f"{name}.{job.attempts}.part"
+    export = None
+    stopped = threading.Event()
+
+    def heartbeat():
+        while not stopped.wait(settings.EXPORT_JOB_PROGRESS_SECONDS):
+            try:
+                update_job(job.export_id, rows_written=export.rows if export else 0)
+            except Exception:
+                logging.exception("Export %s progress update failed", job.export_id)
+
+    beat = threading.Thread(target=heartbeat, name="export-heartbeat", daemon=True)
+    beat.start()
+    db = ReadSessionLocal()
+    db.info["read_only"] = True
+    try:
+        builder, _ = EXPORTS[job.endpoint]
+        export = builder(db, **job.filters)
+        # the count and the file on one connection, without the statement
+        # timeout, whichever way the replica lag guard turns meanwhile
+        export.pin()
+        update_job(job.export_id, total_rows=export.query.order_by(None).count())
+
+        with open(part, "wb") as f:
+            export.write(f, job.file_type)
+        size = part.stat().st_size
+
+        if cos:
+            location = f"{COS_PREFIX}/{name}"
+            with open(part, "rb") as f:
+                result = cos.upload_fileobj(f, location, make_public=False)
+            part.unlink()
+            if not result["success"]:
+                raise RuntimeError(result["error"])
+        else:
+            location = str(part.rename(directory / name))
+
+        stopped.set()
+        beat.join()
+        update_job(
+            job.export_id,
+            status="done",
+            rows_written=export.rows,
+            size_bytes=size,
+            storage="cos" if cos else "local",
+            location=location,
+            error=None,
+            finished_at=common.get_timestamp(datetime_fmt=1)
+        )
+    except Exception as e:
+        logging.exception("Export %s failed", job.export_id)
+        stopped.set()
+        beat.join()
+        part.unlink(missing_ok=True)
+        update_job(
+            job.export_id,
+            status="failed",
+            error=str(e),
+            finished_at=common.get_timestamp(datetime_fmt=1)
+        )
+    finally:
+        stopped.set()
+        db.close()
+
+
+class ExportWorkers:
+    """
+    Bounded pool rendering export jobs. kick() starts a drain on an idle
+    thread; a drain claims jobs one at a time until none are queued.
+    Jobs live in ExportJobs, so whichever web worker has a free thread
+    picks up the next one, and jobs left by a stopped worker are taken
+    over once they go stale.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="export"
+        )
+        self.lock = threading.Lock()
+        self.active = 0
+
+    def kick(self):
+        with self.lock:
+            if self.active >= self.workers:
+                return
+            self.active += 1
+        self.executor.submit(self.drain)
+
+    def drain(self):
+        try:
+            while job := claim_job():
+                run_job(job)
+        except Exception:
+            logging.exception("Export worker failed")
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+export_workers = ExportWorkers(settings.EXPORT_JOB_WORKERS)
+
+
+def purge_jobs():
+    """Delete finished jobs past EXPORT_JOB_RETENTION_HOURS with their files"""
+    cutoff = common.get_timestamp(datetime_fmt=1) - \
+        td(hours=settings.EXPORT_JOB_RETENTION_HOURS)
+    db = SessionLocal()
+    try:
+        # DELETE ... RETURNING hands each file to one worker only
+        expired = db.execute(
+            delete(models.ExportJob)
+            .where(
+                models.ExportJob.status.in_(("done", "failed")),
+                models.ExportJob.finished_at < cutoff
+            )
+            .returning(models.ExportJob.storage, models.ExportJob.location)
+        ).all()
+        db.commit()
+    finally:
+        db.close()
+
+    for storage, location in expired:
+        if storage == "cos" and cos:
+            cos.delete_object(location)
+        elif storage == "local":
+            Path(location).unlink(missing_ok=True)
+    return len(expired)
+
+
+class ExportController:
+
+    def job_data(self, job: models.ExportJob):
+        data = jsonable_encoder(job)
+        data.pop("location", None)
+        data["progress"] = 100 if job.status == "done" else (
+            min(round(job.rows_written * 100 / job.total_rows), 99)
+            if job.total_rows else 0
+        )
+        return data
+
+    def visible_job(self, db: Session, current_user: dict, id: str):
+        query = db.query(models.ExportJob).filter(models.ExportJob.export_id == id)
+        if current_user.get("user_type") not in ["admin", "support"]:
+            query = query.filter(models.ExportJob.created_by == current_user.get("user_id"))
+        return query.one_or_none()
+
+    def create_export(
+        self,
+        db: Session,
+        current_user: dict,
+        payload: dict
+    ):
+        if payload["endpoint"] not in EXPORTS:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message=f"Unknown export, expected one of {', '.join(EXPORTS)}"
+            ).__dict__
+
+        if payload["file_type"] not in DOWNLOAD_TYPES:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message=f"Invalid file type, expected one of {', '.join(DOWNLOAD_TYPES)}"
+            ).__dict__
+
+        builder, filter_schema = EXPORTS[payload["endpoint"]]
+        try:
+            filters = filter_schema(**(payload.get("filters") or {})) \
+                .model_dump(exclude_none=True)
+        except ValidationError as e:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message="Invalid filters",
+                detail="; ".join(
+                    f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                    for error in e.errors()
+                )
+            ).__dict__
+
+        try:
+            # the builder resolves `fields` against the endpoint's columns
+            # and sends no query, so a bad name fails here, not in the job
+            builder(db, **filters)
+        except HTTPException as e:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message="Invalid filters",
+                detail=e.detail
+            ).__dict__
+
+        time_now = common.get_timestamp(datetime_fmt=1)
+        job = models.ExportJob(
+            export_id=common.uuid_generator(),
+            endpoint=payload["endpoint"],
+            filters=filters,
+            file_type=payload["file_type"],
+            filename=payload["filename"],
+            status="queued",
+            attempts=0,
+            rows_written=0,
+            created_by=current_user.get("user_id"),
+            created_at=time_now,
+            updated_at=time_now
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        export_workers.kick()
+
+        return PostResponse(
+            status="ok",
+            status_code=200,
+            message="Export queued",
+            data=self.job_data(job)
+        ).__dict__
+
+    def export_status(
+        self,
+        db: Session,
+        current_user: dict,
+        id: str
+    ):
+        job = self.visible_job(db, current_user, id)
+        if not job:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message="Export not found"
+            ).__dict__
+
+        return GetResponse(
+            status="ok",
+            status_code=200,
+            data=self.job_data(job)
+        ).__dict__
+
+    def download_export(
+        self,
+        db: Session,
+        current_user: dict,
+        id: str,
+        byte_range: Optional[str] = None
+    ):
+        """
+        The finished file. Range requests are answered with 206 and the
+        requested part, so an interrupted download can resume.
+        """
+        job = self.visible_job(db, current_user, id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Export not found"
+            )
+        if job.status != "done":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Export is {job.status}"
+            )
+
+        filename = f'"{job.filename}.{job.file_type}"'
+        media_type = DOWNLOAD_TYPES[job.file_type]
+        if job.storage == "local":
+            if not Path(job.location).is_file():
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Export file not found"
+                )
+            # FileResponse answers Range requests itself
+            return FileResponse(
+                job.location,
+                media_type=media_type,
+                headers={"Content-Disposition": f"attachment; filename={filename}"}
+            )
+
+        if not cos:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Export file not found"
+            )
+        try:
+            obj = cos.get_object(job.location, byte_range)
+        except ClientError as e:
+            if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 416:
+                return Response(
+                    status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                    headers={"Content-Range": f"bytes */{job.size_bytes}"}
+                )
+            raise
+        headers = {
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(obj["ContentLength"]),
+            "Accept-Ranges": "bytes",
+        }
+        if obj.get("ContentRange"):
+            headers["Content-Range"] = obj["ContentRange"]
+        return StreamingResponse(
+            obj["Body"].iter_chunks(CHUNK_SIZE),
+            status_code=status.HTTP_206_PARTIAL_CONTENT
+                if "Content-Range" in headers else status.HTTP_200_OK,
+            media_type=media_type,
+            headers=headers
+        )
+
+    async def run_jobs(self):
+        """
+        Background job: pick up jobs queued while every worker was busy
+        or left by a stopped worker, and purge expired ones
+        """
+        export_workers.kick()
+        return await asyncio.to_thread(purge_jobs)
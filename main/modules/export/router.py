@@ -0,0 +1,72 @@
+from main.core import deps
+from main.core.dispatch import dispatcher
+from main.core.config import settings
+from main.core.background import jobs
+from main.modules.export.controller import ExportController
+from main.schemas.export import CreateExport
+from main.core.security import jwt_required
+from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header
+from typing import Any, Annotated
+
+
+router = APIRouter()
+controller = ExportController()
+
+jobs.every("export_jobs", settings.EXPORT_JOB_POLL_SECONDS, controller.run_jobs)
+
+@router.post("", response_model=dict)
+async def create_export(
+    db: Annotated[Session, Depends(deps.get_db)],
+    *,
+    current_user: Annotated[dict, Depends(jwt_required)],
+    payload: CreateExport
+) -> Any:
+    """
+        Queue an Export Job
+    """
+    return await dispatcher.run(
+        "default",
+        controller.create_export,
+        db=db,
+        current_user=current_user,
+        payload=payload.dict()
+    )
+
+@router.get("/{id}")
+async def export_status(
+    db: Annotated[Session, Depends(deps.get_db)],
+    *,
+    current_user: Annotated[dict, Depends(jwt_required)],
+    id: str
+) -> Any:
+    """
+    Get Export Job Status
+    """
+    return await dispatcher.run(
+        "default",
+        controller.export_status,
+        db=db,
+        current_user=current_user,
+        id=id
+    )
+
+@router.get("/{id}/download")
+async def download_export(
+    db: Annotated[Session, Depends(deps.get_db)],
+    *,
+    current_user: Annotated[dict, Depends(jwt_required)],
+    id: str,
+    range: Annotated[str, Header()] = None
+) -> Any:
+    """
+    Download Export File
+    """
+    return await dispatcher.run(
+        "default",
+        controller.download_export,
+        db=db,
+        current_user=current_user,
+        id=id,
+        byte_range=range
+    )
@@ -0,0 +1,55 @@
+from main.core.config import settings
+from main.core.dispatch import dispatcher
+from main.core.background import jobs
+from main.modules.router.controller import usage_buffer
+from main.db.dbpostgres.session import engines, pool_stats, replica_guard
+from main.schemas.common import PostResponse
+
+
+class InternalController:
+
+    def dispatch_stats(self):
+
+        return PostResponse(
+            status="ok",
+            status_code=200,
+            data=dispatcher.stats()
+        ).__dict__
+
+
+    def db_pool_stats(self):
+
+        return PostResponse(
+            status="ok",
+            status_code=200,
+            data={
+                "profile": settings.DB_PROFILE,
+                "workers": settings.WEB_CONCURRENCY,
+                "engines": {
+                    name: stats.snapshot(engines[name].pool)
+                    for name, stats in pool_stats.items()
+                },
+                "replica": replica_guard.stats() if replica_guard else None
+            }
+        ).__dict__
+
+
+    def background_job_stats(self):
+
+        return PostResponse(
+            status="ok",
+            status_code=200,
+            data=jobs.stats()
+        ).__dict__
+
+
+    def usage_buffer_stats(self):
+
+        return PostResponse(
+            status="ok",
+            status_code=200,
+            data={
+                "enabled": settings.ROUTER_USAGE_WRITE_BEHIND,
+                **usage_buffer.stats()
+            }
+        ).__dict__
@@ -0,0 +1,55 @@
+from main.modules.internal.controller import InternalController
+from main.core.security import admin_required
+from fastapi import APIRouter, Depends
+from typing import Any, Annotated
+
+
+router = APIRouter()
+controller = InternalController()
+
+@router.get('/dispatch')
+async def dispatch_stats(
+    *,
+    _: Annotated[dict, Depends(admin_required)],
+) -> Any:
+
+    """
+    Get Controller Dispatch Queue Metrics
+    """
+    return controller.dispatch_stats()
+
+
+@router.get('/db/pool')
+async def db_pool_stats(
+    *,
+    _: Annotated[dict, Depends(admin_required)],
+) -> Any:
+
+    """
+    Get Database Connection Pool Metrics
+    """
+    return controller.db_pool_stats()
+
+
+@router.get('/jobs')
+async def background_job_stats(
+    *,
+    _: Annotated[dict, Depends(admin_required)],
+) -> Any:
+
+    """
+    Get Background Job Metrics
+    """
+    return controller.background_job_stats()
+
+
+@router.get('/router/usage-buffer')
+async def usage_buffer_stats(
+    *,
+    _: Annotated[dict, Depends(admin_required)],
+) -> Any:
+
+    """
+    Get Router Usage Write-Behind Metrics
+    """
+    return controller.usage_buffer_stats()
@@ -1,15 +1,36 @@
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, cast, String
 from main import models
-from main.library.common import common
+from main.library.common import common, SearchSpec
+from main.library.exporter import Export
+from main.core.dispatch import dispatcher
 from main.library.macrodroidInterface import macrodroid_interface
 from main.schemas.common import OTPResponse, PostResponse, GetResponse
 from typing import Optional
-import asyncio
 from acs_zeep_client import ACSZeepClient
 
 
+# columns a list may return
+OTP_FIELDS = (
+    "otp_id",
+    "otp",
+    "mobile_no",
+    "device_id",
+    "ref_id",
+    "created_at"
+)
+
+OTP_SEARCH = SearchSpec(
+    text=[
+        models.MobileOtp.otp,
+        models.MobileOtp.mobile_no,
+        models.MobileOtp.device_id,
+        models.MobileOtp.ref_id
+    ],
+    dates=[models.MobileOtp.created_at]
+)
+
+
 class OtpController:
 
     def send_otp(
@@ -62,7 +83,7 @@ class OtpController:
         db.refresh(new_otp)
 
         if len(payload["device_id"]) < 32:
-            asyncio.create_task(self.send_to_acs_subscriber_api(device_id=payload["device_id"]))
+            dispatcher.spawn(self.send_to_acs_subscriber_api(device_id=payload["device_id"]))
 
 
         return OTPResponse(
@@ -80,47 +101,34 @@ class OtpController:
         payload: dict,
         search: Optional[str] = None
     ):
-        limit = payload.get("limit",9999999)
-        page = payload.get("page",1)
-
         filters = []
         if payload.get("id"):
             filters.append(models.MobileOtp.otp_id == payload.get("id"))
         
-        if search: 
-            filters.append(
-                or_(
-                    models.MobileOtp.otp.ilike(f"%{search}%"),
-                    models.MobileOtp.mobile_no.ilike(f"%{search}%"),
-                    models.MobileOtp.device_id.ilike(f"%{search}%"),
-                    models.MobileOtp.ref_id.ilike(f"%{search}%"),
-                    cast(models.MobileOtp.created_at, String).ilike(search)
-                )
-            )
-
-        # get total rows count
-        data = db.query(models.MobileOtp).filter(*filters)
-        total_rows = data.count()
-
-        limit = int(limit) if limit else 0
-        page = int(page) if page else 0
-        offset = (page - 1) * limit if limit and page else None
-
-        otps = (
-            db.query(
-                models.MobileOtp
-            )
-            .filter(*filters)
-            .limit(limit)
-            .offset(offset)
-            .all()
+        if search:
+            filters.append(common.search_filter(search, OTP_SEARCH))
+
+        # OTPs are never updated, page on creation time
+        names = common.field_list(payload.get("fields"), OTP_FIELDS)
+        otps, page_info = common.paginate(
+            db.query(models.MobileOtp)
+            .options(common.load_fields(
+                models.MobileOtp,
+                names,
+                models.MobileOtp.created_at,
+                models.MobileOtp.otp_id
+            ))
+            .filter(*filters),
+            payload,
+            sort_column=models.MobileOtp.created_at,
+            key_column=models.MobileOtp.otp_id
         )
 
         return GetResponse(
             status="ok",
             status_code=200,
-            data=jsonable_encoder(otps),
-            total_rows=total_rows
+            data=jsonable_encoder([common.pick_fields(otp, names) for otp in otps]),
+            **page_info
         )
 
     def download_otp_list(
@@ -128,54 +136,53 @@ class OtpController:
         db: Session,
         filename: str,
         file_type: str,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        fields: Optional[str] = None
+    ):
+        return self.otp_list_export(
+            db,
+            search=search,
+            fields=fields
+        ).response(filename, file_type)
+
+    def otp_list_export(
+        self,
+        db: Session,
+        search: Optional[str] = None,
+        fields: Optional[str] = None
     ):
     
         filters = []
  
-        if search: 
-            filters.append(
-                or_(
-                    models.MobileOtp.otp.ilike(f"%{search}%"),
-                    models.MobileOtp.mobile_no.ilike(f"%{search}%"),
-                    models.MobileOtp.device_id.ilike(f"%{search}%"),
-                    models.MobileOtp.ref_id.ilike(f"%{search}%"),
-                    cast(models.MobileOtp.created_at, String).ilike(search)
-                )
+        if search:
+            filters.append(common.search_filter(search, OTP_SEARCH))
+
+        keys, headers = common.download_fields(
+            fields,
+            (
+                "created_at",
+                "otp",
+                "mobile_no",
+                "device_id",
+                "ref_id"
+            ),
+            (
+                "Date",
+                "OTP",
+                "Mobile No",
+                "Device ID",
+                "Reference ID"
             )
+        )
 
-        otps = (
+        return Export(
             db.query(
                 models.MobileOtp
             )
-            .filter(*filters)
-            .all()
-        )
-        keys = (
-            "created_at",
-            "otp",
-            "mobile_no",
-            "device_id",
-            "ref_id"
-        )
-        headers = (
-            "Date",
-            "OTP",
-            "Mobile No",
-            "Device ID",
-            "Reference ID"
-        )
-
-        raw_data = {
-            "header": keys,
-            "headers": headers,
-            "rows": jsonable_encoder(otps)
-        }
-        data = common.format_excel(rawData=raw_data)
-        return common.get_media_return(
-            file_name=filename,
-            file_type=file_type,
-            data=data,
+            .options(common.load_fields(models.MobileOtp, keys, models.MobileOtp.otp_id))
+            .filter(*filters),
+            keys,
+            headers
         )
 
 
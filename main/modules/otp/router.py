@@ -1,4 +1,5 @@
 from main.core import deps
+from main.core.dispatch import dispatcher
 from main.modules.otp.controller import OtpController
 from main.schemas.common import OTPRequest, GetPayload
 from main.core.security import jwt_required
@@ -21,14 +22,16 @@ async def send_otp(
     """
     Send OTP
     """
-    return controller.send_otp(
+    return await dispatcher.run(
+        "otp",
+        controller.send_otp,
         db=db,
         payload=payload.dict(exclude_none=True)
     )
 
 @router.get('/list')
 async def sent_otp_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     payload: GetPayload = Depends(),
@@ -38,7 +41,9 @@ async def sent_otp_list(
     """
     Get Sent OTP List
     """
-    return controller.sent_otp_list(
+    return await dispatcher.run(
+        "otp",
+        controller.sent_otp_list,
         db=db,
         payload=payload.dict(exclude_none=True),
         search=search
@@ -46,21 +51,25 @@ async def sent_otp_list(
 
 @router.get('/list/download')
 async def download_otp_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     filename: str,
     file_type: str,
     search: Annotated[str, Query()] = None,
+    fields: Annotated[str, Query()] = None,
     
 ) -> Any:
 
     """
     Download Sent OTP List
     """
-    return controller.download_otp_list(
+    return await dispatcher.run(
+        "download",
+        controller.download_otp_list,
         db=db,
         filename=filename,
         file_type=file_type,
-        search=search
+        search=search,
+        fields=fields
     )
\ No newline at end of file
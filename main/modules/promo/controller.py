@@ -2,14 +2,38 @@ import asyncio
 import httpx
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, cast, String
 from main import models
-from main.library.common import common
+from main.library.common import common, SearchSpec
+from main.library.exporter import Export
 from main.schemas.common import PostResponse, GetResponse
 from main.core.config import settings
 from typing import Optional
 
 
+# columns a list may return
+PROMO_FIELDS = (
+    "promo_id",
+    "image_url",
+    "link_url",
+    "type",
+    "title",
+    "description",
+    "is_show",
+    "created_at",
+    "updated_at",
+    "deleted_at"
+)
+
+PROMO_SEARCH = SearchSpec(
+    text=[
+        models.Promo.type,
+        models.Promo.title,
+        models.Promo.description,
+        models.Promo.image_url
+    ]
+)
+
+
 class PromoController:
 
     def create_promo(
@@ -111,8 +135,6 @@ class PromoController:
         is_all: Optional[bool] = False,
         search: Optional[str] = None,
     ):
-        limit = payload.get("limit",9999999)
-        page = payload.get("page",1)
         filters = [
             models.Promo.deleted_at == None
         ]
@@ -122,39 +144,25 @@ class PromoController:
             filters.append(models.Promo.is_show == True)
         if type:
             filters.append(models.Promo.type == type)
-        if search: 
-            filters.append(
-                or_(
-                    models.Promo.type.ilike(f"%{search}%"),
-                    models.Promo.title.ilike(f"%{search}%"),
-                    models.Promo.description.ilike(f"%{search}%"),
-                    models.Promo.image_url.ilike(f"%{search}%")
-                )
-            )
-        # get total rows count
-        data = db.query(models.Promo).filter(*filters)
-        total_rows = data.count()
-       
-        limit = int(limit) if limit else 0
-        page = int(page) if page else 0
-        offset = (page - 1) * limit if limit and page else None
-
-        promos = (
-            db.query(
-                models.Promo
-            )
-            .filter(*filters)
-            .order_by(models.Promo.updated_at.desc())
-            .limit(limit)
-            .offset(offset)
-            .all()
+        if search:
+            filters.append(common.search_filter(search, PROMO_SEARCH))
+        names = common.field_list(payload.get("fields"), PROMO_FIELDS)
+        promos, page_info = common.paginate(
+            db.query(models.Promo)
+            .options(common.load_fields(
+                models.Promo, names, models.Promo.updated_at, models.Promo.promo_id
+            ))
+            .filter(*filters),
+            payload,
+            sort_column=models.Promo.updated_at,
+            key_column=models.Promo.promo_id
         )
 
         ret = GetResponse(
                 status="ok",
                 status_code=200,
-                data=jsonable_encoder(promos),
-                total_rows=total_rows
+                data=jsonable_encoder([common.pick_fields(promo, names) for promo in promos]),
+                **page_info
             ).__dict__
         
         
@@ -168,7 +176,26 @@ class PromoController:
         file_type: str,
         type: Optional[str] = None,
         is_all: Optional[bool] = False,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        fields: Optional[str] = None
+    ):
+        return self.promo_list_export(
+            db,
+            type=type,
+            is_all=is_all,
+            search=search,
+            fields=fields
+        ).cached(
+            "promo", {"type": type, "is_all": is_all, "search": search}, models.Promo
+        ).response(filename, file_type)
+
+    def promo_list_export(
+        self,
+        db: Session,
+        type: Optional[str] = None,
+        is_all: Optional[bool] = False,
+        search: Optional[str] = None,
+        fields: Optional[str] = None
     ):
         filters = [
             models.Promo.deleted_at == None
@@ -177,23 +204,8 @@ class PromoController:
             filters.append(models.Promo.is_show == True)
         if type:
             filters.append(models.Promo.type == type)
-        if search: 
-            filters.append(
-                or_(
-                    models.Promo.type.ilike(f"%{search}%"),
-                    models.Promo.title.ilike(f"%{search}%"),
-                    models.Promo.description.ilike(f"%{search}%"),
-                    models.Promo.image_url.ilike(f"%{search}%")
-                )
-            )
-        promos = (
-            db.query(
-                models.Promo
-            )
-            .filter(*filters)
-            .order_by(models.Promo.updated_at.desc())
-            .all()
-        )
+        if search:
+            filters.append(common.search_filter(search, PROMO_SEARCH))
 
         keys = (
             "created_at",
@@ -215,19 +227,17 @@ class PromoController:
             "link URL",
             "Show"
         )
+        keys, headers = common.download_fields(fields, keys, headers)
 
-        print("promos", promos)
-
-        raw_data = {
-            "header": keys,
-            "headers": headers,
-            "rows": jsonable_encoder(promos)
-        }
-        data = common.format_excel(rawData=raw_data)
-        return common.get_media_return(
-            file_name=filename,
-            file_type=file_type,
-            data=data,
+        return Export(
+            db.query(
+                models.Promo
+            )
+            .options(common.load_fields(models.Promo, keys, models.Promo.promo_id))
+            .filter(*filters)
+            .order_by(models.Promo.updated_at.desc()),
+            keys,
+            headers
         )
     
     def delete_promo(
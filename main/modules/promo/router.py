@@ -1,4 +1,5 @@
 from main.core import deps
+from main.core.dispatch import dispatcher
 from main.modules.promo.controller import PromoController
 from main.schemas.promo import CreatePromo, UpdatePromo
 from main.schemas.common import GetPayload, PostResponse
@@ -64,7 +65,9 @@ async def create_promo(
     """
         Create Promo
     """
-    return controller.create_promo(
+    return await dispatcher.run(
+        "promo",
+        controller.create_promo,
         db=db,
         payload=payload.dict(exclude_none=True)
     )
@@ -79,14 +82,16 @@ async def update_promo(
     """
         Update Promo
     """
-    return controller.update_promo(
+    return await dispatcher.run(
+        "promo",
+        controller.update_promo,
         db=db,
         payload=payload.dict(exclude_none=True)
     )
 
 @router.get('/list')
 async def promo_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     payload: GetPayload = Depends(), 
@@ -98,7 +103,9 @@ async def promo_list(
     """
     Get Promo List
     """
-    return controller.promo_list(
+    return await dispatcher.run(
+        "promo",
+        controller.promo_list,
         db=db,
         payload=payload.dict(exclude_none=True),
         type=type,
@@ -108,7 +115,7 @@ async def promo_list(
 
 @router.get('/list/download')
 async def download_promo_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     filename: str,
@@ -116,19 +123,23 @@ async def download_promo_list(
     type: Annotated[str, Query()] = None,
     is_all: Annotated[bool, Query()] = False,
     search: Annotated[str, Query()] = None,
+    fields: Annotated[str, Query()] = None,
     
 ) -> Any:
 
     """
     Download Promo List
     """
-    return controller.download_promo_list(
+    return await dispatcher.run(
+        "download",
+        controller.download_promo_list,
         db=db,
         filename=filename,
         file_type=file_type,
         type=type,
         is_all=is_all,
-        search=search
+        search=search,
+        fields=fields
     )
 
 @router.delete('/delete')
@@ -142,7 +153,9 @@ async def delete_promo(
     """
     Delete Promo
     """
-    return controller.delete_promo(
+    return await dispatcher.run(
+        "promo",
+        controller.delete_promo,
         db=db,
         id=id
     )
\ No newline at end of file
@@ -1,15 +1,81 @@
-import asyncio
 import httpx
+import logging
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, cast, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, update, bindparam, any_, or_, and_, Text, Float, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, MACADDR
 from main import models
-from main.library.common import common
+from main.library.common import common, SearchSpec
+from main.library.cache import TTLCache
+from main.library import geohash
+from main.library.exporter import Export
+from main.library.writebehind import WriteBehindBuffer
+from main.db.dbpostgres.session import AsyncSessionLocal
+from main.core.dispatch import dispatcher
+from main.core.background import run_exclusive
 from main.schemas.common import PostResponse, GetResponse, GetResponseWithDataUsage
 from main.core.config import settings
 from typing import Optional
+from datetime import date, timedelta
 from acs_zeep_client import ACSZeepClient
 
+
+# columns a list may return; password is never one of them
+ROUTER_FIELDS = (
+    "router_id",
+    "owner_user_id",
+    "serial_no",
+    "router_model",
+    "router_version",
+    "mac_address",
+    "ip_address",
+    "qr_string",
+    "data_usage",
+    "subscribers_count",
+    "long",
+    "lat",
+    "created_by",
+    "is_enabled",
+    "created_at",
+    "updated_at",
+    "deleted_at"
+)
+
+# pg_try_advisory_xact_lock key held while maintaining usage partitions
+USAGE_PARTITIONS_LOCK_KEY = 3015
+# pg_try_advisory_xact_lock key held while reconciling the heatmap
+HEATMAP_RECONCILE_LOCK_KEY = 3020
+# RouterHeatmap keeps cells for geohash lengths 1..6
+# (migrations/0008_router_heatmap.sql)
+HEATMAP_MAX_PRECISION = 6
+
+ROUTER_SEARCH = SearchSpec(
+    text=[
+        models.Router.serial_no,
+        models.Router.router_model,
+        models.Router.router_version,
+        models.User.name
+    ],
+    numbers=[models.Router.data_usage, models.Router.subscribers_count]
+)
+
+# router_list totals, keyed by its filters
+router_totals_cache = TTLCache(ttl=settings.ROUTER_TOTALS_CACHE_SECONDS)
+
+# router_id of live routers, keyed by normalized MAC. Entries for a router
+# deleted or re-MACed elsewhere are caught by the usage UPDATE and evicted.
+router_id_cache = TTLCache(
+    ttl=settings.ROUTER_MAC_CACHE_SECONDS,
+    maxsize=settings.ROUTER_MAC_CACHE_SIZE
+)
+
+
+def text_array(name, values):
+    # one text[] parameter, for `col = ANY(...)` and unnest()
+    return bindparam(name, list(values), type_=ARRAY(Text))
+
+
 class RouterController:
 
     def create_router(
@@ -49,11 +115,19 @@ class RouterController:
                 message="Serial No. already registered"
             ).__dict__
 
+        mac = common.normalize_mac(payload["mac_address"])
+        if not mac:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message="Invalid MAC address"
+            ).__dict__
+
         existing_mac = (
             db.query(models.Router)
             .filter(
                 models.Router.deleted_at == None,
-                models.Router.mac_address == payload["mac_address"]
+                models.Router.mac == mac
             ).first()
         )
         if existing_mac:
@@ -68,7 +142,7 @@ class RouterController:
             serial_no=payload["serial_no"],
             router_model=payload["router_model"],
             router_version=payload.get("router_version"),
-            mac_address=payload["mac_address"],
+            mac_address=mac,
             ip_address=payload["ip_address"],
             password=payload["password"],
             qr_string=payload["qr_string"],
@@ -95,8 +169,9 @@ class RouterController:
         db.add(new_router)
         db.commit()
         db.refresh(new_router)
+        router_totals_cache.clear()
 
-        asyncio.create_task(self.send_to_router_api(data=router_data))
+        dispatcher.spawn(self.send_to_router_api(data=router_data))
 
         return PostResponse(
             status="ok",
@@ -132,6 +207,33 @@ class RouterController:
             update_data = payload
         else:
             update_data = payload.dict(exclude_unset=True)
+
+        old_mac = router.mac
+        if "mac_address" in update_data:
+            mac = common.normalize_mac(update_data["mac_address"])
+            if not mac:
+                return PostResponse(
+                    status="error",
+                    status_code=400,
+                    message="Invalid MAC address"
+                ).__dict__
+
+            existing_mac = (
+                db.query(models.Router)
+                .filter(
+                    models.Router.deleted_at == None,
+                    models.Router.mac == mac,
+                    models.Router.router_id != router.router_id
+                ).first()
+            )
+            if existing_mac:
+                return PostResponse(
+                    status="error",
+                    status_code=400,
+                    message="MAC already registered"
+                ).__dict__
+            update_data["mac_address"] = mac
+
         update_data["updated_at"] = common.get_timestamp(1)
         for field in router_data:
             if field in update_data:
@@ -139,6 +241,8 @@ class RouterController:
 
         db.commit()
         db.refresh(router)
+        if old_mac:
+            router_id_cache.delete(str(old_mac))
 
         return PostResponse(
             status="ok",
@@ -159,74 +263,76 @@ class RouterController:
         search: Optional[str] = None,
         business_owner_id: Optional[str] = None
     ):
-        limit = payload.get("limit",9999999)
-        page = payload.get("page",1)
         filters = [
             models.Router.deleted_at == None
         ]
         if payload.get("id"):
             filters.append(models.Router.router_id == payload.get("id"))
-        if search: 
-            filters.append(
-                or_(
-                    models.Router.serial_no.ilike(f"%{search}%"),
-                    models.Router.router_model.ilike(f"%{search}%"),
-                    models.Router.router_version.ilike(f"%{search}%"),
-                    cast(models.Router.data_usage, String).ilike(search),
-                    cast(models.Router.subscribers_count, String).ilike(search),
-                    models.User.name.ilike(f"%{search}%"),
-                )
-            )
+        if search:
+            filters.append(common.search_filter(search, ROUTER_SEARCH))
         if business_owner_id:
             filters.append(models.Router.owner_user_id == business_owner_id)
-            
-        # get total rows count
-        data = db.query(models.Router).filter(*filters)
-        total_rows = data.count()
-        # get total data usage
-        total_data_usage = 0
-        if with_total_data_usage:
-            total_data_usage = sum((r.data_usage or 0) for r in data)
-         # get total data usage
-        total_subscribers = 0
-        if with_total_subscribers:
-            total_subscribers = sum((r.subscribers_count or 0) for r in data)
 
-        limit = int(limit) if limit else 0
-        page = int(page) if page else 0
-        offset = (page - 1) * limit if limit and page else None
+        totals = {}
+        if with_total_data_usage or with_total_subscribers:
+            totals = router_totals_cache.get_or_set(
+                (payload.get("id"), search, business_owner_id),
+                lambda: self.router_totals(db, filters)
+            )
 
-        results = (
+        names = common.field_list(
+            payload.get("fields"),
+            ROUTER_FIELDS + ("business_owner_name",)
+        )
+        results, page_info = common.paginate(
             db.query(models.Router, models.User.name.label("business_owner_name"))
+            .options(common.load_fields(
+                models.Router, names, models.Router.updated_at, models.Router.router_id
+            ))
             .join(models.User, models.Router.owner_user_id == models.User.user_id)
-            .filter(*filters)
-            .order_by(models.Router.updated_at.desc())
-            .limit(limit)
-            .offset(offset)
-            .all()
+            .filter(*filters),
+            payload,
+            sort_column=models.Router.updated_at,
+            key_column=models.Router.router_id
         )
 
-        routers = []
-        for router, business_owner_name in results:
-            router_dict = router.__dict__.copy()
-            router_dict["business_owner_name"] = business_owner_name
-            router_dict.pop("_sa_instance_state", None)
-            routers.append(router_dict)
+        routers = [
+            common.pick_fields(router, names, business_owner_name=business_owner_name)
+            for router, business_owner_name in results
+        ]
 
         ret = GetResponse(
                 status="ok",
                 status_code=200,
                 data=jsonable_encoder(routers),
-                total_rows=total_rows
+                **page_info
             ).__dict__
         
 
         if with_total_data_usage:
-            ret["total_data_usage"] = total_data_usage
+            ret["total_data_usage"] = totals["total_data_usage"]
         if with_total_subscribers:
-            ret["total_subscribers"] = total_subscribers
+            ret["total_subscribers"] = totals["total_subscribers"]
         
         return ret
+
+
+    def router_totals(self, db: Session, filters: list):
+        # one aggregate over the same rows router_list pages through
+        total_data_usage, total_subscribers = (
+            db.query(
+                func.coalesce(func.sum(models.Router.data_usage), 0),
+                func.coalesce(func.sum(models.Router.subscribers_count), 0)
+            )
+            .select_from(models.Router)
+            .join(models.User, models.Router.owner_user_id == models.User.user_id)
+            .filter(*filters)
+            .one()
+        )
+        return {
+            "total_data_usage": total_data_usage,
+            "total_subscribers": total_subscribers,
+        }
             
     
     def download_router_list(
@@ -234,36 +340,28 @@ class RouterController:
         db: Session,
         filename: str,
         file_type: str,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        fields: Optional[str] = None
+    ):
+        return self.router_list_export(
+            db,
+            search=search,
+            fields=fields
+        ).cached(
+            "router", {"search": search}, models.Router, models.User
+        ).response(filename, file_type)
+
+    def router_list_export(
+        self,
+        db: Session,
+        search: Optional[str] = None,
+        fields: Optional[str] = None
     ):
         filters = [
             models.Router.deleted_at == None
         ]
-        if search: 
-            filters.append(
-                or_(
-                    models.Router.serial_no.ilike(f"%{search}%"),
-                    models.Router.router_model.ilike(f"%{search}%"),
-                    models.Router.router_version.ilike(f"%{search}%"),
-                    cast(models.Router.data_usage, String).ilike(search),
-                    cast(models.Router.subscribers_count, String).ilike(search),
-                    models.User.name.ilike(f"%{search}%"),
-                )
-            )
-        results = (
-            db.query(models.Router, models.User.name.label("business_owner_name"))
-            .join(models.User, models.Router.owner_user_id == models.User.user_id)
-            .filter(*filters)
-            .order_by(models.Router.updated_at.desc())
-            .all()
-        )
-
-        routers = []
-        for router, business_owner_name in results:
-            router_dict = router.__dict__.copy()
-            router_dict["business_owner_name"] = business_owner_name
-            router_dict.pop("_sa_instance_state", None)
-            routers.append(router_dict)
+        if search:
+            filters.append(common.search_filter(search, ROUTER_SEARCH))
 
         keys = (
             "created_at",
@@ -291,17 +389,20 @@ class RouterController:
             "Latitude",
             "Enabled"
         )
+        keys, headers = common.download_fields(fields, keys, headers)
 
-        raw_data = {
-            "header": keys,
-            "headers": headers,
-            "rows": jsonable_encoder(routers)
-        }
-        data = common.format_excel(rawData=raw_data)
-        return common.get_media_return(
-            file_name=filename,
-            file_type=file_type,
-            data=data,
+        return Export(
+            db.query(models.Router, models.User.name.label("business_owner_name"))
+            .options(common.load_fields(models.Router, keys, models.Router.router_id))
+            .join(models.User, models.Router.owner_user_id == models.User.user_id)
+            .filter(*filters)
+            .order_by(models.Router.updated_at.desc()),
+            keys,
+            headers,
+            row=lambda row: common.pick_fields(
+                row[0], keys, business_owner_name=row[1]
+            ),
+            columns={"business_owner_name": models.User.name}
         )
     
     def delete_router(
@@ -324,6 +425,9 @@ class RouterController:
     
         router.deleted_at= common.get_timestamp(1)
         db.commit()
+        router_totals_cache.clear()
+        if router.mac:
+            router_id_cache.delete(str(router.mac))
 
         return PostResponse(
             status="ok",
@@ -332,61 +436,526 @@ class RouterController:
         ).__dict__
 
 
-    def update_router_usage(
+    async def update_router_usage_async(
         self,
-        db: Session,
+        db: AsyncSession,
         payload: dict
     ):
+        if settings.ROUTER_USAGE_WRITE_BEHIND:
+            return await self.queue_router_usage(db, payload)
 
-        router = (
-            db.query(models.Router)
-            .filter(
-                models.Router.deleted_at == None,
-                models.Router.mac_address == payload["router_mac"])
-            .first()
+        # a batch of one: with the MAC cached there is no router lookup
+        result = (await self.apply_router_usage(db, [payload]))[0]
+        if result["status"] == "error":
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message=result["message"]
+            ).__dict__
+
+        return PostResponse(
+            status="ok",
+            status_code=200,
+            message="Router and User successfully updated"
+        ).__dict__
+
+    async def update_router_usage_batch_async(
+        self,
+        db: AsyncSession,
+        items: list
+    ):
+        if len(items) > settings.ROUTER_USAGE_BATCH_MAX_ITEMS:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message=f"Batch is limited to {settings.ROUTER_USAGE_BATCH_MAX_ITEMS} records"
+            ).__dict__
+
+        results = await self.apply_router_usage(db, items)
+
+        failed = sum(1 for result in results if result["status"] == "error")
+        return PostResponse(
+            status="ok",
+            status_code=200,
+            message=f"{len(results) - failed} of {len(results)} usage records applied",
+            data={
+                "applied": len(results) - failed,
+                "failed": failed,
+                "results": results
+            }
+        ).__dict__
+
+
+    async def apply_router_usage(
+        self,
+        db: AsyncSession,
+        items: list
+    ):
+        """
+        Same checks and updates as update_router_usage_async for many
+        records in one transaction. Routers come from the MAC cache or one
+        lookup, users from one lookup. Each table then gets one UPDATE
+        joined to unnest()ed arrays, which keeps the statement's bind
+        parameters fixed however large the batch is. Records for the same
+        router or device apply in order, so the last one wins. Returns a
+        result per record.
+        """
+        macs = [common.normalize_mac(item["router_mac"]) for item in items]
+        router_ids = await self.resolve_router_ids(db, {mac for mac in macs if mac})
+        user_ids = dict(
+            (
+                await db.execute(
+                    select(models.User.device_id, models.User.user_id)
+                    .filter(
+                        models.User.deleted_at == None,
+                        models.User.user_type == "subscriber",
+                        models.User.device_id == any_(text_array(
+                            "device_ids", {item["device_id"] for item in items}
+                        ))
+                    )
+                )
+            ).all()
         )
-        if not router:
+
+        def latest(indexes):
+            routers = {}
+            for index in indexes:
+                router_id = router_ids.get(macs[index])
+                if router_id and items[index]["device_id"] in user_ids:
+                    routers[router_id] = (
+                        macs[index],
+                        items[index]["router_usage"],
+                        items[index]["router_subscribers_count"]
+                    )
+            return routers
+
+        updated_at = common.get_timestamp(datetime_fmt=1)
+        routers = latest(range(len(items)))
+        updated = await self.update_router_rows(db, routers, updated_at)
+
+        stale = {mac for router_id, (mac, *_) in routers.items() if router_id not in updated}
+        if stale:
+            # cached for a router since deleted or given another MAC
+            for mac in stale:
+                router_id_cache.delete(mac)
+                del router_ids[mac]
+            router_ids.update(await self.resolve_router_ids(db, stale))
+            updated |= await self.update_router_rows(
+                db,
+                latest(index for index, mac in enumerate(macs) if mac in stale),
+                updated_at
+            )
+
+        users = {}
+        results = []
+        for index, item in enumerate(items):
+            router_id = router_ids.get(macs[index])
+            user_id = user_ids.get(item["device_id"])
+            if router_id and not user_id:
+                message = "User device id not found"
+            elif router_id not in updated:
+                message = "Router mac address not found"
+            else:
+                message = None
+                users[user_id] = (item["device_usage"], item["device_data_left"])
+
+            results.append({
+                "index": index,
+                "router_mac": item["router_mac"],
+                "device_id": item["device_id"],
+                "status": "error" if message else "ok",
+                "message": message
+            })
+
+        if users:
+            # key order so overlapping batches lock rows in the same order
+            users = dict(sorted(users.items()))
+            rows = func.unnest(
+                text_array("user_ids", users),
+                bindparam("device_usage", [v[0] for v in users.values()], type_=ARRAY(Float)),
+                bindparam("device_data_left", [v[1] for v in users.values()], type_=ARRAY(Float))
+            ).table_valued("user_id", "data_usage", "data_left").render_derived(name="v")
+            await db.execute(
+                update(models.User)
+                .where(models.User.user_id == rows.c.user_id)
+                .values(
+                    data_usage=rows.c.data_usage,
+                    data_left=rows.c.data_left,
+                    updated_at=updated_at
+                )
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+
+        return results
+
+
+    async def resolve_router_ids(self, db: AsyncSession, macs: set):
+        """
+        router_id of the live router with each normalized MAC, from
+        router_id_cache where possible and one lookup for the rest.
+        """
+        router_ids = {}
+        missing = []
+        for mac in macs:
+            router_id = router_id_cache.get(mac)
+            if router_id:
+                router_ids[mac] = router_id
+            else:
+                missing.append(mac)
+
+        if missing:
+            rows = (
+                await db.execute(
+                    select(models.Router.mac, models.Router.router_id)
+                    .filter(
+                        models.Router.deleted_at == None,
+                        models.Router.mac == any_(
+                            bindparam("router_macs", missing, type_=ARRAY(MACADDR))
+                        )
+                    )
+                )
+            ).all()
+            for mac, router_id in rows:
+                router_ids[str(mac)] = router_id
+                router_id_cache.set(str(mac), router_id)
+
+        return router_ids
+
+
+    async def update_router_rows(self, db: AsyncSession, routers: dict, updated_at):
+        """
+        Apply {router_id: (mac, data_usage, subscribers_count)} in one
+        UPDATE. The MAC and deleted_at are checked again, so a stale cached
+        router_id updates nothing. Returns the router_ids updated.
+        """
+        if not routers:
+            return set()
+
+        routers = dict(sorted(routers.items()))
+        rows = func.unnest(
+            text_array("router_ids", routers),
+            bindparam("router_macs", [v[0] for v in routers.values()], type_=ARRAY(MACADDR)),
+            bindparam("router_usage", [v[1] for v in routers.values()], type_=ARRAY(Float)),
+            bindparam("subscribers_counts", [v[2] for v in routers.values()], type_=ARRAY(Integer))
+        ).table_valued("router_id", "mac", "data_usage", "subscribers_count").render_derived(name="v")
+        result = await db.execute(
+            update(models.Router)
+            .where(
+                models.Router.router_id == rows.c.router_id,
+                models.Router.mac == rows.c.mac,
+                models.Router.deleted_at == None
+            )
+            .values(
+                data_usage=rows.c.data_usage,
+                subscribers_count=rows.c.subscribers_count,
+                updated_at=updated_at
+            )
+            .returning(models.Router.router_id)
+            .execution_options(synchronize_session=False)
+        )
+        return set(result.scalars().all())
+
+
+    async def queue_router_usage(self, db: AsyncSession, payload: dict):
+        # write-behind: only the latest sample per router and device is kept.
+        # The router is checked first, from router_id_cache once it is warm,
+        # so a bad MAC still gets its 400 rather than a silent drop at flush
+        mac = common.normalize_mac(payload["router_mac"])
+        if not mac or mac not in await self.resolve_router_ids(db, {mac}):
             return PostResponse(
                 status="error",
                 status_code=400,
                 message="Router mac address not found"
             ).__dict__
-        
 
-        router.data_usage = payload["router_usage"]
-        router.subscribers_count = payload["router_subscribers_count"]
-        router.updated_at = common.get_timestamp(1)
+        await usage_buffer.put((mac, payload["device_id"]), payload)
 
-        user = (
-            db.query(models.User)
-            .filter(
-                models.User.deleted_at == None,
-                models.User.user_type == "subscriber",
-                models.User.device_id == payload["device_id"]
+        return PostResponse(
+            status="ok",
+            status_code=200,
+            message="Router and User usage queued"
+        ).__dict__
+
+
+    async def flush_router_usage(self, items: list):
+        async with AsyncSessionLocal() as db:
+            results = await self.apply_router_usage(db, items)
+
+        failed = [result for result in results if result["status"] == "error"]
+        if failed:
+            logging.warning(
+                "Router usage flush skipped %s record(s), first: %s %s",
+                len(failed), failed[0]["router_mac"], failed[0]["message"]
             )
-            .first()
-        )
-        if not user:
+        return len(results) - len(failed)
+
+
+    async def router_usage_history(
+        self,
+        db: AsyncSession,
+        router_id: str,
+        start: date = None,
+        end: date = None,
+        granularity: str = "day",
+        cursor: str = None
+    ):
+        start, end = common.usage_range(start, end)
+        next_cursor = None
+
+        if granularity == "sample":
+            filters = [
+                models.RouterUsageSample.router_id == router_id,
+                models.RouterUsageSample.sampled_at >= start,
+                models.RouterUsageSample.sampled_at < end + timedelta(days=1)
+            ]
+            if cursor:
+                # sampled_at is unique per router, it alone marks the place
+                after, _ = common.decode_cursor(cursor)
+                filters.append(models.RouterUsageSample.sampled_at > after)
+            # the sampled_at range lets the planner skip the other partitions
+            rows = (
+                await db.execute(
+                    select(
+                        models.RouterUsageSample.sampled_at,
+                        models.RouterUsageSample.data_usage,
+                        models.RouterUsageSample.usage,
+                        models.RouterUsageSample.subscribers_count
+                    )
+                    .filter(*filters)
+                    .order_by(models.RouterUsageSample.sampled_at)
+                    .limit(settings.LIST_MAX_PAGE_SIZE + 1)
+                )
+            ).mappings().all()
+            data = [dict(row) for row in rows[:settings.LIST_MAX_PAGE_SIZE]]
+            if len(rows) > settings.LIST_MAX_PAGE_SIZE:
+                next_cursor = common.encode_cursor(data[-1]["sampled_at"], router_id)
+
+        elif granularity == "day":
+            rows = (
+                await db.execute(
+                    select(
+                        models.RouterUsageDaily.day,
+                        models.RouterUsageDaily.usage,
+                        models.RouterUsageDaily.samples,
+                        models.RouterUsageDaily.last_data_usage,
+                        models.RouterUsageDaily.max_subscribers
+                    )
+                    .filter(
+                        models.RouterUsageDaily.router_id == router_id,
+                        models.RouterUsageDaily.day.between(start, end)
+                    )
+                )
+            ).mappings().all()
+            data = common.daily_series(
+                {row["day"]: {key: row[key] for key in row.keys() if key != "day"} for row in rows},
+                start,
+                end,
+                usage=0,
+                samples=0,
+                last_data_usage=None,
+                max_subscribers=None
+            )
+
+        else:
             return PostResponse(
                 status="error",
                 status_code=400,
-                message="User device id not found"
+                message="granularity must be day or sample"
             ).__dict__
 
-        user.data_usage = payload["device_usage"]
-        user.data_left = payload["device_data_left"]
-        user.updated_at = common.get_timestamp(1)
+        return GetResponse(
+            status="ok",
+            status_code=200,
+            data=jsonable_encoder(data),
+            total_rows=len(data),
+            next_cursor=next_cursor
+        ).__dict__
 
-        db.commit()
-        db.refresh(router)
-        db.refresh(user)
-        
 
-        return PostResponse(
+    async def nearby_routers(
+        self,
+        db: AsyncSession,
+        lat: float,
+        long: float,
+        radius_km: float,
+        limit: int = 100
+    ):
+        """
+        Live routers within radius_km of a point, nearest first. The
+        geohash cells covering the circle's bounding box are read as
+        ranges of ix_routers_active_geohash; only those candidates get the
+        exact distance.
+        """
+        if not -90 <= lat <= 90 or not -180 <= long <= 180:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message="lat must be within -90..90 and long within -180..180"
+            ).__dict__
+        if not 0 < radius_km <= settings.ROUTER_NEARBY_MAX_RADIUS_KM:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message=f"radius_km must be above 0 and at most {settings.ROUTER_NEARBY_MAX_RADIUS_KM:g}"
+            ).__dict__
+        if limit < 1:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message="limit must be at least 1"
+            ).__dict__
+
+        cells = geohash.cover(*geohash.bounding_box(lat, long, radius_km))
+        router = models.Router
+        # haversine; least() guards asin against rounding past 1
+        distance = 2 * geohash.EARTH_RADIUS_KM * func.asin(func.least(1.0, func.sqrt(
+            func.power(func.sin(func.radians(router.lat - lat) / 2.0), 2)
+            + func.cos(func.radians(lat)) * func.cos(func.radians(router.lat))
+            * func.power(func.sin(func.radians(router.long - long) / 2.0), 2)
+        )))
+        candidates = (
+            select(
+                *(getattr(router, field) for field in ROUTER_FIELDS),
+                distance.label("distance_km")
+            )
+            .filter(
+                router.deleted_at == None,
+                # "~" sorts after every geohash character
+                or_(*(
+                    and_(router.geohash >= cell, router.geohash < cell + "~")
+                    for cell in cells
+                ))
+            )
+            .subquery()
+        )
+        rows = (
+            await db.execute(
+                select(candidates)
+                .where(candidates.c.distance_km <= radius_km)
+                .order_by(candidates.c.distance_km)
+                .limit(min(limit, settings.LIST_MAX_PAGE_SIZE))
+            )
+        ).mappings().all()
+
+        return GetResponse(
             status="ok",
             status_code=200,
-            message="Router and User successfully updated"
-        ).__dict__xw
+            data=jsonable_encoder([dict(row) for row in rows]),
+            total_rows=len(rows)
+        ).__dict__
+
+
+    async def router_heatmap(
+        self,
+        db: AsyncSession,
+        zoom: int,
+        bbox: str
+    ):
+        """
+        Router, subscriber and data usage totals per geohash cell in a
+        west,south,east,north box, read from RouterHeatmap. Map zoom levels
+        two apart share a cell size; a box holding more than
+        ROUTER_HEATMAP_MAX_CELLS cells at that size gets coarser cells.
+        """
+        try:
+            west, south, east, north = map(float, bbox.split(","))
+            valid = -90 <= south <= north <= 90 \
+                and -180 <= west <= 180 and -180 <= east <= 180
+        except ValueError:
+            valid = False
+        if not valid:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message="bbox must be west,south,east,north in degrees"
+            ).__dict__
+        if west > east:
+            # crosses the antimeridian
+            west -= 360
+
+        precision = min(max(zoom // 2 + 1, 1), HEATMAP_MAX_PRECISION)
+        while precision > 1 and geohash.cell_count(
+            south, west, north, east, precision
+        ) > settings.ROUTER_HEATMAP_MAX_CELLS:
+            precision -= 1
+
+        heatmap = models.RouterHeatmap
+        routers = func.sum(heatmap.routers)
+        rows = (
+            await db.execute(
+                select(
+                    heatmap.cell,
+                    routers.label("routers"),
+                    func.sum(heatmap.subscribers).label("subscribers"),
+                    func.sum(heatmap.data_usage).label("data_usage")
+                )
+                .filter(
+                    heatmap.zoom == precision,
+                    or_(*(
+                        and_(heatmap.cell >= prefix, heatmap.cell < prefix + "~")
+                        for prefix in geohash.cover(
+                            south, west, north, east, precision=precision
+                        )
+                    ))
+                )
+                .group_by(heatmap.cell)
+                .having(routers > 0)
+                .order_by(heatmap.cell)
+            )
+        ).all()
+
+        data = []
+        for row in rows:
+            cell = geohash.bounds(row.cell)
+            if not geohash.overlaps(cell, south, west, north, east):
+                continue
+            data.append({
+                "cell": row.cell,
+                "lat": (cell[0] + cell[2]) / 2,
+                "long": (cell[1] + cell[3]) / 2,
+                "bbox": [cell[1], cell[0], cell[3], cell[2]],
+                "routers": row.routers,
+                "subscribers": row.subscribers,
+                "data_usage": row.data_usage
+            })
+
+        return GetResponse(
+            status="ok",
+            status_code=200,
+            data=jsonable_encoder(data),
+            total_rows=len(data)
+        ).__dict__
+
+
+    async def reconcile_heatmap(self):
+        """
+        Recompute RouterHeatmap from Routers and rewrite the drifted
+        cells. Returns the number of corrected cells, or None when another
+        worker holds the lock.
+        """
+        drifted = await run_exclusive(
+            HEATMAP_RECONCILE_LOCK_KEY, "SELECT reconcile_router_heatmap()"
+        )
+        if drifted:
+            logging.warning("Router heatmap drifted in %s cell(s), corrected", drifted)
+        return drifted
+
+
+    async def maintain_usage_partitions(self):
+        """
+        Create the coming days' RouterUsageSamples partitions and detach
+        the expired ones. Returns the number of partitions changed.
+        """
+        return await run_exclusive(
+            USAGE_PARTITIONS_LOCK_KEY,
+            "SELECT maintain_router_usage_partitions(:ahead, :retain)",
+            {
+                "ahead": settings.ROUTER_USAGE_PARTITIONS_AHEAD_DAYS,
+                "retain": settings.ROUTER_USAGE_RETENTION_DAYS
+            }
+        )
+
 
     async def send_to_router_api_bak(self, data: dict):
         # add tayo dito ng calls papunta sa acs
@@ -425,3 +994,13 @@ class RouterController:
 
                 else:
                     print(f"📭 Device with ID {data['serial_no']} not found")
+
+
+# latest /router/update/usage samples waiting to be written when
+# ROUTER_USAGE_WRITE_BEHIND is on; flushed by a background job
+usage_buffer = WriteBehindBuffer(
+    name="router_usage",
+    flush=RouterController().flush_router_usage,
+    flush_entries=settings.ROUTER_USAGE_FLUSH_ENTRIES,
+    max_size=settings.ROUTER_USAGE_BUFFER_MAX_ENTRIES
+)
@@ -1,16 +1,37 @@
 from main.core import deps
-from main.modules.router.controller import RouterController
-from main.schemas.router import CreateRouter, UpdateRouter, UpdateRouterUsage
+from main.core.dispatch import dispatcher
+from main.core.config import settings
+from main.core.background import jobs
+from main.modules.router.controller import RouterController, usage_buffer
+from main.schemas.router import CreateRouter, UpdateRouter, UpdateRouterUsage, \
+    UpdateRouterUsageBatch
 from main.schemas.common import GetPayload
 from main.core.security import jwt_required
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, Header, Query
 from typing import Any, Union, Optional, Annotated
+from datetime import date
 
 
 router = APIRouter()
 controller = RouterController()
 
+if settings.ROUTER_USAGE_WRITE_BEHIND:
+    jobs.every("router_usage_flush", settings.ROUTER_USAGE_FLUSH_SECONDS, usage_buffer.flush)
+    jobs.on_shutdown(usage_buffer.flush)
+
+jobs.every(
+    "router_usage_partitions",
+    settings.ROUTER_USAGE_PARTITION_MAINTENANCE_SECONDS,
+    controller.maintain_usage_partitions
+)
+jobs.every(
+    "router_heatmap_reconcile",
+    settings.ROUTER_HEATMAP_RECONCILE_SECONDS,
+    controller.reconcile_heatmap
+)
+
 @router.post("/create",response_model=dict)
 async def create_router(
     db: Annotated[Session, Depends(deps.get_db)],
@@ -21,7 +42,9 @@ async def create_router(
     """
         Create Router
     """
-    return controller.create_router(
+    return await dispatcher.run(
+        "router",
+        controller.create_router,
         db=db,
         current_user=current_user,
         payload=payload.dict(exclude_none=True)
@@ -37,14 +60,16 @@ async def update_router(
     """
         Update Router
     """
-    return controller.update_router(
+    return await dispatcher.run(
+        "router",
+        controller.update_router,
         db=db,
         payload=payload.dict(exclude_none=True)
     )
 
 @router.get('/list')
 async def router_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     payload: GetPayload = Depends(), 
@@ -57,7 +82,9 @@ async def router_list(
     """
     Get Router List
     """
-    return controller.router_list(
+    return await dispatcher.run(
+        "router",
+        controller.router_list,
         db=db,
         payload=payload.dict(exclude_none=True),
         with_total_data_usage=with_total_data_usage,
@@ -68,23 +95,27 @@ async def router_list(
 
 @router.get('/list/download')
 async def download_router_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     filename: str,
     file_type: str,
     search: Annotated[str, Query()] = None,
+    fields: Annotated[str, Query()] = None,
     
 ) -> Any:
 
     """
     Download Router List
     """
-    return controller.download_router_list(
+    return await dispatcher.run(
+        "download",
+        controller.download_router_list,
         db=db,
         filename=filename,
         file_type=file_type,
-        search=search
+        search=search,
+        fields=fields
     )
 
 @router.delete('/delete')
@@ -98,14 +129,16 @@ async def delete_router(
     """
     Delete Router
     """
-    return controller.delete_router(
+    return await dispatcher.run(
+        "router",
+        controller.delete_router,
         db=db,
         id=id
     )
 
 @router.put("/update/usage",response_model=dict)
 async def update_router_usage(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[AsyncSession, Depends(deps.get_async_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     payload: UpdateRouterUsage
@@ -113,7 +146,88 @@ async def update_router_usage(
     """
         Update Router Data Usage and Subscribers Count
     """
-    return controller.update_router_usage(
+    return await controller.update_router_usage_async(
         db=db,
         payload=payload.dict(exclude_none=True)
-    )
\ No newline at end of file
+    )
+
+@router.put("/update/usage/batch",response_model=dict)
+async def update_router_usage_batch(
+    db: Annotated[AsyncSession, Depends(deps.get_async_db)],
+    *,
+    _: Annotated[dict, Depends(jwt_required)],
+    payload: UpdateRouterUsageBatch
+) -> Any:
+    """
+        Update Data Usage and Subscribers Count of Many Routers
+    """
+    return await controller.update_router_usage_batch_async(
+        db=db,
+        items=[item.dict() for item in payload.items]
+    )
+
+@router.get('/usage/history')
+async def router_usage_history(
+    db: Annotated[AsyncSession, Depends(deps.get_async_read_db)],
+    *,
+    _: Annotated[dict, Depends(jwt_required)],
+    router_id: Annotated[str, Query()],
+    start: Annotated[date, Query()] = None,
+    end: Annotated[date, Query()] = None,
+    granularity: Annotated[str, Query()] = "day",
+    cursor: Annotated[str, Query()] = None
+) -> Any:
+
+    """
+    Get Router Usage History
+    """
+    return await controller.router_usage_history(
+        db=db,
+        router_id=router_id,
+        start=start,
+        end=end,
+        granularity=granularity,
+        cursor=cursor
+    )
+
+
+@router.get('/nearby')
+async def nearby_routers(
+    db: Annotated[AsyncSession, Depends(deps.get_async_read_db)],
+    *,
+    _: Annotated[dict, Depends(jwt_required)],
+    lat: Annotated[float, Query()],
+    long: Annotated[float, Query()],
+    radius_km: Annotated[float, Query()],
+    limit: Annotated[int, Query()] = 100
+) -> Any:
+
+    """
+    Get Routers Near a Point
+    """
+    return await controller.nearby_routers(
+        db=db,
+        lat=lat,
+        long=long,
+        radius_km=radius_km,
+        limit=limit
+    )
+
+
+@router.get('/heatmap')
+async def router_heatmap(
+    db: Annotated[AsyncSession, Depends(deps.get_async_read_db)],
+    *,
+    _: Annotated[dict, Depends(jwt_required)],
+    zoom: Annotated[int, Query()],
+    bbox: Annotated[str, Query()]
+) -> Any:
+
+    """
+    Get Router Heatmap
+    """
+    return await controller.router_heatmap(
+        db=db,
+        zoom=zoom,
+        bbox=bbox
+    )
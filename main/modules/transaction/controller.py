@@ -2,9 +2,9 @@ import asyncio
 import httpx
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, cast, String
 from main import models
-from main.library.common import common
+from main.library.common import common, SearchSpec
+from main.library.exporter import Export
 from main.schemas.common import PostResponse, GetResponse
 from main.core.config import settings
 from typing import Optional
@@ -12,6 +12,35 @@ from main.library.payconnectInterface import payconnect_interface
 from acs_zeep_client import ACSZeepClient
 
 
+# columns a list may return
+TRANSACTION_FIELDS = (
+    "transaction_id",
+    "type",
+    "status",
+    "payment_method",
+    "amount",
+    "qr_code_string",
+    "charge_reference",
+    "retrieval_reference",
+    "retrieval_timestamp",
+    "user_id",
+    "created_at",
+    "updated_at",
+    "deleted_at"
+)
+
+TRANSACTION_SEARCH = SearchSpec(
+    text=[
+        models.Transaction.payment_method,
+        models.Transaction.status,
+        models.Transaction.type,
+        models.Transaction.charge_reference
+    ],
+    numbers=[models.Transaction.amount],
+    dates=[models.Transaction.created_at]
+)
+
+
 class TransactionController:
 
     async def create_payment_transaction(
@@ -102,9 +131,6 @@ class TransactionController:
         search: Optional[str] = None,
         status: Optional[str] = None
     ):
-        limit = payload.get("limit",9999999)
-        page = payload.get("page",1)
-
         user_id = ""
         if current_user.get("user_id") and \
               current_user.get("user_type") not in ["admin","support"]:
@@ -114,16 +140,8 @@ class TransactionController:
         if payload.get("id"):
             filters.append(models.Transaction.transaction_id == payload.get("id"))
         
-        if search: 
-            filters.append(
-                or_(
-                    models.Transaction.payment_method.ilike(f"%{search}%"),
-                    models.Transaction.status.ilike(f"%{search}%"),
-                    models.Transaction.type.ilike(f"%{search}%"),
-                    models.Transaction.charge_reference.ilike(f"%{search}%"),
-                    cast(models.Transaction.amount, String).ilike(search)
-                )
-            )
+        if search:
+            filters.append(common.search_filter(search, TRANSACTION_SEARCH))
         
         if status:
             filters.append(models.Transaction.status == status)
@@ -132,38 +150,36 @@ class TransactionController:
             filters.append(models.Transaction.user_id == user_id)
 
 
-        # get total rows count
-        data = db.query(models.Transaction).filter(*filters)
-        total_rows = data.count()
-
-        limit = int(limit) if limit else 0
-        page = int(page) if page else 0
-        offset = (page - 1) * limit if limit and page else None
-
-        transactions = (
+        names = common.field_list(
+            payload.get("fields"),
+            TRANSACTION_FIELDS + ("name",)
+        )
+        transactions, page_info = common.paginate(
             db.query(models.Transaction, models.User.name)
+            .options(common.load_fields(
+                models.Transaction,
+                names,
+                models.Transaction.updated_at,
+                models.Transaction.transaction_id
+            ))
             .join(models.User, models.Transaction.user_id == models.User.user_id)
-            .filter(*filters)
-            .order_by(models.Transaction.updated_at.desc())
-            .limit(limit)
-            .offset(offset)
-            .all()
+            .filter(*filters),
+            payload,
+            sort_column=models.Transaction.updated_at,
+            key_column=models.Transaction.transaction_id
         )
 
-        trans_list = []
-        for trans, name in transactions:
-            print(name)
-            trans_dict = trans.__dict__.copy()
-            trans_dict["name"] = name
-            trans_dict.pop("_sa_instance_state", None)
-            trans_list.append(trans_dict)
+        trans_list = [
+            common.pick_fields(trans, names, name=name)
+            for trans, name in transactions
+        ]
 
 
         return GetResponse(
             status="ok",
             status_code=200,
             data=jsonable_encoder(trans_list),
-            total_rows=total_rows
+            **page_info
         )
 
 
@@ -173,40 +189,32 @@ class TransactionController:
         filename: str,
         file_type: str,
         search: Optional[str] = None,
-        status: Optional[str] = None
+        status: Optional[str] = None,
+        fields: Optional[str] = None
+    ):
+        return self.payment_transaction_list_export(
+            db,
+            search=search,
+            status=status,
+            fields=fields
+        ).response(filename, file_type)
+
+    def payment_transaction_list_export(
+        self,
+        db: Session,
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        fields: Optional[str] = None
     ):
     
         filters = []
  
-        if search: 
-            filters.append(
-                or_(
-                    models.Transaction.payment_method.ilike(f"%{search}%"),
-                    models.Transaction.status.ilike(f"%{search}%"),
-                    models.Transaction.type.ilike(f"%{search}%"),
-                    models.Transaction.charge_reference.ilike(f"%{search}%"),
-                    cast(models.Transaction.amount, String).ilike(search)
-                )
-            )
+        if search:
+            filters.append(common.search_filter(search, TRANSACTION_SEARCH))
 
         if status:
             filters.append(models.Transaction.status == status)
 
-        transactions = (
-            db.query(models.Transaction, models.User.name)
-            .join(models.User, models.Transaction.user_id == models.User.user_id)
-            .filter(*filters)
-            .order_by(models.Transaction.updated_at.desc())
-            .all()
-        )
-
-        trans_list = []
-        for trans, name in transactions:
-            trans_dict = trans.__dict__.copy()
-            trans_dict["name"] = name
-            trans_dict.pop("_sa_instance_state", None)
-            trans_list.append(trans_dict)
-
         keys = (
             "created_at",
             "updated_at",
@@ -231,17 +239,20 @@ class TransactionController:
             "Retrieval Timestamp",
             "QR Code String"
         )
+        keys, headers = common.download_fields(fields, keys, headers)
 
-        raw_data = {
-            "header": keys,
-            "headers": headers,
-            "rows": jsonable_encoder(trans_list)
-        }
-        data = common.format_excel(rawData=raw_data)
-        return common.get_media_return(
-            file_name=filename,
-            file_type=file_type,
-            data=data,
+        return Export(
+            db.query(models.Transaction, models.User.name)
+            .options(common.load_fields(
+                models.Transaction, keys, models.Transaction.transaction_id
+            ))
+            .join(models.User, models.Transaction.user_id == models.User.user_id)
+            .filter(*filters)
+            .order_by(models.Transaction.updated_at.desc()),
+            keys,
+            headers,
+            row=lambda row: common.pick_fields(row[0], keys, name=row[1]),
+            columns={"name": models.User.name}
         )
     
 
@@ -1,4 +1,5 @@
 from main.core import deps
+from main.core.dispatch import dispatcher
 from main.modules.transaction.controller import TransactionController
 from main.schemas.transaction import CreatePaymentTransaction, PayConnectWebhook
 from main.schemas.common import GetPayload, PostResponse
@@ -44,7 +45,7 @@ async def receive_webhook(
 
 @router.get('/list')
 async def payment_transaction_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     current_user: Annotated[dict, Depends(jwt_required)],
     payload: GetPayload = Depends(),
@@ -55,7 +56,9 @@ async def payment_transaction_list(
     """
     Get Payment Transaction List
     """
-    return controller.payment_transaction_list(
+    return await dispatcher.run(
+        "transaction",
+        controller.payment_transaction_list,
         db=db,
         current_user=current_user,
         payload=payload.dict(exclude_none=True),
@@ -65,22 +68,26 @@ async def payment_transaction_list(
 
 @router.get('/list/download')
 async def download_payment_transaction_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     filename: str,
     file_type: str,
     search: Annotated[str, Query()] = None,
+    fields: Annotated[str, Query()] = None,
     status: Annotated[str, Query()] = None
 ) -> Any:
 
     """
     Download Payment Transaction List
     """
-    return controller.download_payment_transaction_list(
+    return await dispatcher.run(
+        "download",
+        controller.download_payment_transaction_list,
         db=db,
         filename=filename,
         file_type=file_type,
         search=search,
-        status=status
+        status=status,
+        fields=fields
     )
\ No newline at end of file
@@ -1,15 +1,112 @@
 import random
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, cast, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
 from main import models
-from main.library.common import common
+from main.library.common import common, SearchSpec
+from main.library.exporter import Export
+from main.modules.router.controller import ROUTER_FIELDS
+from main.core.dispatch import dispatcher
 from main.schemas.common import PostResponse, GetResponse
 from typing import Optional
 from collections import defaultdict
-import asyncio
 from acs_zeep_client import ACSZeepClient
 
+
+# columns a list may return; password is never one of them
+TIER_FIELDS = (
+    "tier_id",
+    "name",
+    "description",
+    "data_limit",
+    "is_default_tier",
+    "created_at",
+    "updated_at",
+    "deleted_at"
+)
+USER_FIELDS = (
+    "user_id",
+    "user_type",
+    "name",
+    "email",
+    "mobile_no",
+    "device_id",
+    "data_limit",
+    "data_usage",
+    "data_left",
+    "tier",
+    "is_active",
+    "created_at",
+    "updated_at",
+    "last_login",
+    "deleted_at"
+)
+
+TIER_SEARCH = SearchSpec(
+    text=[models.Tier.name, models.Tier.description],
+    numbers=[models.Tier.data_limit]
+)
+
+# keyed by the user_types of the list, each list searches what it shows
+USER_SEARCH = {
+    "admin,support": SearchSpec(
+        text=[
+            models.User.name,
+            models.User.email,
+            models.User.mobile_no,
+            models.User.user_type
+        ],
+        dates=[models.User.created_at]
+    ),
+    "business_owner": SearchSpec(
+        text=[models.User.name, models.User.email, models.User.mobile_no],
+        dates=[models.User.created_at]
+    ),
+    "default": SearchSpec(
+        text=[
+            models.User.name,
+            models.User.email,
+            models.User.mobile_no,
+            models.User.device_id,
+            models.User.tier
+        ],
+        numbers=[models.User.data_limit, models.User.data_usage],
+        dates=[models.User.created_at]
+    ),
+}
+
+# what user_list may attach to each row on request (include=...)
+USER_INCLUDES = ("routers",)
+
+
+def owner_router_totals():
+    """
+    Live router count, data usage and subscribers per owner_user_id, one
+    row per owner, to outer join to Users.
+    """
+    return (
+        select(
+            models.Router.owner_user_id,
+            func.count().label("total_routers"),
+            func.sum(models.Router.data_usage).label("total_data_usage"),
+            func.sum(models.Router.subscribers_count).label("total_subscribers")
+        )
+        .filter(models.Router.deleted_at == None)
+        .group_by(models.Router.owner_user_id)
+        .subquery("owner_totals")
+    )
+
+
+def owner_total_columns(totals):
+    # owners without routers have no totals row
+    return (
+        func.coalesce(totals.c.total_routers, 0).label("total_routers"),
+        func.coalesce(totals.c.total_data_usage, 0).label("total_data_usage"),
+        func.coalesce(totals.c.total_subscribers, 0).label("total_subscribers")
+    )
+
+
 class UserController:
 
     def user_types(
@@ -40,44 +137,29 @@ class UserController:
         filters = [
             models.Tier.deleted_at == None
         ]
-        limit = payload.get("limit",9999999)
-        page = payload.get("page",1)
         if payload.get("id"):
             filters.append(models.Tier.tier_id == payload.get("id"))
 
-        if search: 
-            filters.append(
-                or_(
-                    models.Tier.name.ilike(f"%{search}%"),
-                    models.Tier.description.ilike(f"%{search}%"),
-                    cast(models.Tier.data_limit, String).ilike(search),
-                )
-            )
-
-        # get total rows count
-        data = db.query(models.Tier).filter(*filters)
-        total_rows = data.count()
+        if search:
+            filters.append(common.search_filter(search, TIER_SEARCH))
 
-        limit = int(limit) if limit else 0
-        page = int(page) if page else 0
-        offset = (page - 1) * limit if limit and page else None
-
-        tiers = (
-            db.query(
-                models.Tier
-            )
-            .filter(*filters)
-            .order_by(models.Tier.updated_at.desc())
-            .limit(limit)
-            .offset(offset)
-            .all()
+        names = common.field_list(payload.get("fields"), TIER_FIELDS)
+        tiers, page_info = common.paginate(
+            db.query(models.Tier)
+            .options(common.load_fields(
+                models.Tier, names, models.Tier.updated_at, models.Tier.tier_id
+            ))
+            .filter(*filters),
+            payload,
+            sort_column=models.Tier.updated_at,
+            key_column=models.Tier.tier_id
         )
 
         return GetResponse(
             status="ok",
             status_code=200,
-            data=jsonable_encoder(tiers),
-            total_rows=total_rows
+            data=jsonable_encoder([common.pick_fields(tier, names) for tier in tiers]),
+            **page_info
         ).__dict__
     
     
@@ -86,58 +168,59 @@ class UserController:
         db: Session,
         filename: str,
         file_type: str,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        fields: Optional[str] = None
+    ):
+        return self.tier_list_export(
+            db,
+            search=search,
+            fields=fields
+        ).cached(
+            "tier", {"search": search}, models.Tier
+        ).response(filename, file_type)
+
+    def tier_list_export(
+        self,
+        db: Session,
+        search: Optional[str] = None,
+        fields: Optional[str] = None
     ):
         filters = [
             models.Tier.deleted_at == None
         ]
         
-        if search: 
-            filters.append(
-                or_(
-                    models.Tier.name.ilike(f"%{search}%"),
-                    models.Tier.description.ilike(f"%{search}%"),
-                    cast(models.Tier.data_limit, String).ilike(search),
-                )
+        if search:
+            filters.append(common.search_filter(search, TIER_SEARCH))
+
+        keys, headers = common.download_fields(
+            fields,
+            (
+                "created_at",
+                "updated_at",
+                "name",
+                "description",
+                "data_limit",
+                "is_default_tier"
+            ),
+            (
+                "Date Created",
+                "Date Updated",
+                "Tier Name",
+                "Description",
+                "Data Limit",
+                "Default"
             )
+        )
 
-        tiers = (
+        return Export(
             db.query(
                 models.Tier
             )
+            .options(common.load_fields(models.Tier, keys, models.Tier.tier_id))
             .filter(*filters)
-            .order_by(models.Tier.updated_at.desc())
-            .all()
-        )
-
-
-        keys = (
-            "created_at",
-            "updated_at",
-            "name",
-            "description",
-            "data_limit",
-            "is_default_tier"
-        )
-        headers = (
-            "Date Created",
-            "Date Updated",
-            "Tier Name",
-            "Description",
-            "Data Limit",
-            "Default"
-        )
-
-        raw_data = {
-            "header": keys,
-            "headers": headers,
-            "rows": jsonable_encoder(tiers)
-        }
-        data = common.format_excel(rawData=raw_data)
-        return common.get_media_return(
-            file_name=filename,
-            file_type=file_type,
-            data=data,
+            .order_by(models.Tier.updated_at.desc()),
+            keys,
+            headers
         )
     
     
@@ -424,7 +507,7 @@ class UserController:
         db.refresh(new_user)
 
         # add subscriber data also here
-        asyncio.create_task(self.register_subscriber( username=mobile_no,
+        dispatcher.spawn(self.register_subscriber( username=mobile_no,
                                 password=payload["password"],
                                 email=payload["email"],
                                 fullName=payload["name"]))
@@ -507,7 +590,18 @@ class UserController:
         payload: dict,
         user_types: Optional[str] = None,
         search: Optional[str] = None,
+        include: Optional[str] = None
     ):
+        includes = [name.strip() for name in (include or "").split(",") if name.strip()]
+        unknown = [name for name in includes if name not in USER_INCLUDES]
+        if unknown:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message=f"Unknown include: {', '.join(unknown)}. "
+                    f"Expected any of {', '.join(USER_INCLUDES)}"
+            ).__dict__
+
         filters = [
             models.User.deleted_at == None
         ]
@@ -516,74 +610,62 @@ class UserController:
             if user_type_list:
                 filters.append(models.User.user_type.in_(user_type_list))
 
-        if search: 
-            if user_types == "admin,support":
-                filters.append(
-                    or_(
-                        models.User.name.ilike(f"%{search}%"),
-                        models.User.email.ilike(f"%{search}%"),
-                        models.User.mobile_no.ilike(f"%{search}%"),
-                        models.User.user_type.ilike(f"%{search}%"),
-                        cast(models.User.created_at, String).ilike(search),
-                    )
-                )
-            elif user_types == "business_owner":
-                filters.append(
-                    or_(
-                        models.User.name.ilike(f"%{search}%"),
-                        models.User.email.ilike(f"%{search}%"),
-                        models.User.mobile_no.ilike(f"%{search}%"),
-                        cast(models.User.created_at, String).ilike(search),
-                    )
-                )
-            else :
-                filters.append(
-                    or_(
-                        models.User.name.ilike(f"%{search}%"),
-                        models.User.email.ilike(f"%{search}%"),
-                        models.User.mobile_no.ilike(f"%{search}%"),
-                        models.User.device_id.ilike(f"%{search}%"),
-                        cast(models.User.data_limit, String).ilike(search),
-                        cast(models.User.data_usage, String).ilike(search),
-                        models.User.tier.ilike(f"%{search}%"),
-                        cast(models.User.created_at, String).ilike(search),
-                    )
-                )
+        if search:
+            spec = USER_SEARCH.get(user_types, USER_SEARCH["default"])
+            filters.append(common.search_filter(search, spec))
 
-        limit = payload.get("limit",9999999)
-        page = payload.get("page",1)
         if payload.get("id"):
             filters.append(models.User.user_id == payload.get("id"))
 
-        # get total rows count
-        data = db.query(models.User).filter(*filters)
-        total_rows = data.count()
-
-        limit = int(limit) if limit else 0
-        page = int(page) if page else 0
-        offset = (page - 1) * limit if limit and page else None
-
-        users = (
-            db.query(
-                models.User
-            )
+        names = common.field_list(payload.get("fields"), USER_FIELDS)
+        query = (
+            db.query(models.User)
+            .options(common.load_fields(
+                models.User, names, models.User.updated_at, models.User.user_id
+            ))
             .filter(*filters)
-            .order_by(models.User.updated_at.desc())
-            .limit(limit)
-            .offset(offset)
-            .all()
         )
+        is_owner_list = user_types == "business_owner"
+        if is_owner_list:
+            # the router totals come with the page, summed by the database
+            totals = owner_router_totals()
+            query = (
+                query.add_columns(*owner_total_columns(totals))
+                .outerjoin(totals, totals.c.owner_user_id == models.User.user_id)
+            )
 
-        if user_types == "business_owner":
-            user_ids = [user.user_id for user in users]
+        results, page_info = common.paginate(
+            query,
+            payload,
+            sort_column=models.User.updated_at,
+            key_column=models.User.user_id
+        )
+
+        if is_owner_list:
+            users = [row[0] for row in results]
+            data = [
+                common.pick_fields(
+                    row[0],
+                    names + ["total_routers", "total_data_usage", "total_subscribers"],
+                    total_routers=row[1],
+                    total_data_usage=row[2],
+                    total_subscribers=row[3]
+                )
+                for row in results
+            ]
+        else:
+            users = results
+            data = [common.pick_fields(user, names) for user in users]
 
+        if is_owner_list and "routers" in includes:
             routers = (
                 db.query(
                     models.Router
                 )
+                .options(common.load_fields(models.Router, ROUTER_FIELDS))
                 .filter(
                     models.Router.deleted_at == None,
-                    models.Router.owner_user_id.in_(user_ids))
+                    models.Router.owner_user_id.in_([user.user_id for user in users]))
                 .order_by(models.Router.updated_at.desc())
                 .all()
             )
@@ -593,19 +675,18 @@ class UserController:
                 router_map[router.owner_user_id].append(router)
 
             # Attach routers to each user
-            for user in users:
-                user_routers = router_map.get(user.user_id, [])
-                user.routers = user_routers
-                user.total_routers = len(user_routers)
-                user.total_data_usage = sum(router.data_usage or 0 for router in user_routers)
-                user.total_subscribers = sum(router.subscribers_count or 0 for router in user_routers)
+            for user, user_dict in zip(users, data):
+                user_dict["routers"] = [
+                    common.pick_fields(router, ROUTER_FIELDS)
+                    for router in router_map.get(user.user_id, [])
+                ]
 
 
         return GetResponse(
             status="ok",
             status_code=200,
-            data=jsonable_encoder(users) if users else [],
-            total_rows=total_rows
+            data=jsonable_encoder(data),
+            **page_info
         ).__dict__
 
 
@@ -616,7 +697,24 @@ class UserController:
         file_type: str,
         user_id: Optional[str] = None,
         user_types: Optional[str] = None,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        fields: Optional[str] = None
+    ):
+        return self.user_list_export(
+            db,
+            user_id=user_id,
+            user_types=user_types,
+            search=search,
+            fields=fields
+        ).response(filename, file_type)
+
+    def user_list_export(
+        self,
+        db: Session,
+        user_id: Optional[str] = None,
+        user_types: Optional[str] = None,
+        search: Optional[str] = None,
+        fields: Optional[str] = None
     ):
         filters = [
             models.User.deleted_at == None
@@ -627,74 +725,9 @@ class UserController:
             user_type_list = [t.strip() for t in user_types.split(",") if t.strip()]
             if user_type_list:
                 filters.append(models.User.user_type.in_(user_type_list))
-        if search: 
-            if user_types == "admin,support":
-                filters.append(
-                    or_(
-                        models.User.name.ilike(f"%{search}%"),
-                        models.User.email.ilike(f"%{search}%"),
-                        models.User.mobile_no.ilike(f"%{search}%"),
-                        models.User.user_type.ilike(f"%{search}%"),
-                        cast(models.User.created_at, String).ilike(search),
-                    )
-                )
-            elif user_types == "business_owner":
-                filters.append(
-                    or_(
-                        models.User.name.ilike(f"%{search}%"),
-                        models.User.email.ilike(f"%{search}%"),
-                        models.User.mobile_no.ilike(f"%{search}%"),
-                        cast(models.User.created_at, String).ilike(search),
-                    )
-                )
-            else :
-                filters.append(
-                    or_(
-                        models.User.name.ilike(f"%{search}%"),
-                        models.User.email.ilike(f"%{search}%"),
-                        models.User.mobile_no.ilike(f"%{search}%"),
-                        models.User.device_id.ilike(f"%{search}%"),
-                        cast(models.User.data_limit, String).ilike(search),
-                        cast(models.User.data_usage, String).ilike(search),
-                        models.User.tier.ilike(f"%{search}%"),
-                        cast(models.User.created_at, String).ilike(search),
-                    )
-                )
-
-        users = (
-            db.query(
-                models.User
-            )
-            .filter(*filters)
-            .order_by(models.User.updated_at.desc())
-            .all()
-        )
-
-        if user_types == "business_owner":
-            user_ids = [user.user_id for user in users]
-
-            routers = (
-                db.query(
-                    models.Router
-                )
-                .filter(
-                    models.Router.deleted_at == None,
-                    models.Router.owner_user_id.in_(user_ids))
-                .order_by(models.Router.updated_at.desc())
-                .all()
-            )
-
-            router_map = defaultdict(list)
-            for router in routers:
-                router_map[router.owner_user_id].append(router)
-
-            # Attach routers to each user
-            for user in users:
-                user_routers = router_map.get(user.user_id, [])
-                user.total_routers = len(user_routers)
-                user.total_data_usage = sum(router.data_usage or 0 for router in user_routers)
-                user.total_subscribers = sum(router.subscribers_count or 0 for router in user_routers)
-
+        if search:
+            spec = USER_SEARCH.get(user_types, USER_SEARCH["default"])
+            filters.append(common.search_filter(search, spec))
 
         keys = (
             "created_at",
@@ -723,18 +756,41 @@ class UserController:
             keys += ("total_routers","total_data_usage","total_subscribers")
             headers += ("Total Routers","Total Data Usage", "Total Subscribers")
 
-        raw_data = {
-            "header": keys,
-            "headers": headers,
-            "rows": jsonable_encoder(users)
-        }
-        data = common.format_excel(rawData=raw_data)
-        return common.get_media_return(
-            file_name=filename,
-            file_type=file_type,
-            data=data,
+        keys, headers = common.download_fields(fields, keys, headers)
+
+        query = (
+            db.query(
+                models.User
+            )
+            .options(common.load_fields(models.User, keys, models.User.user_id))
+            .filter(*filters)
+            .order_by(models.User.updated_at.desc())
         )
 
+        if user_types == "business_owner":
+            # one GROUP BY over Routers joined to the owners
+            totals = owner_router_totals()
+            total_columns = owner_total_columns(totals)
+            return Export(
+                query.add_columns(*total_columns)
+                .outerjoin(totals, totals.c.owner_user_id == models.User.user_id),
+                keys,
+                headers,
+                row=lambda row: common.pick_fields(
+                    row[0],
+                    keys,
+                    total_routers=row[1],
+                    total_data_usage=row[2],
+                    total_subscribers=row[3]
+                ),
+                columns=dict(zip(
+                    ("total_routers", "total_data_usage", "total_subscribers"),
+                    total_columns
+                ))
+            )
+
+        return Export(query, keys, headers)
+
     
     def delete_user(
         self,
@@ -773,25 +829,14 @@ class UserController:
         will_return_token: Optional[bool] = False
     ):
 
-        clean_num = common.normalize_ph_number(mobile_no)
-        if not clean_num:
+        filters = self.mobile_filters(mobile_no, user_type)
+        if not filters:
             return PostResponse(
                 status="error",
                 status_code=400,
                 message="Invalid Philippine number format.",
             ).__dict__
         
-        mobile_no = f"+63{clean_num}"
-        filters = [
-            models.User.deleted_at == None,
-            models.User.mobile_no == mobile_no
-        ]
-        
-        if user_type:
-            filters.append(models.User.user_type == user_type)
-        else:
-            filters.append(models.User.user_type == "subscriber")
-        
         user = (
             db.query(models.User)
             .filter(*filters)
@@ -819,4 +864,75 @@ class UserController:
                 status_code=200,
                 message="User found",
                 data=ret
-            ).__dict__
\ No newline at end of file
+            ).__dict__
+
+
+    async def check_by_mobile_async(
+        self,
+        db: AsyncSession,
+        mobile_no: str,
+        user_type: Optional[str] = None,
+        will_return_token: Optional[bool] = False
+    ):
+
+        filters = self.mobile_filters(mobile_no, user_type)
+        if not filters:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message="Invalid Philippine number format.",
+            ).__dict__
+
+        user = (
+            await db.execute(
+                select(models.User)
+                .filter(*filters)
+            )
+        ).scalar_one_or_none()
+
+        if not user:
+            return PostResponse(
+                status="error",
+                status_code=400,
+                message="User not found"
+            ).__dict__
+        else:
+            ret = {}
+            if will_return_token:
+                token = common.generate_jwt(jsonable_encoder(user))
+                ret["access_token"] = token
+                user.last_login = common.get_timestamp(datetime_fmt=1)
+                await db.commit()
+                await db.refresh(user)
+            ret["user"] = jsonable_encoder(user)
+
+            return PostResponse(
+                status="ok",
+                status_code=200,
+                message="User found",
+                data=ret
+            ).__dict__
+
+
+    def mobile_filters(
+        self,
+        mobile_no: str,
+        user_type: Optional[str] = None
+    ):
+
+        clean_num = common.normalize_ph_number(mobile_no)
+        if not clean_num:
+            return None
+
+        mobile_no = f"+63{clean_num}"
+        filters = [
+            models.User.deleted_at == None,
+            models.User.mobile_no == mobile_no
+        ]
+
+        if user_type:
+            filters.append(models.User.user_type == user_type)
+        else:
+            filters.append(models.User.user_type == "subscriber")
+
+        return filters
@@ -1,10 +1,12 @@
 from main.core import deps
+from main.core.dispatch import dispatcher
 from main.modules.user.controller import UserController
 from main.schemas.user import CreateUser, UpdateUser, \
     CreateTier, UpdateTier
 from main.schemas.common import GetPayload
 from main.core.security import jwt_required
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, Header, Query
 from typing import Any, Union, Optional, Annotated
 
@@ -14,7 +16,7 @@ controller = UserController()
 
 @router.get('/types')
 async def user_types(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
 ) -> Any:
@@ -22,13 +24,15 @@ async def user_types(
     """
     Get User Types/Roles
     """
-    return controller.user_types(
+    return await dispatcher.run(
+        "user",
+        controller.user_types,
         db=db,
     )
 
 @router.get('/tiers')
 async def subscriber_tiers(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     payload: GetPayload = Depends(),
@@ -38,7 +42,9 @@ async def subscriber_tiers(
     """
     Get Subscriber Tiers
     """
-    return controller.subscriber_tiers(
+    return await dispatcher.run(
+        "user",
+        controller.subscriber_tiers,
         db=db,
         payload=payload.dict(exclude_none=True),
         search=search
@@ -46,23 +52,27 @@ async def subscriber_tiers(
 
 @router.get('/tiers/download')
 async def download_tier_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     filename: str,
     file_type: str,
     search: Annotated[str, Query()] = None,
+    fields: Annotated[str, Query()] = None,
     
 ) -> Any:
 
     """
     Download Subscriber Tier List
     """
-    return controller.download_tier_list(
+    return await dispatcher.run(
+        "download",
+        controller.download_tier_list,
         db=db,
         filename=filename,
         file_type=file_type,
-        search=search
+        search=search,
+        fields=fields
     )
 
 
@@ -76,7 +86,9 @@ async def create_subscriber_tier(
     """
         Create Subscriber Tier
     """
-    return controller.create_subscriber_tier(
+    return await dispatcher.run(
+        "user",
+        controller.create_subscriber_tier,
         db=db,
         payload=payload.dict(exclude_unset=True)
     )
@@ -91,7 +103,9 @@ async def update_subscriber_tier(
     """
         Update Subscriber Tier
     """
-    return controller.update_subscriber_tier(
+    return await dispatcher.run(
+        "user",
+        controller.update_subscriber_tier,
         db=db,
         payload=payload.dict(exclude_unset=True)
     )
@@ -107,7 +121,9 @@ async def delete_subscriber_tier(
     """
     Delete Subscriber Tier
     """
-    return controller.delete_subscriber_tier(
+    return await dispatcher.run(
+        "user",
+        controller.delete_subscriber_tier,
         db=db,
         id=id
     )
@@ -122,7 +138,9 @@ async def create_user(
     """
         Create User
     """
-    return controller.create_user(
+    return await dispatcher.run(
+        "user",
+        controller.create_user,
         db=db,
         payload=payload.dict(exclude_unset=True)
     )
@@ -137,34 +155,40 @@ async def update_user(
     """
         Update User
     """
-    return controller.update_user(
+    return await dispatcher.run(
+        "user",
+        controller.update_user,
         db=db,
         payload=payload.dict(exclude_unset=True)
     )
 
 @router.get('/list')
 async def user_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     payload: GetPayload = Depends(),
     user_types: Annotated[str, Query()] = None,
-    search: Annotated[str, Query()] = None
+    search: Annotated[str, Query()] = None,
+    include: Annotated[str, Query()] = None
 ) -> Any:
 
     """
     Get User List
     """
-    return controller.user_list(
+    return await dispatcher.run(
+        "user",
+        controller.user_list,
         db=db,
         payload=payload.dict(exclude_none=True),
         user_types=user_types,
-        search=search
+        search=search,
+        include=include
     )
 
 @router.get('/list/download')
 async def download_user_list(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[Session, Depends(deps.get_read_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     filename: str,
@@ -172,19 +196,23 @@ async def download_user_list(
     user_id: Annotated[str, Query()] = None,
     user_types: Annotated[str, Query()] = None,
     search: Annotated[str, Query()] = None,
+    fields: Annotated[str, Query()] = None,
     
 ) -> Any:
 
     """
     Download User List
     """
-    return controller.download_user_list(
+    return await dispatcher.run(
+        "download",
+        controller.download_user_list,
         db=db,
         filename=filename,
         file_type=file_type,
         user_id=user_id,
         user_types=user_types,
-        search=search
+        search=search,
+        fields=fields
     )
 
 @router.delete('/delete')
@@ -198,7 +226,9 @@ async def delete_user(
     """
     Delete User
     """
-    return controller.delete_user(
+    return await dispatcher.run(
+        "user",
+        controller.delete_user,
         db=db,
         id=id
     )
@@ -206,7 +236,7 @@ async def delete_user(
 
 @router.get('/check')
 async def check_by_mobile(
-    db: Annotated[Session, Depends(deps.get_db)],
+    db: Annotated[AsyncSession, Depends(deps.get_async_db)],
     *,
     _: Annotated[dict, Depends(jwt_required)],
     mobile_no: str,
@@ -217,7 +247,7 @@ async def check_by_mobile(
     """
     Check User by Mobile No
     """
-    return controller.check_by_mobile(
+    return await controller.check_by_mobile_async(
         db=db,
         mobile_no=mobile_no,
         user_type=user_type,
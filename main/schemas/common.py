@@ -14,11 +14,16 @@ class GetResponse(BaseModel):
     detail: Optional[str] = None
     data: Optional[Any] = []
     total_rows: Optional[int] = 0
+    total_rows_type: Optional[str] = None
+    next_cursor: Optional[str] = None
 
 class GetPayload(BaseModel):
     limit: Optional[int] = None
     page: Optional[int] = None
     id: Optional[str] = None
+    cursor: Optional[str] = None
+    count: Optional[str] = None
+    fields: Optional[str] = None
 
 
 class GetResponseWithDataUsage(BaseModel):
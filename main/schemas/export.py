@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+
+class CreateExport(BaseModel):
+    endpoint: str
+    file_type: str
+    filename: str
+    filters: Optional[Dict[str, Any]] = {}
+
+
+# filters of each export, the query parameters of its download route
+
+class ExportFilters(BaseModel):
+    model_config = {"extra": "forbid"}
+    search: Optional[str] = None
+    fields: Optional[str] = None
+
+class PromoExportFilters(ExportFilters):
+    type: Optional[str] = None
+    is_all: Optional[bool] = False
+
+class TransactionExportFilters(ExportFilters):
+    status: Optional[str] = None
+
+class UserExportFilters(ExportFilters):
+    user_id: Optional[str] = None
+    user_types: Optional[str] = None
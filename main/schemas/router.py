@@ -37,3 +37,6 @@ class UpdateRouterUsage(BaseModel):
     device_id:  str
     device_usage: float
     device_data_left: float
+
+class UpdateRouterUsageBatch(BaseModel):
+    items: List[UpdateRouterUsage]
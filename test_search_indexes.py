@@ -0,0 +1,221 @@
+"""
+Search index tests for the Zeep Backend list endpoints
+
+Runs every list controller with a `search` term against the configured
+database and asserts on the EXPLAIN (FORMAT JSON) plan of the query it
+sends. Run them after applying the migrations in
+docker/postgres/init/migrations:
+
+    docker exec -it zeep-backend python -m pytest test_search_indexes.py
+
+The planner is left alone. The tables first get SEED_ROWS rows each,
+merged into their GIN indexes and analyzed as autovacuum would, so the
+plans are the ones picked at a realistic size. The rows are rolled back
+afterwards, but the row counts ANALYZE records stay until the next
+vacuum, so point it at a dev or test database. Skipped when no
+PostgreSQL is reachable.
+"""
+
+import json
+
+import pytest
+from sqlalchemy import event, text
+
+try:
+    from main.db.dbpostgres.session import engine, SessionLocal
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1")
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError(f"{engine.dialect.name} is not PostgreSQL")
+except Exception as err:
+    pytest.skip(f"no database to explain against: {err}", allow_module_level=True)
+
+from main.modules.user.controller import UserController
+from main.modules.router.controller import RouterController
+from main.modules.transaction.controller import TransactionController
+from main.modules.otp.controller import OtpController
+from main.modules.promo.controller import PromoController
+
+
+SEED_ROWS = 20000
+PAYLOAD = {"limit": 10}
+
+# text only, text or number, text or date (see Common.parse_search)
+TEXT_TERM = "zq7x"
+NUMBER_TERM = "987654"
+DATE_TERM = "1999-01-02"
+
+SEED = {
+    "Tiers": """
+        INSERT INTO "Tiers" (tier_id, name, description, data_limit,
+            created_at, updated_at)
+        SELECT 'seed-' || g, 'Tier ' || g, md5(g::text), g,
+            now() - g * interval '1 minute', now()
+        FROM generate_series(1, :rows) g
+    """,
+    "Users": """
+        INSERT INTO "Users" (user_id, user_type, name, email, password,
+            mobile_no, device_id, data_limit, data_usage, tier,
+            created_at, updated_at)
+        SELECT 'seed-' || g,
+            (ARRAY['admin', 'support', 'business_owner', 'subscriber'])[g % 4 + 1],
+            'User ' || g, 'seed' || g || '@example.com', md5(g::text),
+            '9' || lpad(g::text, 9, '0'), md5('device' || g), g, g, 'seed',
+            now() - g * interval '1 minute', now()
+        FROM generate_series(1, :rows) g
+    """,
+    "Routers": """
+        INSERT INTO "Routers" (router_id, owner_user_id, serial_no,
+            router_model, router_version, mac_address, data_usage,
+            subscribers_count, created_at, updated_at)
+        SELECT 'seed-' || g, 'seed-' || (g * 7 % :rows + 1), 'SN' || md5(g::text), 'Model ' || g % 7,
+            'v' || g % 11,
+            regexp_replace(lpad(to_hex(g), 8, '0'), '(..)(..)(..)(..)', '02-00-\\1-\\2-\\3-\\4'),
+            g, g % 50, now() - g * interval '1 minute', now()
+        FROM generate_series(1, :rows) g
+    """,
+    "Transactions": """
+        INSERT INTO "Transactions" (transaction_id, type, status,
+            payment_method, amount, charge_reference, user_id,
+            created_at, updated_at)
+        SELECT 'seed-' || g, 'purchase', 'paid', 'gcash', g, md5(g::text),
+            'seed-' || (g * 7 % :rows + 1), now() - g * interval '1 minute', now()
+        FROM generate_series(1, :rows) g
+    """,
+    "MobileOtp": """
+        INSERT INTO "MobileOtp" (otp_id, otp, mobile_no, device_id, ref_id,
+            created_at)
+        SELECT 'seed-' || g, lpad((g % 10000)::text, 4, '0'),
+            '9' || lpad(g::text, 9, '0'), md5('device' || g), md5(g::text),
+            now() - g * interval '1 minute'
+        FROM generate_series(1, :rows) g
+    """,
+    "Promos": """
+        INSERT INTO "Promos" (promo_id, image_url, link_url, type, title,
+            description, is_show, created_at, updated_at)
+        SELECT 'seed-' || g, 'https://example.com/' || g || '.png',
+            'https://example.com/' || g, 'banner', 'Promo ' || g, md5(g::text),
+            true, now() - g * interval '1 minute', now()
+        FROM generate_series(1, :rows) g
+    """,
+}
+
+# fresh rows sit in the GIN pending list, which the planner costs as a
+# full read until it is merged into the index
+FLUSH_GIN = """
+    SELECT gin_clean_pending_list(i.indexrelid)
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_am a ON a.oid = c.relam
+    WHERE i.indrelid = CAST(:table AS regclass) AND a.amname = 'gin'
+"""
+
+# (name, searched table, term, controller call)
+CASES = [
+    ("subscriber_tiers", "Tiers", lambda db, term: UserController().subscriber_tiers(
+        db, PAYLOAD, search=term)),
+    ("user_list (admin,support)", "Users", lambda db, term: UserController().user_list(
+        db, PAYLOAD, user_types="admin,support", search=term)),
+    ("user_list (business_owner)", "Users", lambda db, term: UserController().user_list(
+        db, PAYLOAD, user_types="business_owner", search=term)),
+    ("user_list (subscriber)", "Users", lambda db, term: UserController().user_list(
+        db, PAYLOAD, user_types="subscriber", search=term)),
+    ("router_list", "Routers", lambda db, term: RouterController().router_list(
+        db, PAYLOAD, False, False, search=term)),
+    ("payment_transaction_list", "Transactions",
+        lambda db, term: TransactionController().payment_transaction_list(
+            db, {"user_type": "admin"}, PAYLOAD, search=term)),
+    ("sent_otp_list", "MobileOtp", lambda db, term: OtpController().sent_otp_list(
+        db, PAYLOAD, search=term)),
+    ("promo_list", "Promos", lambda db, term: PromoController().promo_list(
+        db, PAYLOAD, is_all=True, search=term)),
+]
+
+# searches the planner can only check row by row, over a scan of the live
+# rows: router_list ORs the owner's name from the joined Users, and the
+# subscriber list matches numbers against data_usage, which is left
+# unindexed for the usage updates (migrations/0011_search_typed_indexes.sql)
+SCANS = {
+    ("router_list", TEXT_TERM),
+    ("router_list", NUMBER_TERM),
+    ("router_list", DATE_TERM),
+    ("user_list (subscriber)", NUMBER_TERM),
+}
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+@pytest.fixture(scope="module")
+def db():
+    """
+    Session over the seeded tables, rolled back when the module is done.
+    """
+    db = SessionLocal()
+    connection = db.connection()
+    try:
+        connection.execute(text("SET LOCAL statement_timeout = 0"))
+        for table, seed in SEED.items():
+            # keeps autovacuum off the table while the seed is uncommitted;
+            # it would record the seeded pages without their rows
+            connection.execute(text(f'LOCK TABLE "{table}" IN SHARE UPDATE EXCLUSIVE MODE'))
+            connection.execute(text(seed), {"rows": SEED_ROWS})
+            connection.execute(text(FLUSH_GIN), {"table": f'"{table}"'})
+            connection.execute(text(f'ANALYZE "{table}"'))
+        yield db
+    finally:
+        db.rollback()
+        db.close()
+
+
+def explain_search(db, name, term, call):
+    """
+    Plans of the queries the call sends with the search term.
+    """
+    pattern = f"%{term}%"
+    plans = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        values = parameters.values() if isinstance(parameters, dict) else parameters or ()
+        if statement.lstrip().upper().startswith("SELECT") and pattern in values:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            result = cursor.fetchone()[0]
+            plans.extend(json.loads(result) if isinstance(result, str) else result)
+
+    connection = db.connection()
+    event.listen(connection, "before_cursor_execute", explain)
+    try:
+        call(db, term)
+    finally:
+        event.remove(connection, "before_cursor_execute", explain)
+
+    assert plans, f"{name}: no search query was executed"
+    return [
+        node for plan in plans for node in plan_nodes(plan["Plan"])
+    ]
+
+
+@pytest.mark.parametrize("term", [TEXT_TERM, NUMBER_TERM, DATE_TERM])
+@pytest.mark.parametrize("name,table,call", CASES, ids=[case[0] for case in CASES])
+def test_search_plan(db, name, table, call, term):
+    nodes = explain_search(db, name, term, call)
+    reads = [
+        node["Node Type"] for node in nodes
+        if node.get("Relation Name") == table
+    ]
+    # index lookups on the search term itself, as opposed to an index
+    # walked for the list order or another filter
+    searched = sorted({
+        node["Index Name"] for node in nodes
+        if term in node.get("Index Cond", "")
+    })
+
+    if (name, term) in SCANS:
+        assert not searched, \
+            f"{name} {term!r} now searches {table} via {searched}, update SCANS"
+    else:
+        assert searched and "Seq Scan" not in reads, \
+            f"{name} {term!r} reads {table} via {reads}, searched {searched}"